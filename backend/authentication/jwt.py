@@ -0,0 +1,200 @@
+"""
+JWT tokens carrying a token version, and authentication that hydrates the
+request user from a short-lived cached record instead of loading it per request.
+
+The cached record is keyed by user id and token version. Saving a user drops
+its record, so deactivation, soft deletes and profile edits apply on the next
+request, and inactive or soft deleted users are refused even on a cache hit; resetting the password or soft deleting also bumps ``token_version``,
+which revokes every token issued before. Counter updates done with a single
+UPDATE bypass ``save()`` and show up once the record expires.
+
+Refresh token blacklist checks go through a shared cache set of blacklisted
+JTIs (one key per JTI) and only reach the database on a hit, or while the set
+hasn't been loaded. The set is loaded by ``compact_tokens``, which also deletes
+expired outstanding and blacklisted tokens in batches. A miss is trusted, so the
+cache must not evict keys before they expire.
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.models import auth_cache_key
+
+logger = logging.getLogger(__name__)
+
+TOKEN_VERSION_CLAIM = 'token_version'
+# Loaded lazily if ever accessed, and left untouched by save() on a hydrated user
+UNCACHED_FIELDS = {'password'}
+BLACKLIST_LOADED_KEY = 'auth:blacklist:loaded'
+
+
+def blacklist_cache_key(jti):
+    return f'auth:blacklist:{jti}'
+
+
+def remember_blacklisted(jtis):
+    """Add JTIs to the cached blacklist until their tokens have expired anyway"""
+    timeout = int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+    cache.set_many({blacklist_cache_key(jti): True for jti in jtis}, timeout)
+
+
+class VersionedRefreshToken(RefreshToken):
+    """Refresh token (and derived access tokens) stamped with the user's token version"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        key = blacklist_cache_key(jti)
+        found = cache.get_many([BLACKLIST_LOADED_KEY, key])
+        if BLACKLIST_LOADED_KEY in found and key not in found:
+            return
+        # Definitive check
+        super().check_blacklist()
+
+    def blacklist(self):
+        result = super().blacklist()
+        remember_blacklisted([self.payload[api_settings.JTI_CLAIM]])
+        return result
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication that serves the request user from the cache when it can"""
+
+    def cached_fields(self):
+        return [
+            field for field in self.user_model._meta.concrete_fields
+            if field.attname not in UNCACHED_FIELDS
+        ]
+
+    def token_identity(self, validated_token):
+        """(user id, token version) a token was issued for"""
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError) as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+        # Tokens issued before versioning count as version 0
+        return user_id, validated_token.get(TOKEN_VERSION_CLAIM, 0)
+
+    def from_record(self, record):
+        return self.user_model.from_db(
+            router.db_for_read(self.user_model), [field.attname for field in self.cached_fields()], record
+        )
+
+    def check_user(self, user):
+        """Refuse inactive and soft deleted users, wherever they were loaded from"""
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if user.is_deleted:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        return user
+
+    def get_user(self, validated_token):
+        user_id, version = self.token_identity(validated_token)
+        key = auth_cache_key(user_id, version)
+        record = cache.get(key)
+        if record is not None:
+            return self.check_user(self.from_record(record))
+        return self.load_user(validated_token, key, version)
+
+    def load_user(self, validated_token, key, version):
+        """Load the user from the database and cache its record"""
+        user = self.check_user(super().get_user(validated_token))
+        if user.token_version != version:
+            raise AuthenticationFailed(_("Token has been revoked"), code="token_revoked")
+
+        # Plain column values, so file fields don't pickle the whole instance
+        record = tuple(field.get_prep_value(getattr(user, field.attname)) for field in self.cached_fields())
+        cache.set(key, record, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+
+    async def aauthenticate(self, request):
+        """``authenticate`` for async views"""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id, version = self.token_identity(validated_token)
+        key = auth_cache_key(user_id, version)
+        record = await cache.aget(key)
+        if record is not None:
+            return self.check_user(self.from_record(record))
+        return await sync_to_async(self.load_user)(validated_token, key, version)
+
+
+def load_blacklist_cache(batch_size=1000):
+    """
+    Put the JTIs of all unexpired blacklisted tokens in the cache and mark the
+    cached set as complete.
+
+    Returns:
+        int: Number of JTIs loaded
+    """
+    jtis = BlacklistedToken.objects.filter(
+        token__expires_at__gt=timezone.now()
+    ).values_list('token__jti', flat=True)
+    loaded = 0
+    batch = []
+    for jti in jtis.iterator(chunk_size=batch_size):
+        batch.append(jti)
+        if len(batch) == batch_size:
+            remember_blacklisted(batch)
+            loaded += len(batch)
+            batch = []
+    remember_blacklisted(batch)
+    cache.set(BLACKLIST_LOADED_KEY, True, timeout=None)
+    return loaded + len(batch)
+
+
+def compact_tokens(batch_size=1000, max_batches=None, progress=None):
+    """
+    Delete expired outstanding tokens, and their blacklist entries, in batches.
+
+    Tokens are issued with a fixed lifetime, so id order is expiry order and
+    each batch is found with a short primary key range scan. Every batch is one
+    DELETE per table in its own transaction.
+
+    Returns:
+        int: Number of outstanding tokens deleted
+    """
+    now = timezone.now()
+    expired = OutstandingToken.objects.filter(expires_at__lte=now).order_by('id')
+    deleted = 0
+    last_id = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = list(expired.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+
+        with transaction.atomic():
+            blacklisted = BlacklistedToken.objects.filter(token_id__in=ids)
+            blacklisted._raw_delete(blacklisted.db)
+            tokens = OutstandingToken.objects.filter(id__in=ids)
+            deleted += tokens._raw_delete(tokens.db)
+        last_id = ids[-1]
+        batches += 1
+        logger.info("Compacted token batch %s up to token %s", batches, last_id)
+        if progress:
+            progress(batches, last_id, len(ids))
+    return deleted
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from authentication.jwt import compact_tokens, load_blacklist_cache
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted tokens in batches and load the cached blacklist'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of tokens deleted per transaction',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            help='Stop after this many batches; the next run continues where this one stopped',
+        )
+
+    def handle(self, *args, **options):
+        def progress(batch, last_id, count):
+            self.stdout.write(f"Batch {batch}: deleted {count} tokens up to token {last_id}")
+
+        deleted = compact_tokens(
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+            progress=progress,
+        )
+        loaded = load_blacklist_cache(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} expired tokens, {loaded} blacklisted tokens cached"
+        ))
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from authentication.models import FailedLoginAttempt
+
+
+class Command(BaseCommand):
+    help = 'Delete failed login audit rows older than the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.LOGIN_AUDIT_RETENTION_DAYS,
+            help='Keep audit rows newer than this many days',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows deleted per statement',
+        )
+
+    def handle(self, *args, **options):
+        deleted = FailedLoginAttempt.prune(days=options['days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} failed login attempts older than {options['days']} days"
+        ))
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from authentication.purge import expired_demo_users, purge_expired_demo_users
+
+
+class Command(BaseCommand):
+    help = 'Delete expired demo accounts and their content in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=settings.DEMO_ACCOUNT_TTL_HOURS,
+            help='Purge demo accounts claimed more than this many hours ago',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Number of users purged per transaction',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            help='Stop after this many batches; the next run continues where this one stopped',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many accounts would be purged',
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = expired_demo_users(options['hours']).count()
+            self.stdout.write(f"{count} demo accounts would be purged")
+            return
+
+        def progress(batch, last_id, deleted):
+            self.stdout.write(f"Batch {batch}: purged up to user {last_id} ({sum(deleted.values())} rows)")
+
+        total = purge_expired_demo_users(
+            hours=options['hours'],
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+            progress=progress,
+        )
+        for table, count in sorted(total.items()):
+            self.stdout.write(f"{table}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {total.get(get_user_model()._meta.label, 0)} demo accounts"
+        ))
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from authentication.utils import refill_demo_pool
+
+
+class Command(BaseCommand):
+    help = 'Top up the pool of ready demo accounts handed out by demo login'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            type=int,
+            default=settings.DEMO_POOL_SIZE,
+            help='Number of unclaimed demo accounts to keep',
+        )
+
+    def handle(self, *args, **options):
+        created = refill_demo_pool(options['size'])
+        self.stdout.write(self.style.SUCCESS(f"Created {created} demo accounts"))
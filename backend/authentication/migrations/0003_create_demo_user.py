@@ -1,16 +1,39 @@
 # Generated by Django 5.1.1 on 2025-04-01 15:18
 
+import os
+
+from django.contrib.auth.hashers import make_password
 from django.db import migrations
-from django.conf import settings
 
 
 def create_demo_user(apps, schema_editor):
-    """Create or update the demo user account for easy testing"""
-    from authentication.utils import setup_demo_user
-    
-    user, created = setup_demo_user()
-    status = "created" if created else "updated"
-    print(f"Demo user {status} successfully with email: demo@twitterclone.com")
+    """
+    Create the demo user account for easy testing.
+
+    Uses the historical User model, so later migrations adding user fields
+    don't break a fresh migrate.
+    """
+    User = apps.get_model("users", "User")
+    email = os.environ.get("DEMO_USER_EMAIL", "demo@twitterclone.com")
+
+    user = User.objects.filter(email=email).first()
+    if user is not None:
+        if not user.is_demo_user:
+            user.is_demo_user = True
+            user.save(update_fields=["is_demo_user"])
+        print(f"Demo user updated successfully with email: {email}")
+        return
+
+    User.objects.create(
+        username=os.environ.get("DEMO_USER_USERNAME", "demo_user"),
+        email=email,
+        password=make_password(os.environ.get("DEMO_USER_PASSWORD", "Demo@123")),
+        is_active=True,
+        is_demo_user=True,
+        bio="👋 This is a demo account. Some actions are restricted. Sign up to get full access!",
+        location="Demo World 🌍",
+    )
+    print(f"Demo user created successfully with email: {email}")
 
 
 def reverse_func(apps, schema_editor):
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.17 on 2026-10-18 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0003_create_demo_user"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="failedloginattempt",
+            index=models.Index(
+                fields=["email", "timestamp"], name="auth_failed_email_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="failedloginattempt",
+            index=models.Index(
+                fields=["ip_address", "timestamp"], name="auth_failed_ip_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="failedloginattempt",
+            index=models.Index(fields=["timestamp"], name="auth_failed_timestamp_idx"),
+        ),
+    ]
@@ -1,23 +1,129 @@
+import hashlib
+import random
+import time
+
 from django.db import models
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta  # This is correctly imported and used throughout
 
+from core.writes import write
+
 User = get_user_model()
 
 
 class FailedLoginAttempt(models.Model):
     """
-    Model to track failed login attempts for account lockout.
+    Failed login attempts, for account lockout.
+
+    Lockout decisions use sliding-window counters per email and per IP in the
+    shared cache, so checking costs one cache round trip no matter how many
+    attempts there were. Rows in this table are then only a sampled audit trail.
+
+    A per-process cache would let every worker allow its own quota of attempts,
+    so without a shared cache (``SHARED_CACHE``) every attempt is written and
+    the counts come from this table instead, one indexed COUNT per counter.
     """
     email = models.EmailField(null=True)
     ip_address = models.GenericIPAddressField()
     timestamp = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['email', 'timestamp'], name='auth_failed_email_idx'),
+            models.Index(fields=['ip_address', 'timestamp'], name='auth_failed_ip_idx'),
+            models.Index(fields=['timestamp'], name='auth_failed_timestamp_idx'),
+        ]
+    
+    @staticmethod
+    def _window_keys(scope, value, now=None):
+        """
+        Cache keys of the current and previous fixed windows for a counter.
+        
+        Returns:
+            tuple: (current_key, previous_key, fraction of the current window elapsed)
+        """
+        window = settings.LOGIN_LOCKOUT_WINDOW
+        now = time.time() if now is None else now
+        bucket, offset = divmod(now, window)
+        digest = hashlib.sha256(str(value).lower().encode()).hexdigest()[:32]
+        prefix = f'auth:failed:{scope}:{digest}'
+        return f'{prefix}:{int(bucket)}', f'{prefix}:{int(bucket) - 1}', offset / window
+    
+    @classmethod
+    def _counters(cls, email, ip_address):
+        """(scope, value, limit) of the counters an attempt is checked against"""
+        counters = []
+        if email:
+            counters.append(('email', email, settings.LOGIN_LOCKOUT_EMAIL_LIMIT))
+        if ip_address:
+            counters.append(('ip', ip_address, settings.LOGIN_LOCKOUT_IP_LIMIT))
+        return counters
+    
+    @classmethod
+    def failure_counts(cls, email, ip_address):
+        """
+        Estimated failures within the last window, per counter.
+        
+        The sliding window is approximated from two fixed windows: the previous
+        window's count is weighted by how much of it still overlaps.
+        
+        Returns:
+            dict: {scope: estimated count}
+        """
+        if not settings.SHARED_CACHE:
+            return cls._stored_failure_counts(email, ip_address)
+
+        now = time.time()
+        windows = {
+            scope: cls._window_keys(scope, value, now)
+            for scope, value, _ in cls._counters(email, ip_address)
+        }
+        cached = cache.get_many([key for current, previous, _ in windows.values() for key in (current, previous)])
+        return {
+            scope: cached.get(current, 0) + cached.get(previous, 0) * (1 - elapsed)
+            for scope, (current, previous, elapsed) in windows.items()
+        }
+    
+    @classmethod
+    def _stored_failure_counts(cls, email, ip_address):
+        """Failures within the last window, per counter, counted from the audit rows"""
+        since = timezone.now() - timedelta(seconds=settings.LOGIN_LOCKOUT_WINDOW)
+        lookups = {'email': 'email', 'ip': 'ip_address'}
+        return {
+            scope: cls.objects.filter(**{lookups[scope]: value}, timestamp__gte=since).count()
+            for scope, value, _ in cls._counters(email and email.lower(), ip_address)
+        }
+
     @classmethod
     def record_failed_attempt(cls, email, ip_address):
-        """Record a failed login attempt"""
-        cls.objects.create(email=email, ip_address=ip_address)
+        """Count a failed login attempt, keeping a sampled audit row"""
+        # Counters ignore case, so audit rows do too
+        email = email and email.lower()
+        if not settings.SHARED_CACHE:
+            # Every row counts
+            write(cls.objects.create, email=email, ip_address=ip_address)
+            return
+
+        now = time.time()
+        newly_blocked = False
+        for scope, value, limit in cls._counters(email, ip_address):
+            key = cls._window_keys(scope, value, now)[0]
+            # Keep both windows around for the sliding estimate
+            cache.add(key, 0, timeout=settings.LOGIN_LOCKOUT_WINDOW * 2)
+            try:
+                count = cache.incr(key)
+            except ValueError:
+                # Evicted between add and incr
+                cache.set(key, 1, timeout=settings.LOGIN_LOCKOUT_WINDOW * 2)
+                count = 1
+            newly_blocked = newly_blocked or count == limit
+        
+        # Always keep the attempt that trips a lockout, and a sample of the rest
+        if newly_blocked or random.random() < settings.LOGIN_AUDIT_SAMPLE_RATE:
+            write(cls.objects.create, email=email, ip_address=ip_address)
     
     @classmethod
     def is_account_locked(cls, email):
@@ -30,13 +136,8 @@ class FailedLoginAttempt(models.Model):
         Returns:
             bool: True if the account is locked, False otherwise
         """
-        # Get failed attempts in the last hour
-        one_hour_ago = timezone.now() - timedelta(hours=1)
-        failed_attempts = cls.objects.filter(
-            email=email,
-            timestamp__gte=one_hour_ago
-        ).count()
-        return failed_attempts >= 20  # Increased for testing
+        count = cls.failure_counts(email, None).get('email', 0)
+        return count >= settings.LOGIN_LOCKOUT_EMAIL_LIMIT
     
     @classmethod
     def is_blocked(cls, email, ip_address):
@@ -50,26 +151,38 @@ class FailedLoginAttempt(models.Model):
         Returns:
             bool: True if access should be blocked, False otherwise
         """
-        # Get failed attempts in the last hour
-        one_hour_ago = timezone.now() - timedelta(hours=1)
-        
-        # Check email-based attempts
-        if email:
-            email_attempts = cls.objects.filter(
-                email=email,
-                timestamp__gte=one_hour_ago
-            ).count()
-            if email_attempts >= 20:  # Limit for email
-                return True
-                
-        # Check IP-based attempts
-        ip_attempts = cls.objects.filter(
-            ip_address=ip_address,
-            timestamp__gte=one_hour_ago
-        ).count()
-        return ip_attempts >= 100  # Higher limit for IP to avoid blocking legitimate users sharing IPs
+        counts = cls.failure_counts(email, ip_address)
+        return any(
+            counts[scope] >= limit
+            for scope, _, limit in cls._counters(email, ip_address)
+        )
     
     @classmethod
     def clear_failed_attempts(cls, email):
-        """Clear all failed login attempts for a user after successful login"""
-        cls.objects.filter(email=email).delete()
+        """Reset the failure counter of an email after a successful login"""
+        if not settings.SHARED_CACHE:
+            since = timezone.now() - timedelta(seconds=settings.LOGIN_LOCKOUT_WINDOW)
+            write(cls.objects.filter(email=email.lower(), timestamp__gte=since).delete)
+            return
+        current, previous, _ = cls._window_keys('email', email)
+        cache.delete_many([current, previous])
+    
+    @classmethod
+    def prune(cls, days=None, batch_size=1000):
+        """
+        Delete audit rows older than the retention window in batches.
+        
+        Returns:
+            int: Number of rows deleted
+        """
+        if days is None:
+            days = settings.LOGIN_AUDIT_RETENTION_DAYS
+        cutoff = timezone.now() - timedelta(days=days)
+        queryset = cls.objects.filter(timestamp__lt=cutoff).order_by()
+        
+        deleted = 0
+        while True:
+            ids = list(queryset.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += cls.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,243 @@
+"""
+Batched purge of expired demo accounts.
+
+``QuerySet.delete()`` on users runs Django's collector, which loads every
+tweet, like, follow, notification and token row of the batch into Python to
+emulate ON DELETE CASCADE. Here each table gets one set-based DELETE per batch
+instead, in dependency order, after the counters of the surviving rows that
+pointed at the purged content have been corrected.
+"""
+import logging
+import os
+from collections import Counter as Tally
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.admin.models import LogEntry
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from core.counters import apply_count_deltas
+from follows.graph import record_changes_on_commit
+from follows.models import Follow, FollowSuggestion
+from notifications.dispatch import build_content
+from notifications.models import Notification, NotificationType
+from tweets.models import (
+    Comment, CommentMediaAttachment, Like, MediaAttachment, Retweet, Tweet, TweetMention
+)
+from users.models import auth_cache_key
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+
+def expired_demo_users(hours=None):
+    """Demo accounts claimed longer ago than the demo account lifetime"""
+    hours = settings.DEMO_ACCOUNT_TTL_HOURS if hours is None else hours
+    return User.objects.filter(
+        is_demo_user=True,
+        demo_claimed_at__lt=timezone.now() - timedelta(hours=hours)
+    ).exclude(email=os.environ.get('DEMO_USER_EMAIL', 'demo@twitterclone.com'))
+
+
+def _raw_delete(queryset):
+    """Delete with a single DELETE statement, skipping the cascade collector"""
+    return queryset._raw_delete(queryset.db)
+
+
+def _grouped(queryset, field):
+    return dict(queryset.order_by().values(field).annotate(count=Count('*')).values_list(field, 'count'))
+
+
+def _detach_purged_actors(user_ids, tweet_ids):
+    """
+    Take purged users out of the coalesced notifications that survive them.
+
+    Rows only remember their most recent actors, so a purged user is taken out
+    of the count where they are still in that sample, and a row whose sender
+    was purged passes to the next actor in it. Rows left without an actor are
+    returned for deletion.
+
+    Returns:
+        list: Ids of the notifications to delete
+    """
+    purged = set(user_ids)
+    acted_on = (
+        Q(sender_id__in=user_ids) |
+        Q(notification_type=NotificationType.LIKE,
+          tweet_id__in=Like.objects.filter(user_id__in=user_ids).values('tweet_id')) |
+        Q(notification_type=NotificationType.RETWEET,
+          tweet_id__in=Retweet.objects.filter(user_id__in=user_ids).values('tweet_id')) |
+        Q(notification_type=NotificationType.FOLLOW, tweet_id__isnull=True,
+          recipient_id__in=Follow.objects.filter(follower_id__in=user_ids).values('following_id'))
+    )
+    candidates = Notification.objects.filter(acted_on).exclude(
+        recipient_id__in=user_ids
+    ).exclude(tweet_id__in=tweet_ids).order_by()
+
+    orphaned, changed = [], []
+    for notification in candidates.iterator():
+        gone = {actor_id for actor_id in notification.recent_actor_ids if actor_id in purged}
+        if notification.sender_id in purged:
+            gone.add(notification.sender_id)
+        if not gone:
+            continue
+        notification.recent_actor_ids = [
+            actor_id for actor_id in notification.recent_actor_ids if actor_id not in purged
+        ]
+        notification.actor_count -= len(gone)
+        if notification.sender_id in purged:
+            if not notification.recent_actor_ids or notification.actor_count < 1:
+                orphaned.append(notification.id)
+                continue
+            notification.sender_id = notification.recent_actor_ids[0]
+        notification.actor_count = max(notification.actor_count, 1)
+        changed.append(notification)
+
+    usernames = dict(
+        User.objects.filter(id__in={notification.sender_id for notification in changed}).values_list('id', 'username')
+    )
+    for notification in changed:
+        notification.content = build_content(
+            notification.notification_type, usernames[notification.sender_id], notification.actor_count
+        )
+    Notification.objects.bulk_update(
+        changed, ['sender', 'actor_count', 'recent_actor_ids', 'content'], batch_size=1000
+    )
+    return orphaned
+
+
+def _fix_survivor_counts(user_ids, tweet_ids, comment_ids):
+    """
+    Take the purged rows out of the counters of everything that stays.
+
+    Returns:
+        list: Ids of surviving notifications left without an actor
+    """
+    following = Follow.objects.filter(follower_id__in=user_ids).exclude(following_id__in=user_ids)
+    followers = Follow.objects.filter(following_id__in=user_ids).exclude(follower_id__in=user_ids)
+    surviving_likes = Like.objects.filter(user_id__in=user_ids).exclude(tweet_id__in=tweet_ids)
+
+    likes_received = _grouped(surviving_likes.filter(tweet__is_deleted=False), 'tweet__author_id')
+    User.adjust_counts({
+        'followers_count': {pk: -count for pk, count in _grouped(following, 'following_id').items()},
+        'following_count': {pk: -count for pk, count in _grouped(followers, 'follower_id').items()},
+        'likes_received': {pk: -count for pk, count in likes_received.items()},
+    })
+
+    surviving_comments = Comment.objects.filter(
+        id__in=comment_ids, is_deleted=False
+    ).exclude(tweet_id__in=tweet_ids)
+    apply_count_deltas(Tweet, {
+        'likes_count': {pk: -count for pk, count in _grouped(surviving_likes, 'tweet_id').items()},
+        'retweet_count': {
+            pk: -count for pk, count in _grouped(
+                Retweet.objects.filter(user_id__in=user_ids).exclude(tweet_id__in=tweet_ids), 'tweet_id'
+            ).items()
+        },
+        'comments_count': {pk: -count for pk, count in _grouped(surviving_comments, 'tweet_id').items()},
+    })
+
+    # Unread notifications of survivors that go: about purged tweets, or with no actor left
+    orphaned = _detach_purged_actors(user_ids, tweet_ids)
+    unread = Notification.objects.filter(
+        Q(id__in=orphaned) | Q(tweet_id__in=tweet_ids),
+        is_read=False
+    ).exclude(recipient_id__in=user_ids)
+    recipients = _grouped(unread, 'recipient_id')
+    transaction.on_commit(lambda: [
+        Notification.adjust_unread_count(pk, -count) for pk, count in recipients.items()
+    ])
+
+    # Keep the follow graph index in step with the follows about to disappear
+    edges = Follow.objects.filter(
+        Q(follower_id__in=user_ids) | Q(following_id__in=user_ids)
+    ).values_list('follower_id', 'following_id')
+    record_changes_on_commit([(follower_id, following_id, False) for follower_id, following_id in edges])
+    return orphaned
+
+
+def purge_batch(user_ids):
+    """
+    Delete a batch of users and everything they own.
+
+    Returns:
+        collections.Counter: Rows deleted per table
+    """
+    deleted = Tally()
+    with transaction.atomic():
+        tweet_ids = list(Tweet.objects.filter(author_id__in=user_ids).values_list('id', flat=True))
+        comment_ids = list(
+            Comment.objects.filter(Q(author_id__in=user_ids) | Q(tweet_id__in=tweet_ids)).values_list('id', flat=True)
+        )
+        orphaned = _fix_survivor_counts(user_ids, tweet_ids, comment_ids)
+
+        # Raw deletes skip User.save(), so drop the cached auth records here
+        auth_keys = [
+            auth_cache_key(pk, version)
+            for pk, version in User.objects.filter(id__in=user_ids).values_list('id', 'token_version')
+        ]
+        transaction.on_commit(lambda: cache.delete_many(auth_keys))
+
+        token_ids = list(OutstandingToken.objects.filter(user_id__in=user_ids).values_list('id', flat=True))
+        plan = [
+            (BlacklistedToken, Q(token_id__in=token_ids)),
+            (OutstandingToken, Q(id__in=token_ids)),
+            (Notification, Q(recipient_id__in=user_ids) | Q(id__in=orphaned) | Q(tweet_id__in=tweet_ids)),
+            (TweetMention, Q(user_id__in=user_ids) | Q(tweet_id__in=tweet_ids)),
+            (CommentMediaAttachment, Q(comment_id__in=comment_ids)),
+            (Comment, Q(id__in=comment_ids)),
+            (Like, Q(user_id__in=user_ids) | Q(tweet_id__in=tweet_ids)),
+            (Retweet, Q(user_id__in=user_ids) | Q(tweet_id__in=tweet_ids)),
+            (MediaAttachment, Q(tweet_id__in=tweet_ids)),
+            (Tweet, Q(id__in=tweet_ids)),
+            (Follow, Q(follower_id__in=user_ids) | Q(following_id__in=user_ids)),
+            (FollowSuggestion, Q(user_id__in=user_ids) | Q(suggested_user_id__in=user_ids)),
+            (LogEntry, Q(user_id__in=user_ids)),
+            (User.groups.through, Q(user_id__in=user_ids)),
+            (User.user_permissions.through, Q(user_id__in=user_ids)),
+            (User, Q(id__in=user_ids)),
+        ]
+        for model, condition in plan:
+            count = _raw_delete(model.objects.filter(condition))
+            if count:
+                deleted[model._meta.label] += count
+    return deleted
+
+
+def purge_expired_demo_users(hours=None, batch_size=200, max_batches=None, progress=None):
+    """
+    Purge expired demo accounts in bounded batches.
+
+    Batches walk the expired accounts in id order, each in its own
+    transaction, so an interrupted run loses at most one batch of work and the
+    next run simply continues with what is left.
+
+    Args:
+        progress: Optional callable receiving (batch number, last user id, rows deleted)
+
+    Returns:
+        collections.Counter: Rows deleted per table
+    """
+    users = expired_demo_users(hours).order_by('id')
+    total = Tally()
+    last_id = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        user_ids = list(users.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+        if not user_ids:
+            break
+
+        deleted = purge_batch(user_ids)
+        total.update(deleted)
+        last_id = user_ids[-1]
+        batches += 1
+        logger.info("Purged demo batch %s up to user %s: %s", batches, last_id, dict(deleted))
+        if progress:
+            progress(batches, last_id, deleted)
+    return total
@@ -2,11 +2,12 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 import logging
 import traceback
 
+from .jwt import VersionedRefreshToken
+
 # Set up logger
 logger = logging.getLogger(__name__)
 
@@ -19,10 +20,26 @@ class UserSerializer(serializers.ModelSerializer):
                   'followers_count', 'following_count', 'created_at', 'is_demo_user')
 
 
+def get_login_user_data(user):
+    """User details returned alongside the tokens on login"""
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'bio': user.bio,
+        'location': user.location,
+        'profile_picture': user.profile_picture.url if user.profile_picture else None,
+        'followers_count': user.followers_count,
+        'following_count': user.following_count,
+        'is_demo_user': getattr(user, 'is_demo_user', False),
+    }
+
+
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """Custom token serializer that includes user data in the response"""
     
     username_field = 'email'
+    token_class = VersionedRefreshToken
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -33,7 +50,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     def _get_user_by_username(self, username):
         """Helper method to find user by username"""
         try:
-            user = User.objects.get(username=username)
+            user = User.objects.get_by_username(username)
             logger.debug(f"Found user email: {user.email}")
             return user
         except User.DoesNotExist:
@@ -84,21 +101,8 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     
     def _add_user_data_to_response(self, data):
         """Helper method to add user data to response"""
-        user = self.user
-        logger.debug(f"Authentication successful for user: {user.email}")
-        data.update({
-            'user': {
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'bio': user.bio,
-                'location': user.location,
-                'profile_picture': user.profile_picture.url if user.profile_picture else None,
-                'followers_count': user.followers_count,
-                'following_count': user.following_count,
-                'is_demo_user': getattr(user, 'is_demo_user', False),
-            }
-        })
+        logger.debug(f"Authentication successful for user: {self.user.email}")
+        data['user'] = get_login_user_data(self.user)
         return data
     
     def validate(self, attrs):
@@ -151,7 +155,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
             if email:
                 user = User.objects.filter(email=email).first()
             else:
-                user = User.objects.filter(username=username).first()
+                user = User.objects.get_by_username(username)
                 
             if user:
                 self._check_user_is_active(user)
@@ -175,6 +179,11 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
             )
 
 
+class VersionedTokenRefreshSerializer(TokenRefreshSerializer):
+    """Token refresh using the cached blacklist check"""
+    token_class = VersionedRefreshToken
+
+
 class RegistrationSerializer(serializers.ModelSerializer):
     """Serializer for user registration"""
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
@@ -287,6 +296,6 @@ class LogoutSerializer(serializers.Serializer):
     
     def save(self, **kwargs):
         try:
-            RefreshToken(self.token).blacklist()
+            VersionedRefreshToken(self.token).blacklist()
         except Exception as e:
             raise serializers.ValidationError(str(e)) 
\ No newline at end of file
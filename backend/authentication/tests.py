@@ -1,7 +1,7 @@
 import pytest
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from rest_framework.test import APIClient, APITestCase
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase
 from rest_framework import status
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
@@ -10,6 +10,24 @@ from django.core import mail
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.test import override_settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from datetime import timedelta
+from io import StringIO
+
+from follows.models import Follow
+from notifications.dispatch import emit
+from notifications.models import Notification, NotificationType
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from tweets.models import Comment, Like, Retweet, Tweet
+from users.models import auth_cache_key
+from .jwt import CachedJWTAuthentication, VersionedRefreshToken, load_blacklist_cache
+from .models import FailedLoginAttempt
+from .purge import purge_expired_demo_users
+from .utils import claim_demo_user, demo_pool_queryset, refill_demo_pool
 
 User = get_user_model()
 
@@ -40,7 +58,9 @@ def inactive_user():
 @pytest.fixture(autouse=True)
 def disable_throttling(settings):
     print("TESTING flag:", settings.TESTING)  # Debug print
+    # Keep the authentication classes: views imported meanwhile capture them for good
     settings.REST_FRAMEWORK = {
+        **settings.REST_FRAMEWORK,
         'DEFAULT_THROTTLE_CLASSES': [],
         'DEFAULT_THROTTLE_RATES': {}
     }
@@ -255,6 +275,10 @@ class TestPasswordReset:
         response = api_client.post(url, data, format='json')
         assert response.status_code == status.HTTP_200_OK
         assert response.data['message'] == 'Password reset successful'
+        # Tokens issued before the reset are revoked
+        version = create_user.token_version
+        create_user.refresh_from_db()
+        assert create_user.token_version == version + 1
         
         # Verify user can login with new password
         login_url = reverse('auth:login')
@@ -392,9 +416,7 @@ class TestDemoLogin:
         # Different sessions should get different users
         assert user1_email != user2_email
         
-        # NOTE: This test confirms unique demo accounts are created
-        # for different sessions, which is the intended behavior in utils.setup_demo_user
-        # when a unique session_id is provided each time
+        # NOTE: This test confirms every demo login claims its own pooled account
     
     def test_demo_login_with_rate_limit(self, api_client):
         """Test that demo login respects rate limiting"""
@@ -414,3 +436,304 @@ class TestDemoLogin:
         finally:
             # Restore TESTING flag
             settings.TESTING = original_testing
+
+@pytest.mark.django_db
+class TestLoginLockout:
+    @pytest.fixture(autouse=True)
+    def lockout_settings(self, settings):
+        cache.clear()
+        settings.LOGIN_LOCKOUT_EMAIL_LIMIT = 3
+        settings.LOGIN_LOCKOUT_IP_LIMIT = 5
+        settings.LOGIN_AUDIT_SAMPLE_RATE = 0
+        yield
+        cache.clear()
+
+    def test_email_is_locked_after_limit(self, django_assert_num_queries):
+        for _ in range(3):
+            FailedLoginAttempt.record_failed_attempt('Test@Example.com', '10.0.0.1')
+
+        # The checks never touch the database
+        with django_assert_num_queries(0):
+            assert FailedLoginAttempt.is_account_locked('test@example.com')
+            assert FailedLoginAttempt.is_blocked('test@example.com', '10.0.0.2')
+            assert not FailedLoginAttempt.is_blocked('other@example.com', '10.0.0.2')
+
+        # Only the attempt that tripped the lockout is audited
+        assert FailedLoginAttempt.objects.count() == 1
+
+    def test_ip_is_blocked_across_emails(self):
+        for i in range(5):
+            FailedLoginAttempt.record_failed_attempt(f'user{i}@example.com', '10.0.0.1')
+
+        assert FailedLoginAttempt.is_blocked('new@example.com', '10.0.0.1')
+
+    def test_previous_window_counts_partially(self):
+        _, previous, elapsed = FailedLoginAttempt._window_keys('email', 'test@example.com')
+        cache.set(previous, 10)
+
+        counts = FailedLoginAttempt.failure_counts('test@example.com', None)
+
+        assert counts['email'] == pytest.approx(10 * (1 - elapsed), abs=0.1)
+
+    def test_blocked_login_returns_429_and_success_clears(self, api_client, create_user):
+        for _ in range(3):
+            FailedLoginAttempt.record_failed_attempt('test@example.com', '10.0.0.1')
+        data = {'email': 'test@example.com', 'password': 'StrongPassword123!'}
+
+        response = api_client.post(reverse('auth:login'), data, format='json')
+        assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+        FailedLoginAttempt.clear_failed_attempts('test@example.com')
+        response = api_client.post(reverse('auth:login'), data, format='json')
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_counts_come_from_the_database_without_a_shared_cache(self, settings, django_assert_num_queries):
+        settings.SHARED_CACHE = False
+        for _ in range(3):
+            FailedLoginAttempt.record_failed_attempt('Test@Example.com', '10.0.0.1')
+        old = FailedLoginAttempt.objects.create(email='test@example.com', ip_address='10.0.0.3')
+        FailedLoginAttempt.objects.filter(pk=old.pk).update(timestamp=timezone.now() - timedelta(hours=2))
+
+        # One COUNT per counter
+        with django_assert_num_queries(2):
+            assert FailedLoginAttempt.is_blocked('test@example.com', '10.0.0.3')
+        assert FailedLoginAttempt.failure_counts('test@example.com', '10.0.0.3') == {'email': 3, 'ip': 0}
+
+        FailedLoginAttempt.clear_failed_attempts('TEST@example.com')
+        assert not FailedLoginAttempt.is_account_locked('test@example.com')
+        assert FailedLoginAttempt.objects.count() == 1
+
+    def test_prune_deletes_old_audit_rows(self):
+        old = FailedLoginAttempt.objects.create(email='a@example.com', ip_address='10.0.0.1')
+        FailedLoginAttempt.objects.filter(pk=old.pk).update(timestamp=timezone.now() - timedelta(days=40))
+        FailedLoginAttempt.objects.create(email='a@example.com', ip_address='10.0.0.1')
+
+        assert FailedLoginAttempt.prune(days=30) == 1
+        assert FailedLoginAttempt.objects.count() == 1
+
+
+@pytest.mark.django_db
+class TestDemoPool:
+    def test_refill_tops_up_to_size(self):
+        assert refill_demo_pool(3) == 3
+        assert refill_demo_pool(5) == 2
+        assert demo_pool_queryset().count() == 5
+        # The shared demo account is never part of the pool
+        assert not demo_pool_queryset().filter(email='demo@twitterclone.com').exists()
+
+    def test_claimed_accounts_leave_the_pool(self):
+        refill_demo_pool(2)
+
+        first, second = claim_demo_user(), claim_demo_user()
+
+        assert first.pk != second.pk
+        assert first.demo_claimed_at is not None
+        assert not first.has_usable_password()
+        assert demo_pool_queryset().count() == 0
+
+    def test_empty_pool_creates_an_account(self):
+        user = claim_demo_user()
+        assert user.is_demo_user
+        assert user.demo_claimed_at is not None
+
+    def test_demo_login_uses_the_pool_without_hashing(self, api_client, monkeypatch):
+        refill_demo_pool(1)
+        pooled = demo_pool_queryset().get()
+
+        def fail(*args, **kwargs):
+            raise AssertionError('Password hashing on demo login')
+        monkeypatch.setattr('django.contrib.auth.hashers.PBKDF2PasswordHasher.encode', fail)
+
+        response = api_client.post(reverse('auth:demo_login'), {}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['user']['id'] == pooled.id
+        assert response.data['user']['is_demo_user'] is True
+        assert 'access' in response.data
+
+
+@pytest.mark.django_db
+class TestDemoPurge:
+    def test_purges_expired_accounts_and_fixes_survivor_counts(self, create_user, django_capture_on_commit_callbacks):
+        expired, active = claim_demo_user(), claim_demo_user()
+        User.objects.filter(pk=expired.pk).update(demo_claimed_at=timezone.now() - timedelta(hours=25))
+        survivor = create_user
+        survivor_tweet = Tweet.objects.create(content='Stays', author=survivor)
+        demo_tweet = Tweet.objects.create(content='Goes', author=expired)
+        RefreshToken.for_user(expired)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Follow.objects.create(follower=expired, following=survivor)
+            Follow.objects.create(follower=survivor, following=expired)
+        Like.objects.create(tweet=survivor_tweet, user=expired)
+        Like.objects.create(tweet=demo_tweet, user=survivor)
+        Retweet.objects.create(tweet=survivor_tweet, user=expired)
+        Comment.objects.create(tweet=survivor_tweet, author=expired, content='Hi')
+        Tweet.objects.filter(pk=survivor_tweet.pk).update(likes_count=1, retweet_count=1, comments_count=1)
+        User.adjust_counts({'likes_received': {survivor.pk: 1}})
+
+        with django_capture_on_commit_callbacks(execute=True):
+            deleted = purge_expired_demo_users(hours=24)
+
+        assert deleted['users.User'] == 1
+        assert not User.objects.filter(pk=expired.pk).exists()
+        assert User.objects.filter(pk=active.pk).exists()
+        assert not Tweet.objects.filter(pk=demo_tweet.pk).exists()
+        assert not Follow.objects.exists()
+        assert not Notification.objects.filter(sender=expired.pk).exists()
+
+        survivor.refresh_from_db()
+        survivor_tweet.refresh_from_db()
+        assert (survivor.followers_count, survivor.following_count, survivor.likes_received) == (0, 0, 0)
+        assert (survivor_tweet.likes_count, survivor_tweet.retweet_count, survivor_tweet.comments_count) == (0, 0, 0)
+
+    def test_purged_actor_leaves_coalesced_notifications(self, create_user, django_capture_on_commit_callbacks):
+        expired = claim_demo_user()
+        User.objects.filter(pk=expired.pk).update(demo_claimed_at=timezone.now() - timedelta(hours=25))
+        survivor, other = create_user, User.objects.create_user(
+            username='other', email='other@example.com', password='StrongPassword123!'
+        )
+        survivor_tweet = Tweet.objects.create(content='Stays', author=survivor)
+        Like.objects.create(tweet=survivor_tweet, user=other)
+        Like.objects.create(tweet=survivor_tweet, user=expired)
+        with django_capture_on_commit_callbacks(execute=True):
+            emit(survivor.id, other, NotificationType.LIKE, tweet_id=survivor_tweet.id)
+            emit(survivor.id, expired, NotificationType.LIKE, tweet_id=survivor_tweet.id)
+            emit(survivor.id, expired, NotificationType.FOLLOW)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            purge_expired_demo_users(hours=24)
+
+        notification = Notification.objects.get(recipient=survivor)
+        assert notification.notification_type == NotificationType.LIKE
+        assert (notification.sender_id, notification.actor_count) == (other.id, 1)
+        assert notification.recent_actor_ids == [other.id]
+        assert notification.content == 'other liked your tweet'
+        assert Notification.unread_count(survivor.id) == 1
+
+    def test_demo_login_does_not_purge(self, api_client):
+        expired = claim_demo_user()
+        User.objects.filter(pk=expired.pk).update(demo_claimed_at=timezone.now() - timedelta(hours=25))
+
+        api_client.post(reverse('auth:demo_login'), {}, format='json')
+
+        assert User.objects.filter(pk=expired.pk).exists()
+
+
+@pytest.mark.django_db
+class TestCachedJWTAuthentication:
+    def authenticate(self, token):
+        # Called directly: views capture their authentication classes at import
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token.access_token}')
+        user, _ = CachedJWTAuthentication().authenticate(request)
+        return user
+
+    def test_request_user_is_served_from_the_cache(self, create_user, django_assert_num_queries):
+        token = VersionedRefreshToken.for_user(create_user)
+        self.authenticate(token)
+
+        with django_assert_num_queries(0):
+            user = self.authenticate(token)
+        assert user.pk == create_user.pk
+        assert user.email == create_user.email
+
+    def test_hydrated_user_saves_without_touching_the_password(self, create_user):
+        token = VersionedRefreshToken.for_user(create_user)
+        self.authenticate(token)
+
+        user = self.authenticate(token)
+        user.bio = 'Cached'
+        user.save()
+
+        create_user.refresh_from_db()
+        assert create_user.bio == 'Cached'
+        assert create_user.check_password('StrongPassword123!')
+
+    def test_deactivation_applies_on_the_next_request(self, create_user, django_capture_on_commit_callbacks):
+        token = VersionedRefreshToken.for_user(create_user)
+        self.authenticate(token)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            create_user.is_active = False
+            create_user.save()
+
+        with pytest.raises(AuthenticationFailed):
+            self.authenticate(token)
+
+    @pytest.mark.parametrize('field, value', [('is_active', False), ('is_deleted', True)])
+    def test_cached_record_of_a_disabled_user_is_refused(self, create_user, field, value):
+        token = VersionedRefreshToken.for_user(create_user)
+        user = self.authenticate(token)
+        # Simulate a record cached just before the account was disabled
+        setattr(user, field, value)
+        key = auth_cache_key(user.pk, user.token_version)
+        authentication = CachedJWTAuthentication()
+        cache.set(key, tuple(f.get_prep_value(getattr(user, f.attname)) for f in authentication.cached_fields()))
+
+        with pytest.raises(AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_password_change_revokes_issued_tokens(self, create_user, django_capture_on_commit_callbacks):
+        token = VersionedRefreshToken.for_user(create_user)
+        self.authenticate(token)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            create_user.set_password('AnotherPassword456!')
+            create_user.revoke_tokens()
+            create_user.save()
+
+        with pytest.raises(AuthenticationFailed):
+            self.authenticate(token)
+        assert self.authenticate(VersionedRefreshToken.for_user(create_user)).pk == create_user.pk
+
+    def test_password_hash_upgrade_keeps_tokens(self, create_user, django_capture_on_commit_callbacks):
+        # check_password() saves upgraded hashes with update_fields=['password']
+        with django_capture_on_commit_callbacks(execute=True):
+            create_user.set_password('StrongPassword123!')
+            create_user.save(update_fields=['password'])
+        token = VersionedRefreshToken.for_user(create_user)
+
+        assert self.authenticate(token).pk == create_user.pk
+
+
+@pytest.mark.django_db
+class TestTokenBlacklist:
+    def test_refresh_skips_the_blacklist_query_once_loaded(self, api_client, create_user, django_assert_num_queries):
+        refresh = str(VersionedRefreshToken.for_user(create_user))
+        load_blacklist_cache()
+
+        # Only the user lookup of the refresh serializer
+        with django_assert_num_queries(1):
+            response = api_client.post(reverse('auth:token_refresh'), {'refresh': refresh}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_blacklisted_token_is_rejected(self, api_client, create_user):
+        blacklisted = VersionedRefreshToken.for_user(create_user)
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=blacklisted['jti']))
+        cache.clear()
+
+        # Loading picks up tokens blacklisted elsewhere
+        assert load_blacklist_cache() == 1
+        response = api_client.post(reverse('auth:token_refresh'), {'refresh': str(blacklisted)}, format='json')
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+        # Newly blacklisted tokens are added to the cached set
+        token = VersionedRefreshToken.for_user(create_user)
+        token.blacklist()
+        response = api_client.post(reverse('auth:token_refresh'), {'refresh': str(token)}, format='json')
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_compaction_deletes_expired_tokens(self, create_user):
+        tokens = [VersionedRefreshToken.for_user(create_user) for _ in range(3)]
+        for token in tokens[:2]:
+            token.blacklist()
+        OutstandingToken.objects.filter(jti__in=[tokens[0]['jti'], tokens[2]['jti']]).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+
+        out = StringIO()
+        call_command('compact_tokens', batch_size=1, stdout=out)
+
+        assert list(OutstandingToken.objects.values_list('jti', flat=True)) == [tokens[1]['jti']]
+        assert BlacklistedToken.objects.count() == 1
+        assert 'Deleted 2 expired tokens, 1 blacklisted tokens cached' in out.getvalue()
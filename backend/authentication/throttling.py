@@ -1,8 +1,9 @@
-from rest_framework.throttling import AnonRateThrottle
 from django.conf import settings
 
+from core.throttling import AnonGCRAThrottle
 
-class AuthRateThrottle(AnonRateThrottle):
+
+class AuthRateThrottle(AnonGCRAThrottle):
     """
     Throttle for authentication endpoints to prevent brute force attacks.
     Limits the rate of API calls that can be made by a given IP.
@@ -23,7 +24,7 @@ class AuthRateThrottle(AnonRateThrottle):
         return super().get_cache_key(request, view)
 
 
-class LoginRateThrottle(AnonRateThrottle):
+class LoginRateThrottle(AnonGCRAThrottle):
     """
     Throttle specifically for login attempts.
     This can be used to implement account lockout after multiple failed attempts.
@@ -1,11 +1,11 @@
 from django.urls import path
 from django.http import JsonResponse
-from rest_framework_simplejwt.views import TokenRefreshView
 
 app_name = 'auth'
 
 from .views import (
     CustomTokenObtainPairView,
+    CustomTokenRefreshView,
     RegistrationView,
     EmailVerificationView,
     PasswordResetRequestView,
@@ -41,7 +41,7 @@ urlpatterns = [
     path('login/', CustomTokenObtainPairView.as_view(), name='login'),
     path('demo-login/', DemoUserLoginView.as_view(), name='demo_login'),
     path('logout/', LogoutView.as_view(), name='logout'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/refresh/', CustomTokenRefreshView.as_view(), name='token_refresh'),
     
     # Email verification
     path('verify-email/', EmailVerificationView.as_view(), name='verify_email'),
@@ -13,6 +13,9 @@ import traceback
 
 logger = logging.getLogger(__name__)
 
+# Unclaimed pool accounts a demo login tries to claim
+DEMO_CLAIM_CANDIDATES = 10
+
 def send_password_reset_email(user_email, reset_url):
     """
     Send password reset email with HTML template
@@ -84,77 +87,76 @@ def send_verification_email(user_email, verification_url):
         logger.error(f"Failed to send verification email to {user_email}. Error: {str(e)}")
         raise e
 
-def setup_demo_user(session_id=None):
-    """
-    Creates or returns a unique demo user account.
+def _new_demo_user():
+    """Build (without saving) a pooled demo account with an unusable password"""
+    User = get_user_model()
+    base_email = os.environ.get('DEMO_USER_EMAIL', 'demo@twitterclone.com')
+    base_username = os.environ.get('DEMO_USER_USERNAME', 'demo_user')
     
-    If a session_id is provided, tries to create a unique demo account for that session.
-    Otherwise, returns the default demo account.
+    random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=10))
+    unique_suffix = f"{timezone.now().strftime('%m%d%H%M')}_{random_suffix}"
+    user = User(
+        username=f"{base_username}_{unique_suffix}",
+        email=base_email.replace('@', f"+{unique_suffix}@"),
+        is_active=True,
+        is_demo_user=True,
+        bio=f'👋 This is a unique demo account (#{unique_suffix}). Some actions are restricted. Sign up to get full access!',
+        location='Demo World 🌍'
+    )
+    # Pooled accounts are only reachable through demo login, so there is no password to hash
+    user.set_unusable_password()
+    return user
+
+def demo_pool_queryset():
+    """Demo accounts that are ready to be handed out"""
+    User = get_user_model()
+    return User.objects.filter(is_demo_user=True, demo_claimed_at__isnull=True).exclude(
+        email=os.environ.get('DEMO_USER_EMAIL', 'demo@twitterclone.com')
+    )
+
+def refill_demo_pool(size=None):
+    """
+    Top the pool of unclaimed demo accounts up to ``size``.
     
-    Args:
-        session_id (str, optional): A unique identifier for the user session
-        
     Returns:
-        tuple: (user, created) - The user object and a boolean indicating if created
+        int: Number of accounts created
     """
     User = get_user_model()
+    size = settings.DEMO_POOL_SIZE if size is None else size
+    missing = size - demo_pool_queryset().count()
+    if missing <= 0:
+        return 0
+    User.objects.bulk_create([_new_demo_user() for _ in range(missing)], batch_size=500)
+    return missing
+
+def claim_demo_user():
+    """
+    Hand out a demo account from the pool.
     
-    # Base demo user credentials (from env or fallbacks)
-    base_email = os.environ.get('DEMO_USER_EMAIL', 'demo@twitterclone.com')
-    base_username = os.environ.get('DEMO_USER_USERNAME', 'demo_user')
-    demo_password = os.environ.get('DEMO_USER_PASSWORD', 'Demo@123')
-    
-    # If no session_id is provided, use the default demo account
-    if not session_id:
-        try:
-            user = User.objects.get(email=base_email)
-            # Make sure the is_demo_user is set to True
-            if not getattr(user, 'is_demo_user', False):
-                user.is_demo_user = True
-                user.save(update_fields=['is_demo_user'])
-            return user, False
-        except User.DoesNotExist:
-            user = User.objects.create_user(
-                username=base_username,
-                email=base_email,
-                password=demo_password,
-                is_active=True,
-                is_demo_user=True,
-                bio='👋 This is a demo account. Some actions are restricted. Sign up to get full access!',
-                location='Demo World 🌍'
-            )
-            return user, True
-    
-    # Create a unique suffix based on session_id
-    # Generate a random suffix even with session_id to prevent username guessing
-    random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=6))
-    timestamp = timezone.now().strftime('%m%d%H%M')
-    unique_suffix = f"{timestamp}_{random_suffix}"
+    Claiming is a conditional UPDATE, so concurrent logins never get the same
+    account. Falls back to creating an account when the pool is empty.
     
-    # Create unique credentials for this session
-    email = base_email.replace('@', f"+{unique_suffix}@")
-    username = f"{base_username}_{unique_suffix}"
+    Returns:
+        User: The claimed demo account
+    """
+    User = get_user_model()
+    now = timezone.now()
     
-    # Check if this unique demo user already exists
-    try:
-        user = User.objects.get(email=email)
-        # Make sure the is_demo_user is set to True
-        if not getattr(user, 'is_demo_user', False):
-            user.is_demo_user = True
-            user.save(update_fields=['is_demo_user'])
-        return user, False
-    except User.DoesNotExist:
-        # Create a new unique demo user
-        user = User.objects.create_user(
-            username=username,
-            email=email,
-            password=demo_password,
-            is_active=True,
-            is_demo_user=True,
-            bio=f'👋 This is a unique demo account (#{unique_suffix}). Some actions are restricted. Sign up to get full access!',
-            location='Demo World 🌍'
+    # Spread concurrent logins over a few candidates instead of racing for the first one
+    candidates = list(demo_pool_queryset().values_list('id', flat=True)[:DEMO_CLAIM_CANDIDATES])
+    random.shuffle(candidates)
+    for user_id in candidates:
+        claimed = User.objects.filter(pk=user_id, demo_claimed_at__isnull=True).update(
+            demo_claimed_at=now, last_login=now
         )
-        return user, True
+        if claimed:
+            return User.objects.get(pk=user_id)
+    
+    logger.warning("Demo account pool is empty, creating an account inline")
+    user = _new_demo_user()
+    user.demo_claimed_at = user.last_login = now
+    user.save()
+    return user
 
 def send_password_reset_success_email(email, login_url):
     """Send a password reset success notification email."""
@@ -9,7 +9,6 @@ from rest_framework import status, generics, permissions, serializers
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
@@ -18,26 +17,26 @@ from django.core.validators import validate_email
 from django.utils.html import strip_tags
 from django.template.loader import render_to_string
 import traceback
-import os
-import uuid
 import logging
 from django.urls import reverse
-from datetime import datetime, timedelta
 from django.utils import timezone
 
 from .throttling import AuthRateThrottle, LoginRateThrottle
 from .serializers import (
     UserSerializer,
     CustomTokenObtainPairSerializer,
+    get_login_user_data,
     RegistrationSerializer,
     PasswordResetRequestSerializer,
     PasswordResetConfirmSerializer,
     EmailVerificationSerializer,
     LogoutSerializer,
+    VersionedTokenRefreshSerializer,
     ResendVerificationSerializer
 )
+from .jwt import VersionedRefreshToken
 from .models import FailedLoginAttempt
-from .utils import send_password_reset_email, send_verification_email, setup_demo_user, send_password_reset_success_email, send_account_activation_success_email
+from .utils import send_password_reset_email, send_verification_email, claim_demo_user, send_password_reset_success_email, send_account_activation_success_email
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -117,10 +116,10 @@ class CustomTokenObtainPairView(TokenObtainPairView):
             if email and '@' in email:
                 user = User.objects.get(email=email)
             elif username:
-                user = User.objects.get(username=username)
+                user = User.objects.get_by_username(username)
             elif email:
                 # Try to find by username if email doesn't have @ symbol
-                user = User.objects.get(username=email)
+                user = User.objects.get_by_username(email)
             else:
                 raise User.DoesNotExist()
             
@@ -384,7 +383,7 @@ class RegistrationView(generics.CreateAPIView):
             email.send(fail_silently=False)
             
             # Generate tokens
-            refresh = RefreshToken.for_user(user)
+            refresh = VersionedRefreshToken.for_user(user)
             
             return Response({
                 'refresh': str(refresh),
@@ -646,6 +645,8 @@ class PasswordResetConfirmView(APIView):
                 if default_token_generator.check_token(user, serializer.validated_data['token']):
                     # Set new password
                     user.set_password(serializer.validated_data['password'])
+                    # Sessions opened with the old password end too
+                    user.revoke_tokens()
                     user.save()
                     
                     # Determine correct frontend URL based on request origin
@@ -769,6 +770,11 @@ class ResendVerificationView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class CustomTokenRefreshView(TokenRefreshView):
+    """Token refresh that checks the blacklist through the cache"""
+    serializer_class = VersionedTokenRefreshSerializer
+
+
 class LogoutView(APIView):
     """View for logging out and blacklisting the refresh token"""
     serializer_class = LogoutSerializer
@@ -839,56 +845,24 @@ class DemoUserLoginView(CustomTokenObtainPairView):
                         status=status.HTTP_429_TOO_MANY_REQUESTS
                     )
             
-            # Generate a unique session ID from request data with timestamp
-            client_ip = self.get_client_ip(request)
-            user_agent = request.META.get('HTTP_USER_AGENT', '')
-            timestamp = timezone.now().strftime('%Y%m%d%H%M%S')
-            random_component = str(uuid.uuid4())
-            session_id = f"{client_ip}_{timestamp}_{random_component}"
-            
-            # Cleanup old demo accounts (older than 24 hours)
-            cleanup_threshold = timezone.now() - timedelta(hours=24)
-            User.objects.filter(
-                username__startswith='demo_user_',
-                date_joined__lt=cleanup_threshold
-            ).delete()
-            
-            # Create or get a unique demo user for this session
-            demo_user, status_msg = setup_demo_user(session_id)
-            print(f"Demo user created: {demo_user.username}")
-            
-            # Create data dict with the unique demo credentials
-            demo_data = {
-                'email': demo_user.email,
-                'username': demo_user.username,
-                'password': os.environ.get('DEMO_USER_PASSWORD', 'Demo@123')
-            }
-            
-            # Safe logging (with masked password)
-            masked_data = {**demo_data, 'password': '********'}
-            print(f"Demo login attempt with credentials: {masked_data}")
-            
-            # Use the serializer directly
-            serializer = self.get_serializer(data=demo_data)
+            # Expired accounts are removed by purge_demo_users, never on this path.
+            # Claim a ready account and mint its tokens directly; there is no
+            # password to check, so no hashing happens on this path
+            demo_user = claim_demo_user()
+            refresh = VersionedRefreshToken.for_user(demo_user)
             
-            # Log validation errors if any
-            if not serializer.is_valid():
-                print(f"Demo login - Serializer validation errors: {serializer.errors}")
-                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-            
-            # If valid, get response data
-            response_data = serializer.validated_data
-            
-            # Add demo user flag and credentials for client reference
-            response_data['is_demo_user'] = True
-            response_data['demo_credentials'] = {
-                'email': demo_user.email,
-                'username': demo_user.username
+            response_data = {
+                'refresh': str(refresh),
+                'access': str(refresh.access_token),
+                'user': get_login_user_data(demo_user),
+                # Add demo user flag and credentials for client reference
+                'is_demo_user': True,
+                'demo_credentials': {
+                    'email': demo_user.email,
+                    'username': demo_user.username
+                },
+                'demo_message': 'This is a unique demo account created just for your session. Some actions are restricted. Sign up to get full access!',
             }
-            response_data['demo_message'] = 'This is a unique demo account created just for your session. Some actions are restricted. Sign up to get full access!'
-            
-            # Record successful login
-            FailedLoginAttempt.clear_failed_attempts(demo_user.email)
             
             return Response(response_data, status=status.HTTP_200_OK)
             
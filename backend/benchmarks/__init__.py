@@ -0,0 +1,19 @@
+"""
+Load benchmarks for the core API hot paths.
+
+Run from the backend directory against a migrated (ideally seeded) database::
+
+    python -m benchmarks                                  # in-process, Django test client
+    python -m benchmarks --gunicorn --workers 3           # behind a local gunicorn
+    python -m benchmarks --url http://localhost:8000      # against a running server
+    python -m benchmarks --save-baseline benchmarks/baseline.json
+    python -m benchmarks --baseline benchmarks/baseline.json
+
+Each scenario sends a fixed number of requests at a fixed concurrency and
+reports latency percentiles, throughput and queries per request (read from
+the Server-Timing header) as JSON. With ``--baseline`` the run fails when a
+scenario is slower than the baseline by more than the tolerance.
+
+The benchmark creates its own users and tweets in the configured database,
+so point it at a development or benchmark database, never production.
+"""
@@ -0,0 +1,11 @@
+import os
+import sys
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+django.setup()
+
+from benchmarks.runner import main  # noqa: E402  (needs the app registry)
+
+sys.exit(main())
@@ -0,0 +1,262 @@
+"""
+Drive the benchmark scenarios and report, save or compare the results.
+"""
+import argparse
+import json
+import math
+import os
+import re
+import secrets
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import requests as http
+from django.conf import settings
+from django.db import connections
+from django.test import Client
+from django.test.utils import setup_test_environment
+
+from .scenarios import SCENARIOS, BenchData
+
+Sample = namedtuple('Sample', ['latency', 'status', 'queries'])
+
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+# Lower is better for these; higher for throughput
+LATENCY_METRICS = ('p50_ms', 'p95_ms', 'p99_ms')
+
+
+class InProcessTransport:
+    """Requests through the Django test client, one per worker thread"""
+    name = 'in-process'
+
+    def __init__(self, timing_token):
+        self.timing_token = timing_token
+        self.local = threading.local()
+
+    def send(self, call):
+        if not hasattr(self.local, 'client'):
+            self.local.client = Client()
+        headers = {'HTTP_X_SERVER_TIMING_TOKEN': self.timing_token}
+        if call.token:
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {call.token}'
+        kwargs = {}
+        if call.data is not None:
+            kwargs = {'data': json.dumps(call.data), 'content_type': 'application/json'}
+        response = getattr(self.local.client, call.method)(call.path, **kwargs, **headers)
+        return response.status_code, response.get('Server-Timing', '')
+
+    def close(self):
+        # Each worker thread has its own database connections
+        connections.close_all()
+
+
+class HttpTransport:
+    """Requests over HTTP, one session (keep-alive connection) per worker thread"""
+    name = 'http'
+
+    def __init__(self, base_url, timing_token):
+        self.base_url = base_url.rstrip('/')
+        self.timing_token = timing_token
+        self.local = threading.local()
+
+    def send(self, call):
+        if not hasattr(self.local, 'session'):
+            self.local.session = http.Session()
+        headers = {}
+        if self.timing_token:
+            headers['X-Server-Timing-Token'] = self.timing_token
+        if call.token:
+            headers['Authorization'] = f'Bearer {call.token}'
+        response = self.local.session.request(
+            call.method, self.base_url + call.path, json=call.data, headers=headers, timeout=60
+        )
+        return response.status_code, response.headers.get('Server-Timing', '')
+
+    def close(self):
+        if hasattr(self.local, 'session'):
+            self.local.session.close()
+
+
+def parse_queries(server_timing):
+    match = QUERIES_RE.search(server_timing or '')
+    return int(match.group(1)) if match else None
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    return values[max(math.ceil(p / 100 * len(values)) - 1, 0)]
+
+
+def summarize(samples, wall_time):
+    latencies = sorted(sample.latency * 1000 for sample in samples)
+    # The median ignores one-off queries, such as a worker's first authentication
+    queries = sorted(sample.queries for sample in samples if sample.queries is not None)
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample.status >= 400),
+        'p50_ms': round(percentile(latencies, 50), 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95), 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 2) if latencies else None,
+        'throughput_rps': round(len(samples) / wall_time, 2) if wall_time else None,
+        'queries_per_request': percentile(queries, 50),
+    }
+
+
+def run_scenario(transport, scenario, data, requests, concurrency):
+    """Send ``requests`` calls from ``concurrency`` closed-loop workers"""
+    samples = []
+    lock = threading.Lock()
+    issued = iter(range(requests))
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    i = next(issued, None)
+                if i is None:
+                    return
+                call = scenario(data, i)
+                start = time.perf_counter()
+                try:
+                    status, timing = transport.send(call)
+                except Exception:
+                    status, timing = 599, ''
+                sample = Sample(time.perf_counter() - start, status, parse_queries(timing))
+                with lock:
+                    samples.append(sample)
+        finally:
+            transport.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(samples, time.perf_counter() - start)
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare scenario results with a baseline report.
+
+    Returns:
+        tuple: ({scenario: {metric: {baseline, current, change}}}, [regressions])
+    """
+    comparison = {}
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        comparison[name] = {}
+        for metric in LATENCY_METRICS + ('throughput_rps', 'queries_per_request'):
+            before, after = previous.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            comparison[name][metric] = {'baseline': before, 'current': after, 'change': round(change, 4)}
+            if metric in LATENCY_METRICS and change > tolerance:
+                regressions.append(f'{name} {metric} {before} -> {after} (+{change:.0%})')
+            elif metric == 'throughput_rps' and change < -tolerance:
+                regressions.append(f'{name} {metric} {before} -> {after} ({change:.0%})')
+            elif metric == 'queries_per_request' and after > before:
+                # Query counts are deterministic, so any growth is a regression
+                regressions.append(f'{name} {metric} {before} -> {after}')
+    return comparison, regressions
+
+
+@contextmanager
+def local_gunicorn(workers, timing_token):
+    """Serve the app with gunicorn on a free local port for the duration of the block"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    url = f'http://127.0.0.1:{port}'
+    process = subprocess.Popen(
+        ['gunicorn', 'core.wsgi:application', '--bind', f'127.0.0.1:{port}', '--workers', str(workers)],
+        env={**os.environ, 'SERVER_TIMING_TOKEN': timing_token},
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                http.get(f'{url}/api/v1/', timeout=1)
+                break
+            except http.ConnectionError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError('gunicorn did not start')
+                time.sleep(0.2)
+        yield url
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmark the core API hot paths')
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent closed-loop clients')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--url', help='Benchmark a running server sharing this database')
+    target.add_argument('--gunicorn', action='store_true', help='Start a local gunicorn to benchmark')
+    parser.add_argument('--workers', type=int, default=3, help='gunicorn workers')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    parser.add_argument('--baseline', help='Report to compare against; regressions fail the run')
+    parser.add_argument('--save-baseline', help='Write this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed relative slowdown')
+    return parser.parse_args(argv)
+
+
+def run(args, transport):
+    data = BenchData(args.requests, args.concurrency)
+    results = {}
+    for name in args.scenarios:
+        results[name] = run_scenario(transport, SCENARIOS[name], data, args.requests, args.concurrency)
+        print(f'{name}: {results[name]}', file=sys.stderr)
+    return {
+        'transport': transport.name,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'scenarios': results,
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    timing_token = secrets.token_hex(16)
+
+    if args.gunicorn:
+        with local_gunicorn(args.workers, timing_token) as url:
+            report = run(args, HttpTransport(url, timing_token))
+    elif args.url:
+        # Queries per request are reported when the server shares this token
+        report = run(args, HttpTransport(args.url, os.environ.get('SERVER_TIMING_TOKEN')))
+    else:
+        setup_test_environment()
+        settings.SERVER_TIMING_TOKEN = timing_token
+        report = run(args, InProcessTransport(timing_token))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['comparison'], regressions = compare(report['scenarios'], json.load(f), args.tolerance)
+        report['regressions'] = regressions
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({key: report[key] for key in ('transport', 'requests', 'concurrency', 'scenarios')}, f, indent=2)
+    return 1 if regressions else 0
@@ -0,0 +1,91 @@
+"""
+Benchmark scenarios and the data they run against.
+
+A scenario turns a request index into a ``Call``. Requests are spread
+round-robin over a pool of benchmark users sized so that no user goes over
+the strictest per-user throttle (login, 20/hour) within one run.
+"""
+import uuid
+from collections import namedtuple
+from urllib.parse import quote
+
+from django.contrib.auth.hashers import make_password
+from rest_framework_simplejwt.tokens import AccessToken
+
+from tweets.models import Tweet
+from users.models import User
+
+PASSWORD = 'BenchmarkPassword123!'
+REQUESTS_PER_USER = 20
+
+Call = namedtuple('Call', ['method', 'path', 'data', 'token'])
+
+
+class BenchData:
+    """Users and tweets created for one benchmark run"""
+
+    def __init__(self, requests, concurrency):
+        run = uuid.uuid4().hex[:8]
+        count = max(concurrency, -(-requests // REQUESTS_PER_USER))
+        # One hash for the whole pool; hashing per user would dominate setup
+        password = make_password(PASSWORD)
+        User.objects.bulk_create([
+            User(username=f'bench_{run}_{i}', email=f'bench_{run}_{i}@bench.invalid', password=password)
+            for i in range(count)
+        ])
+        self.users = list(User.objects.filter(username__startswith=f'bench_{run}_').order_by('id'))
+        self.tokens = [str(AccessToken.for_user(user)) for user in self.users]
+
+        # Each like needs a tweet its user hasn't liked yet
+        self.tag = f'bench{run}'
+        Tweet.objects.bulk_create([
+            Tweet(content=f'Benchmark tweet {i} #{self.tag}', author=self.users[i % count])
+            for i in range(requests)
+        ])
+        self.tweet_ids = list(
+            Tweet.objects.filter(author__in=self.users).order_by('id').values_list('id', flat=True)
+        )
+
+    def user(self, i):
+        return self.users[i % len(self.users)], self.tokens[i % len(self.tokens)]
+
+
+def feed(data, i):
+    _, token = data.user(i)
+    return Call('get', '/api/v1/tweets/feed/', None, token)
+
+
+def search(data, i):
+    _, token = data.user(i)
+    return Call('get', f'/api/v1/tweets/search/?q={quote("#" + data.tag)}', None, token)
+
+
+def tweet_create(data, i):
+    _, token = data.user(i)
+    return Call('post', '/api/v1/tweets/', {'content': f'Benchmark post {i} #{data.tag}'}, token)
+
+
+def like(data, i):
+    _, token = data.user(i)
+    return Call('post', f'/api/v1/tweets/{data.tweet_ids[i % len(data.tweet_ids)]}/like/', None, token)
+
+
+def comment(data, i):
+    _, token = data.user(i)
+    tweet_id = data.tweet_ids[i % len(data.tweet_ids)]
+    return Call('post', f'/api/v1/tweets/{tweet_id}/add_comment/', {'content': f'Benchmark reply {i}'}, token)
+
+
+def login(data, i):
+    user, _ = data.user(i)
+    return Call('post', '/api/v1/auth/login/', {'email': user.email, 'password': PASSWORD}, None)
+
+
+SCENARIOS = {
+    'feed': feed,
+    'search': search,
+    'tweet_create': tweet_create,
+    'like': like,
+    'comment': comment,
+    'login': login,
+}
@@ -0,0 +1,10 @@
+import pytest
+from django.core.cache import cache
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start and end every test with an empty cache, so cached auth records don't leak across tests"""
+    cache.clear()
+    yield
+    cache.clear()
@@ -3,6 +3,10 @@ ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with ``uvicorn core.asgi:application`` to enable the live update
+stream at ``/api/v1/stream/``, and set ``ASYNC_READ_VIEWS=true`` to serve the
+read-heavy tweet endpoints from async views (``tweets.async_views``).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
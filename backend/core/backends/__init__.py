@@ -0,0 +1,5 @@
+"""
+Database backends for production: MySQL and PostgreSQL serving connections
+from the process-wide pools in ``core.pool``, and SQLite tuned for concurrent
+workers.
+"""
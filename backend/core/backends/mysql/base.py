@@ -0,0 +1,19 @@
+from django.db.backends.mysql import base
+
+from core.pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """MySQL backend with pooled connections"""
+
+    @staticmethod
+    def open_connection(conn_params, options):
+        connection = base.Database.connect(**conn_params)
+        # Same workaround as Django's get_new_connection()
+        if connection.encoders.get(bytes) is bytes:
+            connection.encoders.pop(bytes)
+        return connection
+
+    @staticmethod
+    def check_connection(connection):
+        connection.ping()
@@ -0,0 +1,34 @@
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel, is_psycopg3
+
+from core.pool import PooledDatabaseWrapperMixin
+
+if not is_psycopg3:
+    import psycopg2.extras
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """PostgreSQL backend with pooled connections"""
+
+    @staticmethod
+    def open_connection(conn_params, options):
+        # What Django's get_new_connection() does, minus the wrapper state
+        connection = base.Database.connect(**conn_params)
+        if 'isolation_level' in options:
+            connection.isolation_level = IsolationLevel(options['isolation_level'])
+        if not is_psycopg3:
+            psycopg2.extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    @staticmethod
+    def check_connection(connection):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        # Set when Django opens a connection; reused ones keep the configured level
+        self.isolation_level = IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED)
+        )
+        return connection
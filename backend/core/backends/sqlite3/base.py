@@ -0,0 +1,22 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend for several workers sharing one database file.
+
+    Applies the ``PRAGMAS`` of the database settings to every new connection
+    and starts transactions with ``BEGIN IMMEDIATE``: a deferred transaction
+    that reads and then writes can't wait for the write lock (``busy_timeout``
+    doesn't apply to the upgrade), so it fails with "database is locked"
+    instead. Taking the lock up front makes it wait its turn.
+    """
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict.get('PRAGMAS', {}).items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,118 @@
+"""
+Set-based updates for denormalized counter columns.
+"""
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+
+def apply_count_deltas(model, deltas, **updates):
+    """
+    Add per-row deltas to counter columns in a single UPDATE.
+
+    Counters are updated relative to their current value, so concurrent
+    writers don't lose increments, and never go below zero.
+
+    Args:
+        model: Model class holding the counters
+        deltas: {field_name: {pk: delta}}
+        **updates: Other columns to set on every updated row
+
+    Returns:
+        int: Number of rows updated
+    """
+    deltas = {
+        field: {pk: delta for pk, delta in rows.items() if delta}
+        for field, rows in deltas.items()
+    }
+    deltas = {field: rows for field, rows in deltas.items() if rows}
+    if not deltas:
+        return 0
+
+    pks = set()
+    counters = {}
+    for field, rows in deltas.items():
+        pks.update(rows)
+        # Group rows by delta so a batch of +1s is a single WHEN pk IN (...)
+        by_delta = {}
+        for pk, delta in rows.items():
+            by_delta.setdefault(delta, []).append(pk)
+        counters[field] = Case(
+            *[
+                When(pk__in=group, then=Greatest(F(field) + Value(delta), Value(0)))
+                for delta, group in by_delta.items()
+            ],
+            default=F(field),
+            output_field=IntegerField()
+        )
+
+    return model.objects.filter(pk__in=pks).update(**counters, **updates)
+
+
+class Counter:
+    """
+    A denormalized counter column and the rows it counts.
+
+    Args:
+        model: Model holding the counter
+        field: Counter column
+        source: Model whose rows are counted
+        fk: Field (or ``__`` path) of ``source`` pointing at ``model``
+        filters: Extra filters on ``source`` rows (e.g. excluding soft deletes)
+        touch: Timestamp column to bump on fixed rows, for caches keyed on it
+    """
+
+    def __init__(self, model, field, source, fk, filters=None, touch=None):
+        self.model = model
+        self.field = field
+        self.source = source
+        self.fk = fk
+        self.filters = filters or {}
+        self.touch = touch
+
+    @property
+    def label(self):
+        return f'{self.model._meta.label_lower}.{self.field}'
+
+    def max_id(self):
+        return self.model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+    def drift(self, start, end):
+        """
+        Compare stored and actual counts for rows with ``start <= pk < end``.
+
+        One range scan over the counter table and one grouped aggregate over
+        the counted rows, which uses the foreign key index.
+
+        Returns:
+            dict: {pk: (stored, actual)} for the rows that differ
+        """
+        stored = dict(
+            self.model.objects.filter(pk__gte=start, pk__lt=end)
+            .order_by().values_list('pk', self.field)
+        )
+        if not stored:
+            return {}
+
+        fk_id = f'{self.fk}_id'
+        actual = dict(
+            self.source.objects.filter(**{f'{fk_id}__gte': start, f'{fk_id}__lt': end}, **self.filters)
+            .order_by().values(fk_id).annotate(count=Count('*')).values_list(fk_id, 'count')
+        )
+        return {
+            pk: (value, actual.get(pk, 0))
+            for pk, value in stored.items()
+            if value != actual.get(pk, 0)
+        }
+
+    def fix(self, drift):
+        """
+        Apply the differences found by ``drift``.
+
+        Applied as deltas rather than absolute values, so increments made
+        after the counts were read aren't overwritten.
+        """
+        updates = {self.touch: timezone.now()} if self.touch else {}
+        return apply_count_deltas(self.model, {
+            self.field: {pk: actual - stored for pk, (stored, actual) in drift.items()}
+        }, **updates)
@@ -0,0 +1,107 @@
+"""
+In-process pub/sub hub for live updates.
+
+Sync write paths (views running in worker threads) publish events, async SSE
+streams subscribe to topics. Each subscriber owns a bounded asyncio queue:
+when a slow client falls behind, the oldest events are dropped and the client
+is told to resync instead of letting the queue grow without bound.
+
+The hub lives in a single process, so live updates need the app to be served
+by one ASGI process (e.g. ``uvicorn core.asgi:application``), which can hold
+thousands of idle streams as cheap coroutines.
+"""
+import asyncio
+import logging
+import threading
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+FEED_TOPIC = 'feed'
+
+
+def user_topic(user_id):
+    return f'user:{user_id}'
+
+
+class Subscription:
+    """A subscriber's bounded queue of pending events"""
+
+    def __init__(self, topics, maxsize):
+        self.topics = tuple(topics)
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.loop = asyncio.get_running_loop()
+        self.dropped = 0
+
+    def offer(self, message):
+        """Enqueue a message, dropping the oldest one when the client lags behind"""
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def next_message(self, timeout):
+        """Wait for the next message; returns None when the timeout expires"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventHub:
+    """Fans published events out to the subscriptions of a topic"""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._topics = {}
+        self._lock = threading.Lock()
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({sub for subs in self._topics.values() for sub in subs})
+
+    def subscribe(self, topics):
+        """Create a subscription; must be called from the event loop that consumes it"""
+        subscription = Subscription(topics, self.queue_size)
+        with self._lock:
+            for topic in subscription.topics:
+                self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._topics.get(topic)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[topic]
+
+    def publish(self, topic, event, data):
+        """Publish an event to a topic; safe to call from any thread"""
+        with self._lock:
+            subscribers = list(self._topics.get(topic, ()))
+        if not subscribers:
+            return 0
+
+        message = {'event': event, 'data': data}
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, message)
+            except RuntimeError:
+                # The subscriber's loop is gone; it will be cleaned up on exit
+                logger.debug("Dropping event for closed subscription on %s", topic)
+        return len(subscribers)
+
+
+hub = EventHub()
+
+
+def publish_on_commit(topic, event, data):
+    """Publish once the current transaction commits, so clients never see rolled back writes"""
+    transaction.on_commit(lambda: hub.publish(topic, event, data))
@@ -0,0 +1,111 @@
+"""
+Per-request performance metrics.
+
+``core.middleware.PerformanceMiddleware`` creates a ``RequestMetrics`` for each
+request and makes it current. Database queries are timed by a connection
+``execute_wrapper``, cache lookups are counted by the instrumented cache
+backends below, serializer time by ``TimedSerializerMixin`` and connection
+checkout time by the pools in ``core.pool``. Work done outside a request
+(commands, tests calling code directly) isn't recorded.
+"""
+import time
+from contextvars import ContextVar
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+_current = ContextVar('request_metrics', default=None)
+_MISSING = object()
+
+
+class RequestMetrics:
+    """Counters and timings collected while handling one request"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Time spent checking out pooled database connections
+        self.pool_wait = 0.0
+        # Nesting depth of timed serializers, so nested ones aren't counted twice
+        self.serializer_depth = 0
+
+    def activate(self):
+        return _current.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current.reset(token)
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database ``execute_wrapper`` timing every query"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 2),
+            'serializer_ms': round(self.serializer_time * 1000, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'pool_wait_ms': round(self.pool_wait * 1000, 2),
+        }
+
+
+def current_metrics():
+    """Metrics of the request being handled, or None"""
+    return _current.get()
+
+
+class TimedSerializerMixin:
+    """Adds the time spent in ``to_representation`` to the request metrics"""
+
+    def to_representation(self, instance):
+        metrics = _current.get()
+        if metrics is None:
+            return super().to_representation(instance)
+
+        metrics.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializer_depth -= 1
+            if not metrics.serializer_depth:
+                metrics.serializer_time += time.perf_counter() - start
+
+
+class InstrumentedCacheMixin:
+    """Counts cache hits and misses of ``get``"""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version=version)
+        metrics = _current.get()
+        if metrics is not None:
+            if value is _MISSING:
+                metrics.cache_misses += 1
+            else:
+                metrics.cache_hits += 1
+        return default if value is _MISSING else value
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    """``LocMemCache.get_many`` goes through ``get``, so it's counted already"""
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version=version)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.cache_hits += len(found)
+            metrics.cache_misses += len(keys) - len(found)
+        return found
@@ -1,13 +1,49 @@
-class CustomCorsMiddleware:
+import hashlib
+import hmac
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import InterfaceError, OperationalError, connections
+
+from .instrumentation import RequestMetrics
+from .replicas import ReplicaReads, current_reads, mark_down, pick_replica
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCapableMiddleware:
     """
-    Custom middleware to force CORS headers on all responses.
-    This is a failsafe in case the django-cors-headers package isn't working properly.
+    Base for middleware running natively in both sync (WSGI) and async (ASGI)
+    chains. Under ASGI, Django runs sync-only middleware in a thread, and the
+    rest of the chain, async views included, synchronously within it.
+
+    Subclasses return ``self.__acall__(request)`` from ``__call__`` when
+    ``iscoroutinefunction(self)``.
     """
-    
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+
+class CustomCorsMiddleware(AsyncCapableMiddleware):
+    """
+    Custom middleware to force CORS headers on all responses.
+    This is a failsafe in case the django-cors-headers package isn't working properly.
+    """
         
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         # Handle OPTIONS requests directly to support preflight
         if request.method == 'OPTIONS':
             response = self.generate_preflight_response()
@@ -17,6 +53,13 @@ class CustomCorsMiddleware:
         response = self.get_response(request)
         self.add_cors_headers(response)
         return response
+
+    async def __acall__(self, request):
+        if request.method == 'OPTIONS':
+            return self.generate_preflight_response()
+        response = await self.get_response(request)
+        self.add_cors_headers(response)
+        return response
         
     def generate_preflight_response(self):
         """Generate a response for CORS preflight requests"""
@@ -32,4 +75,206 @@ class CustomCorsMiddleware:
         response["Access-Control-Allow-Headers"] = "Origin, Content-Type, Accept, Authorization, X-Request-With"
         # Cannot use both Allow-Origin: * and Allow-Credentials: true, so commenting this out
         # response["Access-Control-Allow-Credentials"] = "true"
-        response["Access-Control-Max-Age"] = "86400"  # 24 hours 
\ No newline at end of file
+        response["Access-Control-Max-Age"] = "86400"  # 24 hours 
+
+class RateLimitHeadersMiddleware(AsyncCapableMiddleware):
+    """
+    Add ``RateLimit-*`` headers to responses of throttled endpoints.
+
+    The values are left on the request by ``core.throttling.GCRAThrottle``.
+    """
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.add_headers(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.add_headers(request, await self.get_response(request))
+
+    @staticmethod
+    def add_headers(request, response):
+        rate_limit = getattr(request, 'rate_limit', None)
+        if rate_limit:
+            response['RateLimit-Limit'] = str(rate_limit['limit'])
+            response['RateLimit-Remaining'] = str(rate_limit['remaining'])
+            response['RateLimit-Reset'] = str(rate_limit['reset'])
+        return response
+
+
+class PerformanceMiddleware(AsyncCapableMiddleware):
+    """
+    Record query count, DB time, serializer time and cache hits per request.
+
+    Every request is logged as one JSON line. Staff users, and clients sending
+    the ``X-Server-Timing-Token`` header (e.g. benchmarks), also get the
+    numbers in a ``Server-Timing`` header.
+    """
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics = RequestMetrics()
+        token = metrics.activate()
+        start = time.perf_counter()
+        try:
+            with self.instrument(metrics):
+                response = self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        return self.record(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = metrics.activate()
+        start = time.perf_counter()
+        # Under ASGI the request's queries run on its sync thread, with that thread's connections
+        stack = await sync_to_async(self.instrument)(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            metrics.deactivate(token)
+        # Checking for staff may load the session user
+        return await sync_to_async(self.record)(request, response, metrics, time.perf_counter() - start)
+
+    @staticmethod
+    def instrument(metrics):
+        """Time the queries run on this thread's connections until the returned stack is closed"""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics))
+        return stack
+
+    def record(self, request, response, metrics, duration):
+        data = metrics.as_dict()
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'endpoint': match.view_name if match else None,
+            'method': request.method,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            **data,
+        }))
+        if self.wants_timing(request):
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={data["db_ms"]};desc="{data["queries"]} queries"',
+                f'pool;dur={data["pool_wait_ms"]}',
+                f'serializer;dur={data["serializer_ms"]}',
+                f'cache;desc="{data["cache_hits"]} hits, {data["cache_misses"]} misses"',
+                f'total;dur={round(duration * 1000, 2)}',
+            ])
+        return response
+
+    def wants_timing(self, request):
+        # DRF sets the authenticated user on the underlying request
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            return True
+        token = settings.SERVER_TIMING_TOKEN
+        sent = request.headers.get('X-Server-Timing-Token')
+        return bool(token and sent and hmac.compare_digest(token, sent))
+
+
+class ReplicaMiddleware(AsyncCapableMiddleware):
+    """
+    Serve the reads of safe requests to views listing the action in their
+    ``replica_actions`` from a read replica (see ``core.replicas``).
+
+    Clients are pinned to the primary for ``REPLICA_PIN_SECONDS`` after any
+    unsafe request, by a cookie and by their bearer token, so they read their
+    own writes. Requests failing on a replica with a connection error are run
+    again on the primary.
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        # process_view picks the replica; the holder is shared with it even
+        # when it runs in another context (ASGI)
+        token = ReplicaReads().activate()
+        try:
+            response = self.get_response(request)
+        finally:
+            ReplicaReads.deactivate(token)
+
+        key = self.pin(request, response)
+        if key:
+            cache.set(key, True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+
+        token = ReplicaReads().activate()
+        try:
+            response = await self.get_response(request)
+        finally:
+            ReplicaReads.deactivate(token)
+
+        key = self.pin(request, response)
+        if key:
+            await cache.aset(key, True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    def pin(self, request, response):
+        """Pin the client of an unsafe request by cookie; returns the cache key pinning its token"""
+        if request.method in self.SAFE_METHODS:
+            return None
+        response.set_cookie(
+            settings.REPLICA_PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+            httponly=True, samesite='Lax', secure=request.is_secure(),
+        )
+        return self.pin_key(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        reads = current_reads()
+        if reads is None or request.method not in self.SAFE_METHODS:
+            return None
+        # DRF viewsets expose the action each method maps to on the view function
+        action = getattr(view_func, 'actions', {}).get(request.method.lower())
+        if action not in getattr(getattr(view_func, 'cls', None), 'replica_actions', ()):
+            return None
+        if self.is_pinned(request):
+            return None
+
+        reads.alias = pick_replica()
+        request._replica_view = (view_func, view_args, view_kwargs)
+        return None
+
+    def process_exception(self, request, exception):
+        reads = current_reads()
+        retry = getattr(request, '_replica_view', None)
+        if reads is None or reads.alias is None or retry is None:
+            return None
+        if not isinstance(exception, (OperationalError, InterfaceError)):
+            return None
+
+        mark_down(reads.alias)
+        reads.alias = None
+        request._replica_view = None
+        view_func, view_args, view_kwargs = retry
+        if iscoroutinefunction(view_func):
+            # Exception middleware runs in a worker thread, async views or not
+            return async_to_sync(view_func)(request, *view_args, **view_kwargs)
+        return view_func(request, *view_args, **view_kwargs)
+
+    def is_pinned(self, request):
+        if settings.REPLICA_PIN_COOKIE in request.COOKIES:
+            return True
+        key = self.pin_key(request)
+        return bool(key and cache.get(key))
+
+    @staticmethod
+    def pin_key(request):
+        # API clients don't send cookies cross-origin, so their token pins them too
+        authorization = request.headers.get('Authorization')
+        if not authorization:
+            return None
+        return f'replicas:pin:{hashlib.sha256(authorization.encode()).hexdigest()[:32]}'
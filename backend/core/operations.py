@@ -0,0 +1,32 @@
+"""
+Migration operations shared by the apps.
+"""
+from django.db.migrations.operations import AddIndex
+
+
+class AddIndexConcurrently(AddIndex):
+    """
+    ``AddIndex`` that builds the index with ``CREATE INDEX CONCURRENTLY`` on
+    PostgreSQL, so writes to the table aren't blocked while it builds. Other
+    backends get a plain ``CREATE INDEX``.
+
+    PostgreSQL can't build indexes concurrently inside a transaction, so
+    migrations using this must set ``atomic = False``.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.add_index(model, self.index, **self.concurrently(schema_editor))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.remove_index(model, self.index, **self.concurrently(schema_editor))
+
+    @staticmethod
+    def concurrently(schema_editor):
+        return {'concurrently': True} if schema_editor.connection.vendor == 'postgresql' else {}
+
+    def describe(self):
+        return f"{super().describe()} concurrently"
@@ -0,0 +1,119 @@
+import base64
+import binascii
+
+from django.utils.dateparse import parse_datetime
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(created_at, pk):
+    """Encode a (created_at, id) position as an opaque cursor string"""
+    raw = f"{created_at.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by ``encode_cursor``.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, pk = raw.rsplit('|', 1)
+        position = parse_datetime(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if position[0] is None:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return position
+
+
+def keyset_filter(created_at, pk, created_field='created_at', id_field='id', inclusive=False):
+    """Q object selecting rows strictly older than (or at) the given position"""
+    id_lookup = 'lte' if inclusive else 'lt'
+    return (
+        Q(**{f'{created_field}__lt': created_at}) |
+        Q(**{created_field: created_at, f'{id_field}__{id_lookup}': pk})
+    )
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over ``(created_at, id)`` in descending order.
+
+    Each page is a single range scan on an index ending in ``created_at``,
+    no matter how deep the client pages, unlike OFFSET pagination.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    created_field = 'created_at'
+    id_field = 'id'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_position(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            return decode_cursor(cursor)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(f'-{self.created_field}', f'-{self.id_field}')
+        position = self.get_position(request)
+        if position is not None:
+            queryset = queryset.filter(
+                keyset_filter(*position, created_field=self.created_field, id_field=self.id_field)
+            )
+
+        # Fetch one extra row to know whether there is a next page
+        page = list(queryset[:page_size + 1])
+        has_next = len(page) > page_size
+        page = page[:page_size]
+
+        self.next_cursor = self.cursor_for(page[-1]) if has_next and page else None
+        return page
+
+    def cursor_for(self, obj):
+        return encode_cursor(getattr(obj, self.created_field), getattr(obj, self.id_field))
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,275 @@
+"""
+Process-wide database connection pools.
+
+Django keeps one connection per thread, opening it on the first query of a
+request and, with ``CONN_MAX_AGE``, holding it for the thread's lifetime. The
+pooled backends in ``core.backends`` instead take a connection from a shared
+pool on the first query and hand it back when Django closes the connection
+at the end of the request (they run with ``CONN_MAX_AGE = 0``).
+
+Each pool keeps at least ``MIN_SIZE`` connections open, opened in the
+background, so connection setup stays off the request path; it grows up to
+``MAX_SIZE`` under load and requests wait up to ``TIMEOUT`` seconds for a free
+connection beyond that. Connections idle for longer than
+``HEALTH_CHECK_INTERVAL`` are checked before being handed out, and connections
+older than ``MAX_LIFETIME`` are closed instead of being reused.
+"""
+import collections
+import functools
+import logging
+import os
+import threading
+import time
+
+from django.db import OperationalError
+
+from .instrumentation import current_metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'MIN_SIZE': 1,
+    'MAX_SIZE': 10,
+    'TIMEOUT': 10,
+    'MAX_LIFETIME': 1800,
+    'HEALTH_CHECK_INTERVAL': 30,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(OperationalError):
+    """No connection became free within the pool timeout"""
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        logger.debug("Error closing a pooled connection", exc_info=True)
+
+
+class ConnectionPool:
+    """
+    A bounded pool of DB-API connections shared by the threads of a process.
+
+    Args:
+        connect: Callable opening a new connection
+        check: Callable raising if a connection is no longer usable
+        min_size: Connections kept open
+        max_size: Most connections open at once
+        timeout: Seconds to wait for a free connection
+        max_lifetime: Seconds after which a connection is closed rather than reused
+        health_check_interval: Seconds of idleness after which a connection is checked
+    """
+
+    def __init__(self, connect, check, min_size=1, max_size=10, timeout=10, max_lifetime=1800,
+                 health_check_interval=30, clock=time.monotonic):
+        self.connect = connect
+        self.check = check
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.clock = clock
+        self.pid = os.getpid()
+
+        self.lock = threading.Condition()
+        # (connection, opened_at, released_at), most recently released last
+        self.idle = collections.deque()
+        self.opened_at = {}
+        # Open connections plus the ones being opened
+        self.size = 0
+        self.filling = False
+        self.stats = collections.Counter()
+
+    def acquire(self):
+        """Check out a connection, opening one if the pool has room"""
+        start = self.clock()
+        deadline = start + self.timeout
+        while True:
+            with self.lock:
+                while not self.idle and self.size >= self.max_size:
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        self.stats['timeouts'] += 1
+                        raise PoolTimeout(f"No database connection free after {self.timeout}s")
+                    self.stats['waits'] += 1
+                    self.lock.wait(remaining)
+                if self.idle:
+                    # Reuse the most recently released connection, the likeliest to be healthy
+                    connection, opened_at, released_at = self.idle.pop()
+                else:
+                    connection = None
+                    self.size += 1
+
+            if connection is None:
+                connection = self.open()
+            elif not self.reusable(connection, opened_at, released_at):
+                self.discard(connection)
+                continue
+
+            waited = self.clock() - start
+            with self.lock:
+                self.stats['checkouts'] += 1
+                self.stats['wait_ms'] += waited * 1000
+            metrics = current_metrics()
+            if metrics is not None:
+                metrics.pool_wait += waited
+            return connection
+
+    def release(self, connection, reusable=True):
+        """Return a checked out connection, or close it when it can't be reused"""
+        now = self.clock()
+        opened_at = self.opened_at.get(id(connection))
+        if opened_at is None:
+            # Not from this pool, e.g. checked out before a fork
+            close_quietly(connection)
+            return
+        if not reusable or now - opened_at >= self.max_lifetime:
+            self.discard(connection)
+            return
+        with self.lock:
+            self.idle.append((connection, opened_at, now))
+            self.lock.notify()
+
+    def reusable(self, connection, opened_at, released_at):
+        now = self.clock()
+        if now - opened_at >= self.max_lifetime:
+            return False
+        if now - released_at < self.health_check_interval:
+            return True
+        try:
+            self.check(connection)
+        except Exception:
+            self.stats['failed_checks'] += 1
+            return False
+        return True
+
+    def open(self):
+        """Open a connection for a slot already counted in ``size``"""
+        try:
+            connection = self.connect()
+        except Exception:
+            with self.lock:
+                self.size -= 1
+                self.lock.notify()
+            raise
+        with self.lock:
+            self.opened_at[id(connection)] = self.clock()
+            self.stats['opened'] += 1
+        return connection
+
+    def discard(self, connection):
+        close_quietly(connection)
+        with self.lock:
+            self.opened_at.pop(id(connection), None)
+            self.size -= 1
+            self.stats['closed'] += 1
+            self.lock.notify()
+        self.fill()
+
+    def fill(self):
+        """Open connections up to ``min_size`` in a background thread"""
+        with self.lock:
+            if self.filling or self.size >= self.min_size:
+                return
+            self.filling = True
+        threading.Thread(target=self._fill, name='db-pool-fill', daemon=True).start()
+
+    def _fill(self):
+        try:
+            while True:
+                with self.lock:
+                    if self.size >= self.min_size:
+                        return
+                    self.size += 1
+                connection = self.open()
+                self.release(connection)
+        except Exception:
+            logger.warning("Could not open a pooled database connection", exc_info=True)
+        finally:
+            with self.lock:
+                self.filling = False
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'size': self.size,
+                'idle': len(self.idle),
+                'in_use': self.size - len(self.idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'checkouts': self.stats['checkouts'],
+                'waits': self.stats['waits'],
+                'timeouts': self.stats['timeouts'],
+                'wait_ms': round(self.stats['wait_ms'], 2),
+                'opened': self.stats['opened'],
+                'closed': self.stats['closed'],
+                'failed_checks': self.stats['failed_checks'],
+            }
+
+
+def get_pool(alias, create):
+    """The pool of a database alias in this process, made by ``create()`` on first use"""
+    pid = os.getpid()
+    with _pools_lock:
+        pool = _pools.get(alias)
+        # Connections must not be shared with a forked parent
+        if pool is None or pool.pid != pid:
+            pool = _pools[alias] = create()
+    return pool
+
+
+def pool_stats():
+    """Usage of this process's pools, per database alias"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.snapshot() for alias, pool in pools.items()}
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Database wrapper taking its connection from the alias's pool and handing
+    it back on close. Backends define ``check_connection(connection)`` and
+    ``open_connection(conn_params, options)``, which the pool calls from any
+    thread, so neither may touch a wrapper.
+    """
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.create_pool)
+
+    def create_pool(self):
+        params = self.get_connection_params()
+        connect_options = dict(self.settings_dict['OPTIONS'])
+        options = {**DEFAULTS, **self.settings_dict.get('POOL', {})}
+        # Wrappers are per thread, so the pool must not hold on to this one
+        return ConnectionPool(
+            functools.partial(self.open_connection, params, connect_options),
+            self.check_connection,
+            min_size=options['MIN_SIZE'],
+            max_size=options['MAX_SIZE'],
+            timeout=options['TIMEOUT'],
+            max_lifetime=options['MAX_LIFETIME'],
+            health_check_interval=options['HEALTH_CHECK_INTERVAL'],
+        )
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        connection = pool.acquire()
+        # Top the pool back up to its minimum off the request path
+        pool.fill()
+        return connection
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # Only connections back in autocommit, outside a transaction, are clean to share
+        reusable = self.get_autocommit() and not self.in_atomic_block
+        if reusable and self.errors_occurred:
+            reusable = self.is_usable()
+        with self.wrap_database_errors:
+            self.pool.release(self.connection, reusable=reusable)
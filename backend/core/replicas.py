@@ -0,0 +1,97 @@
+"""
+Read replica routing.
+
+Reads go to the primary (``default``) unless ``ReplicaMiddleware`` has made a
+replica current for the request. It does that only for safe requests to views
+listing the action in their ``replica_actions``, and only while the client
+isn't pinned to the primary: every unsafe request sets a short-lived cookie so
+the client reads its own writes while the replicas catch up. Within a request,
+any write pins the rest of the request to the primary as well.
+
+A replica that fails to connect, or fails a query, is skipped for
+``REPLICA_RETRY_SECONDS`` by this process and the request is served from the
+primary instead.
+"""
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('replica_reads', default=None)
+# {alias: time.monotonic() until which the replica is skipped}
+_down_until = {}
+
+
+class ReplicaReads:
+    """Where reads of the current request go; the primary until a replica is chosen"""
+
+    def __init__(self):
+        self.alias = None
+        # Set once the request writes; later reads must see the write
+        self.pinned = False
+
+    def activate(self):
+        return _current.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current.reset(token)
+
+
+def current_reads():
+    return _current.get()
+
+
+def current_replica():
+    """Alias reads of the current request go to, or None for the primary"""
+    reads = _current.get()
+    if reads is None or reads.pinned:
+        return None
+    return reads.alias
+
+
+def mark_down(alias):
+    logger.warning("Replica %s failed; reading from the primary for %ss", alias, settings.REPLICA_RETRY_SECONDS)
+    _down_until[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+
+
+def pick_replica():
+    """A replica that is up and accepts connections, or None"""
+    now = time.monotonic()
+    candidates = [alias for alias in settings.DATABASE_REPLICAS if _down_until.get(alias, 0) <= now]
+    random.shuffle(candidates)
+    for alias in candidates:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            mark_down(alias)
+            continue
+        return alias
+    return None
+
+
+class PrimaryReplicaRouter:
+    """Routes reads to the request's replica, everything else to the primary"""
+
+    def db_for_read(self, model, **hints):
+        return current_replica() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        reads = _current.get()
+        if reads is not None:
+            reads.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        return db not in settings.DATABASE_REPLICAS
@@ -57,6 +57,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'core.middleware.CustomCorsMiddleware',  # Our custom failsafe middleware MUST be first
     'corsheaders.middleware.CorsMiddleware',  # Django CORS middleware
+    'core.middleware.PerformanceMiddleware',
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -64,6 +65,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    'core.middleware.RateLimitHeadersMiddleware',
+    'core.middleware.ReplicaMiddleware',  # Last, so it sees replica errors from the view first
 ]
 
 CORS_ALLOWED_ORIGINS = [
@@ -110,6 +113,14 @@ CORS_ALLOW_HEADERS = [
     'access-control-allow-origin',
 ]
 
+# Let the frontend read the rate limit headers
+CORS_EXPOSE_HEADERS = [
+    'RateLimit-Limit',
+    'RateLimit-Remaining',
+    'RateLimit-Reset',
+    'Retry-After',
+]
+
 ROOT_URLCONF = "core.urls"
 
 TEMPLATES = [
@@ -168,6 +179,88 @@ else:
     }
 }
 
+# Read replicas, used by the views listing replica_actions (see core.replicas).
+# Comma-separated database URLs, e.g. two SQLite files locally:
+# DATABASE_URL=sqlite:///primary.sqlite3 DATABASE_REPLICA_URLS=sqlite:///replica.sqlite3
+DATABASE_REPLICAS = []
+for index, url in enumerate(filter(None, os.environ.get("DATABASE_REPLICA_URLS", "").split(","))):
+    DATABASES[f"replica_{index}"] = {
+        **dj_database_url.parse(url.strip(), conn_max_age=600),
+        # Tests read replicas from the test primary
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{index}")
+DATABASE_ROUTERS = ["core.replicas.PrimaryReplicaRouter"]
+REPLICA_PIN_SECONDS = 5  # seconds a client reads from the primary after a write
+REPLICA_PIN_COOKIE = "db_pin"
+REPLICA_RETRY_SECONDS = 30  # seconds a failed replica is skipped
+
+# Connection pools (see core.pool): MySQL and PostgreSQL connections are
+# checked out per request from a per-process pool instead of being opened per
+# request or held per thread
+DATABASE_POOL = {
+    "MIN_SIZE": int(os.environ.get("DB_POOL_MIN_SIZE", 1)),  # connections kept open
+    "MAX_SIZE": int(os.environ.get("DB_POOL_MAX_SIZE", 10)),  # connections open at most
+    "TIMEOUT": 10,  # seconds a request waits for a free connection
+    "MAX_LIFETIME": 1800,  # seconds before a connection is replaced; below MySQL's wait_timeout
+    "HEALTH_CHECK_INTERVAL": 30,  # seconds idle before a connection is checked on checkout
+}
+POOLED_ENGINES = {
+    "django.db.backends.mysql": "core.backends.mysql",
+    "django.db.backends.postgresql": "core.backends.postgresql",
+}
+if os.environ.get("DATABASE_POOL", "True").lower() == "true":
+    for database in DATABASES.values():
+        if database["ENGINE"] in POOLED_ENGINES:
+            # Connections go back to the pool at the end of every request
+            database.update(ENGINE=POOLED_ENGINES[database["ENGINE"]], CONN_MAX_AGE=0, POOL=DATABASE_POOL)
+
+# SQLite tuning (see core.backends.sqlite3 and core.writes), opt in: WAL lets
+# reads run alongside the single writer, and hot write paths go through a
+# queue that commits them in batches. The queue is per process, so batching
+# only helps single-process deployments; with several worker processes their
+# writers still contend for the file lock
+SQLITE_PRODUCTION_MODE = os.environ.get("SQLITE_PRODUCTION_MODE", "False").lower() == "true"
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",  # readers don't block the writer, nor it them
+    "synchronous": "NORMAL",  # fsync at checkpoints only; durable enough with WAL
+    "busy_timeout": 5000,  # milliseconds a connection waits for the write lock
+    "cache_size": -64000,  # page cache per connection, in KiB when negative
+    "mmap_size": 268435456,  # bytes of the file read through memory mapping
+}
+SQLITE_WRITE_QUEUE = SQLITE_PRODUCTION_MODE
+SQLITE_WRITE_BATCH_SIZE = 50  # writes committed in one transaction at most
+SQLITE_WRITE_BATCH_WAIT = 0.002  # seconds the writer waits for more writes to batch
+if SQLITE_PRODUCTION_MODE:
+    for database in DATABASES.values():
+        if database["ENGINE"] == "django.db.backends.sqlite3":
+            database.update(ENGINE="core.backends.sqlite3", PRAGMAS=SQLITE_PRAGMAS)
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Counters, lockouts and cached records are shared between workers, so
+# production deployments should point REDIS_URL at a shared Redis instance.
+
+if os.environ.get("REDIS_URL") and not TESTING:
+    CACHES = {
+        "default": {
+            "BACKEND": "core.instrumentation.InstrumentedRedisCache",
+            "LOCATION": os.environ.get("REDIS_URL"),
+        }
+    }
+    SHARED_CACHE = True
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "core.instrumentation.InstrumentedLocMemCache",
+            "LOCATION": "twitter-clone",
+        }
+    }
+    # The local memory cache is private to each process. Features that need
+    # every worker to see the same cache fall back to the database without
+    # one; single-process deployments (and tests) can opt in anyway
+    SHARED_CACHE = os.environ.get("SHARED_CACHE", str(TESTING)).lower() == "true"
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -232,7 +325,7 @@ AUTHENTICATION_BACKENDS = [
 if TESTING:
     REST_FRAMEWORK = {
         'DEFAULT_AUTHENTICATION_CLASSES': (
-            'rest_framework_simplejwt.authentication.JWTAuthentication',
+            'authentication.jwt.CachedJWTAuthentication',
         ),
         'DEFAULT_THROTTLE_CLASSES': [],
         'DEFAULT_THROTTLE_RATES': {},
@@ -243,11 +336,11 @@ if TESTING:
 else:
     REST_FRAMEWORK = {
         'DEFAULT_AUTHENTICATION_CLASSES': (
-            'rest_framework_simplejwt.authentication.JWTAuthentication',
+            'authentication.jwt.CachedJWTAuthentication',
         ),
         'DEFAULT_THROTTLE_CLASSES': [
-            'rest_framework.throttling.AnonRateThrottle',
-            'rest_framework.throttling.UserRateThrottle',
+            'core.throttling.AnonGCRAThrottle',
+            'core.throttling.UserGCRAThrottle',
             'authentication.throttling.AuthRateThrottle',
             'authentication.throttling.LoginRateThrottle',
         ],
@@ -285,6 +378,7 @@ SIMPLE_JWT = {
 
     'JTI_CLAIM': 'jti',
 }
+AUTH_USER_CACHE_TIMEOUT = 60  # seconds a cached request user record is trusted
 
 # Logging configuration
 LOGGING = {
@@ -334,9 +428,18 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': True,
         },
+        # One JSON line per request from PerformanceMiddleware
+        'core.middleware': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
+# Clients sending this value in X-Server-Timing-Token get Server-Timing headers
+SERVER_TIMING_TOKEN = os.environ.get('SERVER_TIMING_TOKEN')
+
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.zoho.com')
@@ -351,6 +454,48 @@ FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
 FRONTEND_URL_PRODUCTION = os.environ.get('FRONTEND_URL_PRODUCTION', 'https://showcase-twitter-clone.vercel.app')
 FRONTEND_URL_PREVIEW = os.environ.get('FRONTEND_URL_PREVIEW', 'https://showcase-twitter-clone-maxh33-maxh33s-projects.vercel.app')
 
+# Notifications
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 30))
+NOTIFICATION_UNREAD_CACHE_TIMEOUT = 60 * 60  # 1 hour
+
+# Login lockout
+LOGIN_LOCKOUT_WINDOW = 60 * 60  # sliding window in seconds
+LOGIN_LOCKOUT_EMAIL_LIMIT = 20  # failed attempts per email within the window
+LOGIN_LOCKOUT_IP_LIMIT = 100  # higher, so users sharing an IP aren't locked out together
+LOGIN_AUDIT_SAMPLE_RATE = float(os.environ.get('LOGIN_AUDIT_SAMPLE_RATE', '0.1'))
+LOGIN_AUDIT_RETENTION_DAYS = 30
+
+# Demo accounts
+DEMO_ACCOUNT_TTL_HOURS = 24  # claimed demo accounts are purged by purge_demo_users after this
+DEMO_POOL_SIZE = int(os.environ.get('DEMO_POOL_SIZE', '50'))  # unclaimed accounts kept ready by refill_demo_pool
+
+# Profile cards
+PROFILE_CARD_CACHE_TIMEOUT = 60 * 60  # 1 hour
+PROFILE_CARD_BATCH_MAX = 100  # usernames per batch request
+
+# Follows
+# The graph follows writes through a change feed in the cache, so it needs a shared one
+FOLLOW_GRAPH_ENABLED = SHARED_CACHE and os.environ.get('FOLLOW_GRAPH_ENABLED', 'True').lower() == 'true'
+# Directory of a snapshot written by `manage.py build_follow_graph`, memory-mapped by all workers
+FOLLOW_GRAPH_PATH = os.environ.get('FOLLOW_GRAPH_PATH') or None
+FOLLOW_GRAPH_SYNC_INTERVAL = 0 if TESTING else 1  # seconds between change feed checks
+FOLLOW_GRAPH_MAX_CATCH_UP = 10000  # changes; rebuild instead when further behind
+FOLLOW_GRAPH_MAX_OVERLAY = 50000  # edges; rebuild once the overlay grows past this
+FOLLOW_GRAPH_BACKGROUND_BUILD = not TESTING  # rebuild a missing or stale graph in a thread; tests build it explicitly
+FOLLOW_BULK_MAX = 5000  # users per bulk follow request
+FOLLOW_SUGGESTIONS_LIMIT = 20  # suggestions stored per user by compute_follow_suggestions
+
+# Live updates (server-sent events, served under ASGI)
+EVENT_STREAM_HEARTBEAT = 15  # seconds between keep-alive comments
+EVENT_STREAM_MAX_DURATION = 5 * 60  # seconds before a stream is recycled
+EVENT_STREAM_RETRY_MS = 3000
+EVENT_STREAM_TICKET_TTL = 30  # seconds a stream ticket can be used, once
+EVENT_STREAM_MAX_SUBSCRIBERS = int(os.environ.get('EVENT_STREAM_MAX_SUBSCRIBERS', 10000))
+
+# Async read endpoints (tweets.async_views). Worth it under ASGI only: under
+# WSGI every async view pays for an event loop of its own
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', 'False').lower() == 'true'
+
 # Swagger settings
 SWAGGER_SETTINGS = {
     'USE_SESSION_AUTH': False,
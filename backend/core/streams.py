@@ -0,0 +1,135 @@
+"""
+Server-sent events endpoint for live feed and notification updates.
+
+Only served under ASGI: each connected client costs one coroutine waiting on
+its subscription queue instead of a stream of polling requests. A WSGI worker
+would be held for the whole stream, so requests that don't come through the
+ASGI handler get a 501.
+
+EventSource cannot send headers, so browsers first exchange their access token
+for a stream ticket (``POST /api/v1/stream/ticket/``) and open the stream with
+``?ticket=``. Tickets are signed, expire after ``EVENT_STREAM_TICKET_TTL``
+seconds and open a single stream (per process, without a shared cache), so a
+logged URL is of no use. Other clients may send the usual ``Authorization``
+header instead.
+"""
+import json
+import secrets
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from authentication.jwt import TOKEN_VERSION_CLAIM, CachedJWTAuthentication
+from .events import FEED_TOPIC, hub, user_topic
+
+TICKET_SALT = 'core.streams.ticket'
+
+
+def issue_stream_ticket(user):
+    """Signed ticket that opens one stream for ``user``"""
+    return signing.dumps(
+        {'user_id': user.pk, 'version': user.token_version, 'nonce': secrets.token_urlsafe(12)},
+        salt=TICKET_SALT
+    )
+
+
+async def redeem_stream_ticket(ticket):
+    """
+    Check a stream ticket and use it up.
+
+    Returns:
+        dict: Token claims identifying the user, or None if the ticket is
+        invalid, expired or already used
+    """
+    try:
+        claims = signing.loads(ticket, salt=TICKET_SALT, max_age=settings.EVENT_STREAM_TICKET_TTL)
+    except signing.BadSignature:
+        return None
+    # Only the first redemption adds the key
+    if not await cache.aadd(f"stream:ticket:{claims['nonce']}", True, settings.EVENT_STREAM_TICKET_TTL):
+        return None
+    return {jwt_settings.USER_ID_CLAIM: claims['user_id'], TOKEN_VERSION_CLAIM: claims['version']}
+
+
+async def get_stream_user(request):
+    """
+    Authenticate a stream request from its ticket or access token.
+
+    Goes through ``CachedJWTAuthentication``, so revoked tokens and inactive
+    or deleted users are refused like on any other endpoint.
+    """
+    authentication = CachedJWTAuthentication()
+    try:
+        ticket = request.GET.get('ticket')
+        if ticket:
+            claims = await redeem_stream_ticket(ticket)
+            return await authentication.aget_user(claims) if claims else None
+        result = await authentication.aauthenticate(request)
+        return result[0] if result else None
+    except AuthenticationFailed:
+        return None
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def event_stream(request):
+    """
+    Stream live updates for the authenticated user.
+
+    Events:
+        tweet_created: A new tweet is available in the feed
+        engagement: A tweet's like, retweet or comment counter changed
+        notification: The user received a new notification
+        resync: Events were dropped because the client fell behind
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'error': 'Live updates are only available when the server runs under ASGI.'},
+            status=501
+        )
+
+    user = await get_stream_user(request)
+    if user is None:
+        return JsonResponse(
+            {'error': 'Authentication credentials were not provided.'},
+            status=401
+        )
+
+    if hub.subscriber_count() >= settings.EVENT_STREAM_MAX_SUBSCRIBERS:
+        return JsonResponse(
+            {'error': 'Too many open streams. Please try again later.'},
+            status=503
+        )
+
+    subscription = hub.subscribe([FEED_TOPIC, user_topic(user.id)])
+
+    async def stream():
+        # Streams are recycled periodically; EventSource reconnects on its own
+        deadline = time.monotonic() + settings.EVENT_STREAM_MAX_DURATION
+        try:
+            yield f"retry: {settings.EVENT_STREAM_RETRY_MS}\n\n"
+            while time.monotonic() < deadline:
+                message = await subscription.next_message(settings.EVENT_STREAM_HEARTBEAT)
+                if message is None:
+                    yield ": heartbeat\n\n"
+                    continue
+
+                if subscription.dropped:
+                    yield format_event('resync', {'dropped': subscription.dropped})
+                    subscription.dropped = 0
+                yield format_event(message['event'], message['data'])
+        finally:
+            hub.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,81 @@
+"""
+Rate throttles keeping constant-size state per client.
+
+DRF's ``SimpleRateThrottle`` stores a list of every request timestamp within
+the window and rewrites it on each request. These throttles implement the
+generic cell rate algorithm (GCRA) instead: the only state is the theoretical
+arrival time (TAT) of the next request, in milliseconds, advanced by one cache
+``incr`` per request. Requests are spaced ``duration / num_requests`` apart on
+average, with bursts of up to ``num_requests``.
+"""
+import math
+
+from rest_framework.throttling import AnonRateThrottle, SimpleRateThrottle, UserRateThrottle
+
+
+class GCRAThrottle(SimpleRateThrottle):
+    """
+    ``SimpleRateThrottle`` with GCRA state; scopes, rates and cache keys are unchanged.
+
+    Rate limit details of the request are left on ``request.rate_limit`` for
+    ``RateLimitHeadersMiddleware``.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = int(self.timer() * 1000)
+        self.interval = self.duration * 1000 / self.num_requests
+        burst = self.duration * 1000
+        step = math.ceil(self.interval)
+
+        try:
+            self.tat = self.cache.incr(self.key, step)
+        except ValueError:
+            self.tat = None
+        if self.tat is None or self.tat - step < self.now:
+            # New or idle client: the bucket is full again. Concurrent requests
+            # racing on this reset may go uncounted, never wrongly refused.
+            self.tat = self.now + step
+            self.cache.set(self.key, self.tat, self.duration * 2)
+        elif self.tat - self.now > burst:
+            # Refused requests don't use up capacity
+            self.cache.decr(self.key, step)
+            self.tat -= step
+            self.record(request, allowed=False)
+            return False
+        elif self.tat - self.now > burst / 2:
+            # Keep the key alive while the client owes a large part of the burst
+            self.cache.touch(self.key, self.duration * 2)
+
+        self.record(request, allowed=True)
+        return True
+
+    def record(self, request, allowed):
+        backlog = max(self.tat - self.now, 0)
+        limit = {
+            'limit': self.num_requests,
+            'remaining': max(int((self.duration * 1000 - backlog) // self.interval), 0) if allowed else 0,
+            'reset': math.ceil(backlog / 1000),
+        }
+        current = getattr(request._request, 'rate_limit', None)
+        # With several throttles the headers describe the tightest one
+        if current is None or limit['remaining'] < current['remaining']:
+            request._request.rate_limit = limit
+
+    def wait(self):
+        """Seconds until the next request would be allowed"""
+        return max(self.tat + math.ceil(self.interval) - self.now - self.duration * 1000, 0) / 1000
+
+
+class AnonGCRAThrottle(GCRAThrottle, AnonRateThrottle):
+    """``AnonRateThrottle`` with GCRA state"""
+
+
+class UserGCRAThrottle(GCRAThrottle, UserRateThrottle):
+    """``UserRateThrottle`` with GCRA state"""
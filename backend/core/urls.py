@@ -24,6 +24,8 @@ from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from rest_framework import permissions
 from django.views.static import serve
+from core.streams import event_stream
+from core.views import db_pool_metrics, stream_ticket
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -47,6 +49,9 @@ def api_root(request):
             "auth": "/api/v1/auth/",
             "users": "/api/v1/users/",
             "tweets": "/api/v1/tweets/",
+            "follows": "/api/v1/follows/",
+            "notifications": "/api/v1/notifications/",
+            "stream": "/api/v1/stream/",
             "docs": "/api/v1/docs/",
             "swagger": "/api/v1/swagger/",
         }
@@ -63,6 +68,11 @@ urlpatterns = [
     path('api/v1/auth/', include('authentication.urls', namespace='auth')),
     path('api/v1/users/', include('users.urls', namespace='users')),
     path('api/v1/tweets/', include('tweets.urls', namespace='tweets')),
+    path('api/v1/follows/', include('follows.urls', namespace='follows')),
+    path('api/v1/notifications/', include('notifications.urls', namespace='notifications')),
+    path('api/v1/stream/', event_stream, name='event-stream'),
+    path('api/v1/stream/ticket/', stream_ticket, name='stream-ticket'),
+    path('api/v1/metrics/db-pools/', db_pool_metrics, name='db-pool-metrics'),
     
     # API documentation
     path('api/v1/swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
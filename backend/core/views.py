@@ -0,0 +1,24 @@
+from django.conf import settings
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from .pool import pool_stats
+from .streams import issue_stream_ticket
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def db_pool_metrics(request):
+    """Connection pool usage of the worker process serving the request"""
+    return Response({'pools': pool_stats()})
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def stream_ticket(request):
+    """Single-use ticket for opening the live update stream from a browser"""
+    return Response({
+        'ticket': issue_stream_ticket(request.user),
+        'expires_in': settings.EVENT_STREAM_TICKET_TTL,
+    })
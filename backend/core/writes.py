@@ -0,0 +1,143 @@
+"""
+Serialized writes for SQLite.
+
+SQLite allows one writer at a time; concurrent write transactions wait on the
+file lock and, past ``busy_timeout``, fail with "database is locked". Hot write
+paths submit their writes here instead. A single writer thread per process runs
+them in order, batching the writes that queue up within
+``SQLITE_WRITE_BATCH_WAIT`` into one transaction (each in its own savepoint),
+so a burst of likes costs one commit rather than one per request. Callers
+block until their batch has committed and get the write's result or exception.
+
+The queue only serializes writes within one process. Several worker processes
+each run their own writer and still contend for the database lock, so this
+pays off for single-process deployments (one process with threads or an ASGI
+event loop). It is opt in through ``SQLITE_PRODUCTION_MODE``.
+
+Writes run inline when the queue is disabled, the database isn't SQLite, or
+the caller is already in a transaction (queued writes couldn't see its
+uncommitted rows, nor be rolled back with it); they join that transaction or
+get one of their own.
+"""
+import collections
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+Job = collections.namedtuple('Job', 'future context function args kwargs')
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class WriteQueue:
+    """
+    Runs submitted writes on a dedicated thread, in batches.
+
+    Args:
+        alias: Database the writes go to
+        batch_size: Most writes committed together
+        batch_wait: Seconds to wait for more writes before committing a batch
+    """
+
+    def __init__(self, alias=DEFAULT_DB_ALIAS, batch_size=50, batch_wait=0.002):
+        self.alias = alias
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.pid = os.getpid()
+        self.jobs = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.run, name='sqlite-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, function, *args, **kwargs):
+        """Queue ``function(*args, **kwargs)`` and wait for its batch to commit"""
+        future = Future()
+        # Writes run in the caller's context, so e.g. the request's replica pin sees them
+        self.jobs.put(Job(future, contextvars.copy_context(), function, args, kwargs))
+        return future.result()
+
+    def run(self):
+        while True:
+            jobs = [self.jobs.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while len(jobs) < self.batch_size:
+                try:
+                    jobs.append(self.jobs.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            try:
+                self.write(jobs)
+            except Exception:
+                logger.exception("SQLite writer failed a batch of %s writes", len(jobs))
+            finally:
+                connections[self.alias].close_if_unusable_or_obsolete()
+
+    def write(self, jobs):
+        outcomes = []
+        try:
+            with transaction.atomic(using=self.alias):
+                for job in jobs:
+                    try:
+                        with transaction.atomic(using=self.alias):
+                            result = job.context.run(job.function, *job.args, **job.kwargs)
+                        outcomes.append((job.future, result, None))
+                    except Exception as e:
+                        outcomes.append((job.future, None, e))
+        except Exception as e:
+            # Nothing was committed
+            for job in jobs:
+                job.future.set_exception(e)
+            raise
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+def get_writer():
+    """This process's write queue, started on first use"""
+    global _writer
+    pid = os.getpid()
+    with _writer_lock:
+        # The thread doesn't survive a fork
+        if _writer is None or _writer.pid != pid:
+            _writer = WriteQueue(
+                batch_size=settings.SQLITE_WRITE_BATCH_SIZE,
+                batch_wait=settings.SQLITE_WRITE_BATCH_WAIT,
+            )
+    return _writer
+
+
+def queued(connection):
+    return (
+        settings.SQLITE_WRITE_QUEUE
+        and connection.vendor == 'sqlite'
+        and not connection.in_atomic_block
+        # Writes queued by a queued write run in its batch
+        and not (_writer is not None and threading.current_thread() is _writer.thread)
+    )
+
+
+def write(function, *args, **kwargs):
+    """
+    Run a write to the default database through the write queue when it
+    applies, or inline in a transaction otherwise.
+
+    Returns:
+        The result of ``function(*args, **kwargs)``
+    """
+    if queued(connections[DEFAULT_DB_ALIAS]):
+        return get_writer().submit(function, *args, **kwargs)
+    # Part of the caller's transaction, if any, like an unqueued write would be
+    with transaction.atomic(savepoint=False):
+        return function(*args, **kwargs)
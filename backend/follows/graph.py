@@ -0,0 +1,370 @@
+"""
+Compact in-memory index of the follow graph.
+
+Both directions of the graph are stored in CSR form: the users followed by
+``u`` are ``following_neighbors[following_offsets[u]:following_offsets[u + 1]]``
+(sorted), and likewise for followers. Offsets are indexed directly by user id,
+so membership, intersection and degree queries are a slice plus a binary
+search or a sorted-array intersection, with no database round trip.
+
+The arrays are a snapshot. Follow writes are appended to a change feed in the
+shared cache, and each process applies the changes it has not seen yet as a
+small overlay on top of the snapshot. Snapshots built by ``build_follow_graph``
+can be memory-mapped so every worker shares one copy through the page cache.
+
+The change feed only reaches every worker through a shared cache, so the graph
+is disabled (``FOLLOW_GRAPH_ENABLED``) without one and callers use the database.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Max
+
+logger = logging.getLogger(__name__)
+
+CHANGE_SEQ_KEY = 'follows:graph:seq'
+CHANGE_TIMEOUT = 60 * 60 * 24
+# Give up waiting for a change that was sequenced but never written after this long
+CHANGE_STALL_TIMEOUT = 10
+ARRAY_NAMES = ('following_offsets', 'following_neighbors', 'followers_offsets', 'followers_neighbors')
+EMPTY = np.empty(0, dtype=np.int64)
+
+
+def change_key(seq):
+    return f'follows:graph:change:{seq}'
+
+
+def current_change_seq():
+    return cache.get(CHANGE_SEQ_KEY) or 0
+
+
+def record_changes(changes):
+    """
+    Append follow changes to the shared change feed.
+
+    Args:
+        changes: Iterable of (follower_id, following_id, added) tuples
+    """
+    changes = list(changes)
+    if not changes or not settings.FOLLOW_GRAPH_ENABLED:
+        return
+
+    try:
+        last = cache.incr(CHANGE_SEQ_KEY, len(changes))
+    except ValueError:
+        cache.add(CHANGE_SEQ_KEY, 0, timeout=None)
+        last = cache.incr(CHANGE_SEQ_KEY, len(changes))
+
+    first = last - len(changes) + 1
+    cache.set_many(
+        {change_key(seq): change for seq, change in zip(range(first, last + 1), changes)},
+        timeout=CHANGE_TIMEOUT
+    )
+
+
+def record_changes_on_commit(changes):
+    changes = list(changes)
+    transaction.on_commit(lambda: record_changes(changes))
+
+
+def read_changes(after_seq, until_seq):
+    """
+    Read the changes after ``after_seq`` up to and including ``until_seq``.
+
+    Returns:
+        list: (follower_id, following_id, added) tuples, or None if some of
+        them are no longer (or not yet) in the cache
+    """
+    keys = [change_key(seq) for seq in range(after_seq + 1, until_seq + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return None
+    return [changes[key] for key in keys]
+
+
+def _build_csr(sources, targets, num_nodes):
+    order = np.lexsort((targets, sources))
+    neighbors = np.ascontiguousarray(targets[order], dtype=np.int64)
+    counts = np.bincount(sources, minlength=num_nodes)
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, neighbors
+
+
+class FollowGraph:
+    """CSR snapshot of the follow graph plus an overlay of newer changes"""
+
+    def __init__(self, following_offsets, following_neighbors, followers_offsets,
+                 followers_neighbors, seq=0):
+        self.following_offsets = following_offsets
+        self.following_neighbors = following_neighbors
+        self.followers_offsets = followers_offsets
+        self.followers_neighbors = followers_neighbors
+        self.seq = seq
+        # Overlay of changes newer than the snapshot: user id -> set of user ids
+        self._added_following = {}
+        self._added_followers = {}
+        self._removed_following = {}
+        self._removed_followers = {}
+        self._stalled_since = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_edges(cls, followers, followings, num_nodes=None, seq=0):
+        followers = np.asarray(followers, dtype=np.int64)
+        followings = np.asarray(followings, dtype=np.int64)
+        if num_nodes is None:
+            num_nodes = int(max(followers.max(initial=0), followings.max(initial=0))) + 1
+        return cls(
+            *_build_csr(followers, followings, num_nodes),
+            *_build_csr(followings, followers, num_nodes),
+            seq=seq
+        )
+
+    @classmethod
+    def build(cls, chunk_size=50000):
+        """Build a snapshot from the Follow table"""
+        from users.models import User
+        from .models import Follow
+
+        # Read the feed position first so changes made during the build get replayed
+        seq = current_change_seq()
+        num_nodes = (User.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+
+        rows = Follow.objects.order_by().values_list('follower_id', 'following_id')
+        edges = np.fromiter(
+            (user_id for row in rows.iterator(chunk_size=chunk_size) for user_id in row),
+            dtype=np.int64
+        ).reshape(-1, 2)
+        return cls.from_edges(edges[:, 0], edges[:, 1], num_nodes=num_nodes, seq=seq)
+
+    def save(self, directory):
+        """Write the snapshot as .npy files that ``load`` can memory-map"""
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(directory, 'meta.json'), 'w') as meta:
+            json.dump({'seq': self.seq, 'built_at': time.time()}, meta)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        arrays = [np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode) for name in ARRAY_NAMES]
+        with open(os.path.join(directory, 'meta.json')) as meta:
+            seq = json.load(meta)['seq']
+        return cls(*arrays, seq=seq)
+
+    @property
+    def num_nodes(self):
+        return len(self.following_offsets) - 1
+
+    @property
+    def overlay_size(self):
+        with self._lock:
+            return sum(len(ids) for ids in self._added_following.values()) + \
+                sum(len(ids) for ids in self._removed_following.values())
+
+    # Change feed
+
+    def apply_change(self, follower_id, following_id, added):
+        with self._lock:
+            if added:
+                add_to, remove_from = (self._added_following, self._added_followers), \
+                    (self._removed_following, self._removed_followers)
+            else:
+                add_to, remove_from = (self._removed_following, self._removed_followers), \
+                    (self._added_following, self._added_followers)
+            remove_from[0].get(follower_id, set()).discard(following_id)
+            remove_from[1].get(following_id, set()).discard(follower_id)
+            add_to[0].setdefault(follower_id, set()).add(following_id)
+            add_to[1].setdefault(following_id, set()).add(follower_id)
+
+    def catch_up(self):
+        """
+        Apply changes from the shared feed that this snapshot hasn't seen.
+
+        Returns:
+            bool: False when the snapshot can't be brought up to date (the feed
+            was reset or changes were evicted) and has to be rebuilt
+        """
+        current = current_change_seq()
+        if current < self.seq:
+            return False
+        if current == self.seq:
+            return True
+        if current - self.seq > settings.FOLLOW_GRAPH_MAX_CATCH_UP:
+            return False
+
+        seqs = range(self.seq + 1, current + 1)
+        changes = cache.get_many([change_key(seq) for seq in seqs])
+        for seq in seqs:
+            change = changes.get(change_key(seq))
+            if change is None:
+                # Sequenced but not written yet, or evicted if it stays missing
+                if self._stalled_since is None:
+                    self._stalled_since = time.monotonic()
+                return time.monotonic() - self._stalled_since < CHANGE_STALL_TIMEOUT
+            self.apply_change(*change)
+            self.seq = seq
+        self._stalled_since = None
+        return True
+
+    # Queries
+
+    def _base(self, offsets, neighbors, user_id):
+        if user_id < 0 or user_id + 1 >= len(offsets):
+            return EMPTY
+        return neighbors[offsets[user_id]:offsets[user_id + 1]]
+
+    def _overlay(self, added, removed, user_id):
+        """Copies of a user's overlay sets, taken under the lock so ``apply_change`` can't resize them mid-read"""
+        with self._lock:
+            return set(added.get(user_id, ())), set(removed.get(user_id, ()))
+
+    def _with_overlay(self, base, added, removed):
+        if removed:
+            base = np.setdiff1d(base, np.fromiter(removed, dtype=np.int64), assume_unique=True)
+        if added:
+            base = np.union1d(base, np.fromiter(added, dtype=np.int64))
+        return base
+
+    def following(self, user_id):
+        """Sorted ids of the users ``user_id`` follows"""
+        base = self._base(self.following_offsets, self.following_neighbors, user_id)
+        return self._with_overlay(base, *self._overlay(self._added_following, self._removed_following, user_id))
+
+    def followers(self, user_id):
+        """Sorted ids of the users following ``user_id``"""
+        base = self._base(self.followers_offsets, self.followers_neighbors, user_id)
+        return self._with_overlay(base, *self._overlay(self._added_followers, self._removed_followers, user_id))
+
+    def is_following(self, follower_id, following_id):
+        with self._lock:
+            if following_id in self._removed_following.get(follower_id, ()):
+                return False
+            if following_id in self._added_following.get(follower_id, ()):
+                return True
+        neighbors = self._base(self.following_offsets, self.following_neighbors, follower_id)
+        index = np.searchsorted(neighbors, following_id)
+        return bool(index < len(neighbors) and neighbors[index] == following_id)
+
+    def following_count(self, user_id):
+        return len(self.following(user_id))
+
+    def followers_count(self, user_id):
+        return len(self.followers(user_id))
+
+    def mutual_followers(self, user_a, user_b):
+        """Users following both ``user_a`` and ``user_b``"""
+        return np.intersect1d(self.followers(user_a), self.followers(user_b), assume_unique=True)
+
+    def friends(self, user_id):
+        """Users that ``user_id`` follows and who follow back"""
+        return np.intersect1d(self.following(user_id), self.followers(user_id), assume_unique=True)
+
+    def followed_by(self, viewer_id, user_id):
+        """People the viewer follows who follow ``user_id`` ("Followed by ...")"""
+        return np.intersect1d(self.following(viewer_id), self.followers(user_id), assume_unique=True)
+
+
+_graph = None
+_snapshot_loaded_mtime = None
+_graph_synced_at = 0.0
+_graph_lock = threading.Lock()
+_rebuilding = False
+
+
+def _snapshot_mtime():
+    path = settings.FOLLOW_GRAPH_PATH
+    if not path:
+        return None
+    try:
+        return os.path.getmtime(os.path.join(path, 'meta.json'))
+    except OSError:
+        return None
+
+
+def get_graph():
+    """
+    Get this process's follow graph, or None while there is no usable one.
+
+    Never builds the graph on the calling thread, so callers on request paths
+    fall back to the database on None. A newer memory-mapped snapshot at
+    ``FOLLOW_GRAPH_PATH`` is picked up here, since mapping it is cheap; a
+    missing or stale graph is rebuilt in a background thread instead.
+    """
+    global _graph, _snapshot_loaded_mtime, _graph_synced_at
+
+    if not settings.FOLLOW_GRAPH_ENABLED:
+        return None
+
+    now = time.monotonic()
+    graph = _graph
+    if graph is not None and now - _graph_synced_at < settings.FOLLOW_GRAPH_SYNC_INTERVAL:
+        return graph
+
+    with _graph_lock:
+        mtime = _snapshot_mtime()
+        if mtime is not None and mtime != _snapshot_loaded_mtime:
+            _snapshot_loaded_mtime = mtime
+            snapshot = FollowGraph.load(settings.FOLLOW_GRAPH_PATH)
+            # Unless it's older than what the change feed still holds
+            if snapshot.catch_up():
+                _graph = snapshot
+                logger.info("Loaded follow graph snapshot at change %s", snapshot.seq)
+        if _graph is not None and not _graph.catch_up():
+            # Too far behind the change feed to be trusted
+            _graph = None
+        if _graph is None or _graph.overlay_size > settings.FOLLOW_GRAPH_MAX_OVERLAY:
+            _schedule_rebuild()
+        _graph_synced_at = now
+        return _graph
+
+
+def rebuild_graph():
+    """Build the graph from the database and make it this process's graph"""
+    global _graph
+
+    graph = FollowGraph.build()
+    graph.catch_up()
+    with _graph_lock:
+        _graph = graph
+    logger.info("Built follow graph at change %s", graph.seq)
+    return graph
+
+
+def _schedule_rebuild():
+    # Called with _graph_lock held
+    global _rebuilding
+
+    if _rebuilding or not settings.FOLLOW_GRAPH_BACKGROUND_BUILD:
+        return
+    _rebuilding = True
+    threading.Thread(target=_rebuild, name='follow-graph-build', daemon=True).start()
+
+
+def _rebuild():
+    global _rebuilding
+
+    try:
+        rebuild_graph()
+    except Exception:
+        logger.warning("Could not rebuild the follow graph", exc_info=True)
+    finally:
+        connections.close_all()
+        with _graph_lock:
+            _rebuilding = False
+
+
+def reset_graph():
+    """Drop this process's graph; ``get_graph`` returns None until it is rebuilt"""
+    global _graph, _snapshot_loaded_mtime
+    with _graph_lock:
+        _graph = None
+        _snapshot_loaded_mtime = None
@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from follows.graph import FollowGraph
+
+
+class Command(BaseCommand):
+    help = 'Build a snapshot of the follow graph that workers memory-map on startup'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            default=settings.FOLLOW_GRAPH_PATH,
+            help='Snapshot directory (defaults to FOLLOW_GRAPH_PATH)',
+        )
+
+    def handle(self, *args, **options):
+        output = options['output']
+        if not output:
+            raise CommandError('Pass --output or set FOLLOW_GRAPH_PATH')
+
+        if not settings.FOLLOW_GRAPH_ENABLED:
+            self.stdout.write(self.style.WARNING(
+                'FOLLOW_GRAPH_ENABLED is off (it needs a shared cache), so workers will not use this snapshot'
+            ))
+
+        output = os.path.abspath(output)
+        graph = FollowGraph.build()
+
+        # Build next to the target and swap it in, so workers never map a partial snapshot
+        parent = os.path.dirname(output)
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.follow-graph-', dir=parent)
+        try:
+            graph.save(staging)
+            if os.path.isdir(output):
+                previous = f'{staging}.old'
+                os.replace(output, previous)
+                os.replace(staging, output)
+                shutil.rmtree(previous, ignore_errors=True)
+            else:
+                os.replace(staging, output)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote follow graph with {len(graph.following_neighbors)} edges at change {graph.seq} to {output}"
+        ))
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from follows.suggestions import compute_suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute "who to follow" suggestions for users whose follow graph changed. '
+        'Tracking changes needs a shared cache (REDIS_URL); without one every user is recomputed'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recompute suggestions for every user',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of users scored per sparse matrix product',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=settings.FOLLOW_SUGGESTIONS_LIMIT,
+            help='Suggestions stored per user',
+        )
+
+    def handle(self, *args, **options):
+        users, stored = compute_suggestions(
+            full=options['full'],
+            batch_size=options['batch_size'],
+            limit=options['limit'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {stored} suggestions for {users} users"
+        ))
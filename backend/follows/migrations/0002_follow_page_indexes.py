@@ -0,0 +1,27 @@
+# Generated by Django 4.2.17 on 2026-10-18 22:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("follows", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="follow",
+            index=models.Index(
+                fields=["following", "-created_at", "-id"],
+                name="follows_followers_page_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="follow",
+            index=models.Index(
+                fields=["follower", "-created_at", "-id"],
+                name="follows_following_page_idx",
+            ),
+        ),
+    ]
@@ -1,5 +1,9 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
+from notifications.dispatch import buffered_notifications, emit
+from notifications.models import NotificationType
+from users.models import User
+from .graph import record_changes_on_commit
 
 class Follow(models.Model):
     follower = models.ForeignKey(
@@ -16,31 +20,133 @@ class Follow(models.Model):
     
     class Meta:
         unique_together = ('follower', 'following')
+        indexes = [
+            # Each followers/following page is a single range scan on one of these
+            models.Index(fields=['following', '-created_at', '-id'], name='follows_followers_page_idx'),
+            models.Index(fields=['follower', '-created_at', '-id'], name='follows_following_page_idx'),
+        ]
         
     def __str__(self):
         return f"{self.follower.username} follows {self.following.username}"
     
     def save(self, *args, **kwargs):
         # Check to make sure users don't follow themselves
-        if self.follower == self.following:
+        if self.follower_id == self.following_id:
             return
         
-        # Update counts on save
-        if self.pk is None:  # Only on create
-            self.follower.following_count += 1
-            self.follower.save(update_fields=['following_count'])
+        created = self.pk is None
+        with transaction.atomic():
+            super().save(*args, **kwargs)
             
-            self.following.followers_count += 1
-            self.following.save(update_fields=['followers_count'])
-            
-        super().save(*args, **kwargs)
+            # Update counts in the database so concurrent follows can't lose updates
+            if created:
+                User.adjust_counts({
+                    'following_count': {self.follower_id: 1},
+                    'followers_count': {self.following_id: 1},
+                })
+                record_changes_on_commit([(self.follower_id, self.following_id, True)])
+                FollowSuggestion.objects.filter(
+                    user_id=self.follower_id, suggested_user_id=self.following_id
+                ).delete()
         
-    def delete(self, *args, **kwargs):
-        # Update counts on delete
-        self.follower.following_count = max(0, self.follower.following_count - 1)
-        self.follower.save(update_fields=['following_count'])
+        if created:
+            emit(self.following_id, self.follower, NotificationType.FOLLOW)
         
-        self.following.followers_count = max(0, self.following.followers_count - 1)
-        self.following.save(update_fields=['followers_count'])
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            deleted, rows = super().delete(*args, **kwargs)
+            
+            # Only decrement if this call removed the row; counts never go below zero
+            if deleted:
+                User.adjust_counts({
+                    'following_count': {self.follower_id: -1},
+                    'followers_count': {self.following_id: -1},
+                })
+                record_changes_on_commit([(self.follower_id, self.following_id, False)])
         
-        super().delete(*args, **kwargs)
+        return deleted, rows
+
+    @classmethod
+    def bulk_follow(cls, follower, user_ids):
+        """
+        Follow many users with set-based writes.
+
+        Inserts the missing edges in one statement and applies the counter
+        changes in one UPDATE, instead of a save and two counter updates per
+        follow.
+
+        Args:
+            follower: User following the others
+            user_ids: Ids of the users to follow
+
+        Returns:
+            list: Ids of the users that were newly followed
+        """
+        user_ids = {user_id for user_id in user_ids if user_id != follower.id}
+        if not user_ids:
+            return []
+
+        with transaction.atomic():
+            # Serialize bulk follows of the same user
+            User.objects.select_for_update().filter(pk=follower.id).values_list('pk').first()
+            while True:
+                existing = set(
+                    cls.objects.filter(follower=follower, following_id__in=user_ids)
+                    .values_list('following_id', flat=True)
+                )
+                new_ids = sorted(user_ids - existing)
+                if not new_ids:
+                    return []
+                # Without ignore_conflicts every row is inserted or none is, so
+                # the counters below only move for edges that were written
+                try:
+                    with transaction.atomic():
+                        cls.objects.bulk_create(
+                            [cls(follower=follower, following_id=user_id) for user_id in new_ids],
+                            batch_size=1000
+                        )
+                    break
+                except IntegrityError:
+                    # A single follow of one of them got in first: try again without it
+                    if not cls.objects.filter(follower=follower, following_id__in=new_ids).exists():
+                        raise
+            User.adjust_counts({
+                'following_count': {follower.id: len(new_ids)},
+                'followers_count': {user_id: 1 for user_id in new_ids},
+            })
+            FollowSuggestion.objects.filter(user=follower, suggested_user_id__in=new_ids).delete()
+            record_changes_on_commit([(follower.id, user_id, True) for user_id in new_ids])
+
+            with buffered_notifications():
+                for user_id in new_ids:
+                    emit(user_id, follower, NotificationType.FOLLOW)
+
+        return new_ids
+
+
+class FollowSuggestion(models.Model):
+    """A precomputed "who to follow" suggestion, written by compute_follow_suggestions"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions'
+    )
+    suggested_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    score = models.FloatField()
+    # Accounts the user follows that already follow the suggested user
+    mutual_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'suggested_user')
+        indexes = [
+            # Serving a user's suggestions is one range scan in score order
+            models.Index(fields=['user', '-score'], name='follows_suggestion_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"Suggest {self.suggested_user_id} to {self.user_id}"
@@ -0,0 +1,35 @@
+from rest_framework import serializers
+from users.serializers import UserProfileSerializer
+from .models import FollowSuggestion
+
+
+class FollowUserSerializer(UserProfileSerializer):
+    """
+    A user in a followers/following list, with the viewer's relationship flags.
+
+    Expects ``following_ids`` and ``follower_ids`` (sets of user ids the viewer
+    follows / is followed by) in the serializer context.
+    """
+    followed_at = serializers.DateTimeField(read_only=True)
+    is_following = serializers.SerializerMethodField()
+    follows_you = serializers.SerializerMethodField()
+
+    class Meta(UserProfileSerializer.Meta):
+        fields = UserProfileSerializer.Meta.fields + ['followed_at', 'is_following', 'follows_you']
+        read_only_fields = fields
+
+    def get_is_following(self, obj):
+        return obj.id in self.context.get('following_ids', ())
+
+    def get_follows_you(self, obj):
+        return obj.id in self.context.get('follower_ids', ())
+
+
+class FollowSuggestionSerializer(serializers.ModelSerializer):
+    """A precomputed follow suggestion with the suggested user's profile"""
+    user = UserProfileSerializer(source='suggested_user', read_only=True)
+
+    class Meta:
+        model = FollowSuggestion
+        fields = ['user', 'mutual_count', 'score']
+        read_only_fields = fields
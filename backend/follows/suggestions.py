@@ -0,0 +1,203 @@
+"""
+Batch computation of "who to follow" suggestions.
+
+With ``A`` the follow adjacency matrix (``A[u, v] = 1`` when ``u`` follows
+``v``), the friends-of-friends paths for a batch of users are one sparse
+product: ``(A[batch] @ A)[u, c]`` counts the accounts ``u`` follows that follow
+``c``. Users who follow ``u`` but aren't followed back are candidates as well.
+Candidates are scored, filtered and cut to the top N per user, and the results
+replace the stored suggestions of the batch.
+"""
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from scipy import sparse
+
+from users.models import User
+from .graph import FollowGraph, read_changes
+from .models import FollowSuggestion
+
+logger = logging.getLogger(__name__)
+
+LAST_SEQ_KEY = 'follows:suggestions:seq'
+# Score features: mutual follows count 1 each
+FOLLOWS_YOU_WEIGHT = 2.0
+POPULARITY_WEIGHT = 0.1
+
+
+def adjacency_matrices(graph):
+    """Follow adjacency matrix and its transpose, sharing the graph's CSR arrays"""
+    shape = (graph.num_nodes, graph.num_nodes)
+    following = sparse.csr_matrix(
+        (np.ones(len(graph.following_neighbors), dtype=np.int32),
+         graph.following_neighbors, graph.following_offsets),
+        shape=shape
+    )
+    followers = sparse.csr_matrix(
+        (np.ones(len(graph.followers_neighbors), dtype=np.int32),
+         graph.followers_neighbors, graph.followers_offsets),
+        shape=shape
+    )
+    return following, followers
+
+
+def eligible_mask(num_nodes):
+    """Boolean array of the user ids that may be suggested"""
+    mask = np.zeros(num_nodes, dtype=bool)
+    ids = np.fromiter(
+        User.objects.filter(is_active=True, is_deleted=False).values_list('id', flat=True).iterator(),
+        dtype=np.int64
+    )
+    mask[ids[ids < num_nodes]] = True
+    return mask
+
+
+def _lookup(indices, data, keys):
+    """Values of a sorted sparse row at ``keys``, 0 where there is no entry"""
+    positions = np.searchsorted(indices, keys)
+    found = positions < len(indices)
+    found[found] = indices[positions[found]] == keys[found]
+    values = np.zeros(len(keys), dtype=np.int64)
+    values[found] = data[positions[found]]
+    return values
+
+
+def score_batch(user_ids, following, followers, eligible, popularity, limit):
+    """
+    Score the candidates of a batch of users.
+
+    Returns:
+        list: (user_id, suggested_user_id, score, mutual_count) tuples, best
+        first for each user
+    """
+    user_ids = np.asarray(user_ids, dtype=np.int64)
+    followed = following[user_ids]
+    mutual = (followed @ following).tocsr()
+    follows_you = followers[user_ids]
+
+    scores = (mutual.astype(np.float64) + FOLLOWS_YOU_WEIGHT * follows_you).tocsr()
+    # Drop accounts already followed
+    scores = (scores - scores.multiply(followed.astype(bool))).tocsr()
+    scores.eliminate_zeros()
+    scores.sort_indices()
+    mutual.sort_indices()
+
+    # Drop the users themselves and accounts that can't be suggested
+    rows = np.repeat(np.arange(len(user_ids)), np.diff(scores.indptr))
+    excluded = (scores.indices == user_ids[rows]) | ~eligible[scores.indices]
+    scores.data[excluded] = 0
+    scores.data[~excluded] += POPULARITY_WEIGHT * popularity[scores.indices[~excluded]]
+    scores.eliminate_zeros()
+
+    results = []
+    for row, user_id in enumerate(user_ids.tolist()):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        if start == end:
+            continue
+        candidates = scores.indices[start:end]
+        values = scores.data[start:end]
+        if len(values) > limit:
+            top = np.argpartition(-values, limit - 1)[:limit]
+        else:
+            top = np.arange(len(values))
+        top = top[np.argsort(-values[top], kind='stable')]
+
+        chosen = candidates[top]
+        counts = _lookup(
+            mutual.indices[mutual.indptr[row]:mutual.indptr[row + 1]],
+            mutual.data[mutual.indptr[row]:mutual.indptr[row + 1]],
+            chosen
+        )
+        results.extend(
+            (user_id, candidate, score, count)
+            for candidate, score, count in zip(chosen.tolist(), values[top].tolist(), counts.tolist())
+        )
+    return results
+
+
+def store_batch(user_ids, results):
+    """Replace the stored suggestions of a batch of users"""
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(user_id__in=list(user_ids)).delete()
+        FollowSuggestion.objects.bulk_create(
+            [
+                FollowSuggestion(user_id=user_id, suggested_user_id=suggested_id,
+                                 score=score, mutual_count=mutual_count)
+                for user_id, suggested_id, score, mutual_count in results
+            ],
+            batch_size=1000
+        )
+
+
+def changed_users(graph, after_seq, until_seq):
+    """
+    Users whose suggestions may have changed since ``after_seq``.
+
+    A change to ``follower -> following`` affects both ends and everyone who
+    follows ``follower``, whose friends-of-friends went through them.
+
+    Returns:
+        set: User ids, or None when the change feed no longer covers the range
+    """
+    changes = read_changes(after_seq, until_seq)
+    if changes is None:
+        return None
+
+    users = set()
+    for follower_id, following_id, _ in changes:
+        users.update((follower_id, following_id))
+        users.update(graph.followers(follower_id).tolist())
+    return users
+
+
+def compute_suggestions(user_ids=None, full=False, batch_size=1000, limit=None):
+    """
+    Recompute follow suggestions.
+
+    Without ``user_ids`` only users affected by follow changes since the last
+    run are recomputed, falling back to everyone on the first run or when the
+    change feed doesn't reach back far enough. The feed and the last run's
+    position live in the cache, so without a shared cache (``SHARED_CACHE``)
+    every run recomputes everyone.
+
+    Returns:
+        tuple: (users recomputed, suggestions stored)
+    """
+    limit = limit or settings.FOLLOW_SUGGESTIONS_LIMIT
+    graph = FollowGraph.build()
+    following, followers = adjacency_matrices(graph)
+    eligible = eligible_mask(graph.num_nodes)
+
+    if user_ids is None and not full and not settings.FOLLOW_GRAPH_ENABLED:
+        logger.warning(
+            "Follow changes aren't tracked without a shared cache (or with the follow graph disabled), "
+            "recomputing all suggestions"
+        )
+    elif user_ids is None and not full:
+        last_seq = cache.get(LAST_SEQ_KEY)
+        if last_seq is not None and last_seq <= graph.seq:
+            user_ids = changed_users(graph, last_seq, graph.seq)
+        if user_ids is None:
+            logger.info("Change feed doesn't cover the last run, recomputing all suggestions")
+
+    if user_ids is None:
+        user_ids = np.flatnonzero(eligible)
+    else:
+        user_ids = np.array(sorted(user_ids), dtype=np.int64)
+        user_ids = user_ids[user_ids < graph.num_nodes]
+        user_ids = user_ids[eligible[user_ids]]
+
+    popularity = np.log1p(np.diff(graph.followers_offsets))
+    stored = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        results = score_batch(batch, following, followers, eligible, popularity, limit)
+        store_batch(batch.tolist(), results)
+        stored += len(results)
+
+    # Changes made while computing are picked up by the next run
+    cache.set(LAST_SEQ_KEY, graph.seq, timeout=None)
+    return len(user_ids), stored
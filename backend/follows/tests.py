@@ -1,3 +1,380 @@
-from django.test import TestCase
+import sys
+import threading
 
-# Create your tests here.
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .graph import FollowGraph, get_graph, rebuild_graph, reset_graph
+from .models import Follow, FollowSuggestion
+from .suggestions import compute_suggestions
+
+User = get_user_model()
+
+
+def make_user(name):
+    return User.objects.create_user(
+        username=name,
+        email=f'{name}@example.com',
+        password='StrongPassword123!'
+    )
+
+
+def client_for(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+    return client
+
+
+@pytest.fixture
+def alice():
+    return make_user('alice')
+
+
+@pytest.fixture
+def bob():
+    return make_user('bob')
+
+
+@pytest.mark.django_db
+class TestFollowModel:
+    def test_counters_are_updated_in_the_database(self, alice, bob):
+        Follow.objects.create(follower=alice, following=bob)
+
+        alice.refresh_from_db()
+        bob.refresh_from_db()
+        assert alice.following_count == 1
+        assert bob.followers_count == 1
+
+    def test_stale_instances_do_not_overwrite_counters(self, alice, bob):
+        carol = make_user('carol')
+        stale_bob = User.objects.get(pk=bob.pk)
+        Follow.objects.create(follower=alice, following=bob)
+        Follow.objects.create(follower=carol, following=stale_bob)
+
+        bob.refresh_from_db()
+        assert bob.followers_count == 2
+
+    def test_delete_never_goes_below_zero(self, alice, bob):
+        follow = Follow.objects.create(follower=alice, following=bob)
+        concurrent_copy = Follow.objects.get(pk=follow.pk)
+        User.objects.filter(pk=bob.pk).update(followers_count=0)
+
+        follow.delete()
+        concurrent_copy.delete()
+
+        bob.refresh_from_db()
+        alice.refresh_from_db()
+        assert bob.followers_count == 0
+        assert alice.following_count == 0
+
+
+@pytest.mark.django_db
+class TestFollowAPI:
+    def test_follow_and_unfollow(self, alice, bob):
+        client = client_for(alice)
+
+        response = client.post('/api/v1/follows/bob/')
+        assert response.status_code == 201
+        assert response.data == {'following': True, 'followers_count': 1}
+
+        response = client.post('/api/v1/follows/bob/')
+        assert response.status_code == 400
+
+        response = client.delete('/api/v1/follows/bob/')
+        assert response.status_code == 200
+        assert response.data == {'following': False, 'followers_count': 0}
+        assert not Follow.objects.exists()
+
+    def test_cannot_follow_yourself(self, alice):
+        response = client_for(alice).post('/api/v1/follows/alice/')
+        assert response.status_code == 400
+
+    def test_followers_list_is_paginated_with_flags(self, alice, bob, django_assert_max_num_queries):
+        followers = [make_user(f'fan{i}') for i in range(5)]
+        for follower in followers:
+            Follow.objects.create(follower=follower, following=bob)
+        # alice follows fan4, fan3 follows alice
+        Follow.objects.create(follower=alice, following=followers[4])
+        Follow.objects.create(follower=followers[3], following=alice)
+        client = client_for(alice)
+
+        # user lookup + owner lookup + page + relationship flags
+        with django_assert_max_num_queries(4):
+            response = client.get('/api/v1/follows/bob/followers/?page_size=3')
+
+        assert response.status_code == 200
+        results = response.data['results']
+        assert [user['username'] for user in results] == ['fan4', 'fan3', 'fan2']
+        assert results[0]['is_following'] is True
+        assert results[1]['follows_you'] is True
+        assert results[2]['is_following'] is False
+
+        response = client.get(f"/api/v1/follows/bob/followers/?page_size=3&cursor={response.data['next_cursor']}")
+        assert [user['username'] for user in response.data['results']] == ['fan1', 'fan0']
+        assert response.data['next_cursor'] is None
+
+    def test_bulk_follow(self, alice, bob, django_capture_on_commit_callbacks):
+        carol = make_user('carol')
+        Follow.objects.create(follower=alice, following=bob)
+        client = client_for(alice)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = client.post('/api/v1/follows/-/bulk/', {
+                'user_ids': [bob.id, alice.id, 999999],
+                'usernames': ['carol', 'nobody'],
+            }, format='json')
+
+        assert response.status_code == 200
+        assert response.data == {'followed': 1, 'already_following': 1, 'not_found': ['999999', 'nobody']}
+        alice.refresh_from_db()
+        carol.refresh_from_db()
+        assert alice.following_count == 2
+        assert carol.followers_count == 1
+        assert carol.notifications_received.count() == 1
+
+    def test_bulk_follow_counts_only_the_edges_it_inserted(self, alice, bob, monkeypatch):
+        carol = make_user('carol')
+        lookup, raced = Follow.objects.filter, []
+
+        def stale_lookup(*args, **kwargs):
+            if raced:
+                return lookup(*args, **kwargs)
+            # A single follow of bob commits right after the existing edges were read
+            raced.append(Follow.objects.create(follower=alice, following=bob))
+            return lookup(*args, **kwargs).exclude(following=bob)
+        monkeypatch.setattr(Follow.objects, 'filter', stale_lookup)
+
+        assert Follow.bulk_follow(alice, [bob.id, carol.id]) == [carol.id]
+
+        alice.refresh_from_db()
+        bob.refresh_from_db()
+        assert (alice.following_count, bob.followers_count) == (2, 1)
+
+    def test_usernames_that_look_like_actions_can_be_followed(self, alice, django_capture_on_commit_callbacks):
+        bulk = make_user('bulk')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = client_for(alice).post('/api/v1/follows/bulk/')
+
+        assert response.status_code == 201
+        assert Follow.objects.filter(follower=alice, following=bulk).exists()
+
+    def test_bulk_follow_query_count_does_not_grow(self, alice, django_assert_max_num_queries):
+        users = [make_user(f'target{i}') for i in range(30)]
+
+        # auth, resolve, lock, existing edges, insert, counters, suggestions cleanup + 2 savepoints
+        with django_assert_max_num_queries(12):
+            response = client_for(alice).post('/api/v1/follows/-/bulk/', {
+                'user_ids': [user.id for user in users]
+            }, format='json')
+
+        assert response.data['followed'] == 30
+        assert Follow.objects.filter(follower=alice).count() == 30
+        assert set(User.objects.filter(pk__in=[u.id for u in users]).values_list('followers_count', flat=True)) == {1}
+
+    def test_bulk_follow_rejects_too_many(self, alice, settings):
+        settings.FOLLOW_BULK_MAX = 2
+        response = client_for(alice).post('/api/v1/follows/-/bulk/', {'user_ids': [1, 2, 3]}, format='json')
+        assert response.status_code == 400
+
+    def test_export_following(self, alice, bob):
+        Follow.objects.create(follower=alice, following=bob)
+
+        response = client_for(alice).get('/api/v1/follows/-/export/')
+
+        assert response.status_code == 200
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        assert lines[0] == 'user_id,username,followed_at'
+        assert lines[1].startswith(f'{bob.id},bob,')
+
+    def test_following_list(self, alice, bob):
+        Follow.objects.create(follower=alice, following=bob)
+
+        response = client_for(bob).get('/api/v1/follows/alice/following/')
+
+        assert [user['username'] for user in response.data['results']] == ['bob']
+        assert response.data['results'][0]['follows_you'] is False
+
+
+class TestFollowGraph:
+    def test_csr_queries(self):
+        # 1 -> 2, 1 -> 3, 2 -> 3, 3 -> 1
+        graph = FollowGraph.from_edges([1, 1, 2, 3], [2, 3, 3, 1])
+
+        assert graph.following(1).tolist() == [2, 3]
+        assert graph.followers(3).tolist() == [1, 2]
+        assert graph.is_following(2, 3)
+        assert not graph.is_following(3, 2)
+        assert not graph.is_following(99, 1)
+        assert graph.friends(1).tolist() == [3]
+        assert graph.followed_by(1, 3).tolist() == [2]
+
+    def test_overlay_applies_changes(self):
+        graph = FollowGraph.from_edges([1, 1], [2, 3])
+
+        graph.apply_change(1, 2, False)
+        graph.apply_change(4, 3, True)
+
+        assert graph.following(1).tolist() == [3]
+        assert graph.followers(3).tolist() == [1, 4]
+        assert graph.is_following(4, 3)
+        assert graph.followers_count(2) == 0
+
+    def test_overlay_reads_during_changes(self):
+        graph = FollowGraph.from_edges([1], [2])
+        done = threading.Event()
+
+        def churn():
+            for follower_id in range(3, 20000):
+                graph.apply_change(follower_id, 2, True)
+            done.set()
+
+        # Switch threads often enough for a read to overlap a change
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        writer = threading.Thread(target=churn)
+        writer.start()
+        try:
+            while not done.is_set():
+                graph.followers(2)
+                graph.overlay_size
+        finally:
+            writer.join()
+            sys.setswitchinterval(interval)
+
+        assert graph.followers_count(2) == 19998
+
+    def test_snapshot_round_trip(self, tmp_path):
+        FollowGraph.from_edges([1, 2], [2, 1], seq=5).save(tmp_path)
+
+        graph = FollowGraph.load(tmp_path)
+
+        assert graph.seq == 5
+        assert graph.friends(1).tolist() == [2]
+
+
+@pytest.mark.django_db
+class TestFollowGraphSync:
+    @pytest.fixture(autouse=True)
+    def fresh_graph(self):
+        cache.clear()
+        reset_graph()
+        yield
+        reset_graph()
+
+    def test_catches_up_with_follow_changes(self, alice, bob, django_capture_on_commit_callbacks):
+        graph = rebuild_graph()
+        assert not graph.is_following(alice.id, bob.id)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            follow = Follow.objects.create(follower=alice, following=bob)
+        assert get_graph() is graph
+        assert graph.is_following(alice.id, bob.id)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            follow.delete()
+        assert not get_graph().is_following(alice.id, bob.id)
+
+    def test_relationship_endpoint(self, alice, bob, django_assert_max_num_queries):
+        carol = make_user('carol')
+        Follow.objects.create(follower=alice, following=carol)
+        Follow.objects.create(follower=carol, following=bob)
+        Follow.objects.create(follower=bob, following=alice)
+        client = client_for(alice)
+        rebuild_graph()
+
+        # auth + user lookup + "followed by" usernames; no Follow queries
+        with django_assert_max_num_queries(3):
+            response = client.get('/api/v1/follows/bob/relationship/')
+
+        assert response.status_code == 200
+        assert response.data['is_following'] is False
+        assert response.data['follows_you'] is True
+        assert response.data['followers_count'] == 1
+        assert response.data['followed_by'] == ['carol']
+
+    def test_requests_never_build_the_graph(self, alice, django_assert_num_queries):
+        with django_assert_num_queries(0):
+            assert get_graph() is None
+
+    @pytest.mark.parametrize('enabled', [True, False])
+    def test_relationship_falls_back_to_the_database(self, alice, bob, settings, enabled):
+        settings.FOLLOW_GRAPH_ENABLED = enabled
+        carol = make_user('carol')
+        Follow.objects.create(follower=alice, following=carol)
+        Follow.objects.create(follower=carol, following=bob)
+        Follow.objects.create(follower=bob, following=alice)
+        Follow.objects.create(follower=alice, following=bob)
+
+        response = client_for(alice).get('/api/v1/follows/bob/relationship/')
+
+        assert get_graph() is None
+        assert response.data == {
+            'is_following': True, 'follows_you': True, 'followers_count': 2, 'following_count': 1,
+            'mutual_followers_count': 0, 'followed_by_count': 1, 'followed_by': ['carol'],
+        }
+
+
+@pytest.mark.django_db
+class TestFollowSuggestions:
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        cache.clear()
+
+    def test_friends_of_friends_are_suggested(self, alice, bob):
+        carol, dave = make_user('carol'), make_user('dave')
+        # alice -> bob -> carol, alice -> dave -> carol, dave follows alice back
+        Follow.objects.create(follower=alice, following=bob)
+        Follow.objects.create(follower=alice, following=dave)
+        Follow.objects.create(follower=bob, following=carol)
+        Follow.objects.create(follower=dave, following=carol)
+        Follow.objects.create(follower=dave, following=alice)
+
+        compute_suggestions(full=True)
+
+        suggestions = list(FollowSuggestion.objects.filter(user=alice).order_by('-score'))
+        assert [s.suggested_user_id for s in suggestions] == [carol.id]
+        assert suggestions[0].mutual_count == 2
+        # Followers who aren't followed back are suggested too
+        assert list(FollowSuggestion.objects.filter(user=bob).values_list('suggested_user', flat=True)) == [alice.id]
+
+    def test_incremental_run_only_recomputes_changed_users(self, alice, bob, django_capture_on_commit_callbacks):
+        carol = make_user('carol')
+        Follow.objects.create(follower=alice, following=bob)
+        compute_suggestions(full=True)
+        assert not FollowSuggestion.objects.filter(user=alice).exists()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Follow.objects.create(follower=bob, following=carol)
+        users, stored = compute_suggestions()
+
+        assert users == 3  # bob, carol and bob's follower alice
+        assert FollowSuggestion.objects.filter(user=alice, suggested_user=carol).exists()
+
+    def test_recomputes_everyone_without_a_shared_cache(self, alice, bob, settings, caplog):
+        settings.SHARED_CACHE = settings.FOLLOW_GRAPH_ENABLED = False
+        make_user('carol')
+        compute_suggestions(full=True)
+
+        users, _ = compute_suggestions()
+
+        assert users == User.objects.count()
+        assert "recomputing all suggestions" in caplog.text
+
+    def test_suggestions_endpoint_and_follow_removes_suggestion(self, alice, bob, django_assert_max_num_queries):
+        FollowSuggestion.objects.create(user=alice, suggested_user=bob, score=3.0, mutual_count=2)
+        client = client_for(alice)
+
+        # auth + suggestions
+        with django_assert_max_num_queries(2):
+            response = client.get('/api/v1/follows/-/suggestions/')
+
+        assert response.status_code == 200
+        assert response.data[0]['user']['username'] == 'bob'
+        assert response.data[0]['mutual_count'] == 2
+
+        client.post('/api/v1/follows/bob/')
+        assert not FollowSuggestion.objects.filter(user=alice).exists()
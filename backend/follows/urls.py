@@ -1,15 +1,35 @@
 from django.urls import path
 from django.http import JsonResponse
+from .views import (
+    BulkFollowView, FollowingExportView, FollowSuggestionsView, FollowView, FollowersListView, FollowingListView, RelationshipView
+)
 
 app_name = 'follows'
 
 def follow_api_root(request):
-    """Placeholder for follows API root"""
+    """Root endpoint for follows API"""
     return JsonResponse({
         "status": "success",
-        "message": "Follows API endpoints coming soon",
+        "message": "Follows API is running",
+        "endpoints": {
+            "bulk_follow": "-/bulk/",
+            "export_following": "-/export/",
+            "suggestions": "-/suggestions/",
+            "follow": "<username>/",
+            "followers": "<username>/followers/",
+            "following": "<username>/following/",
+            "relationship": "<username>/relationship/",
+        }
     })
 
+# Actions live under "-/", which no username route can match
 urlpatterns = [
     path('', follow_api_root, name='follow-api-root'),
-] 
\ No newline at end of file
+    path('-/bulk/', BulkFollowView.as_view(), name='bulk-follow'),
+    path('-/export/', FollowingExportView.as_view(), name='export-following'),
+    path('-/suggestions/', FollowSuggestionsView.as_view(), name='follow-suggestions'),
+    path('<str:username>/', FollowView.as_view(), name='follow'),
+    path('<str:username>/followers/', FollowersListView.as_view(), name='followers'),
+    path('<str:username>/following/', FollowingListView.as_view(), name='following'),
+    path('<str:username>/relationship/', RelationshipView.as_view(), name='relationship'),
+]
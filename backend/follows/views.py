@@ -1,3 +1,295 @@
-from django.shortcuts import render
+import csv
 
-# Create your views here.
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.pagination import KeysetPagination
+from users.models import User
+from .graph import get_graph
+from .models import Follow, FollowSuggestion
+from .serializers import FollowSuggestionSerializer, FollowUserSerializer
+
+
+def get_relationship_ids(viewer, user_ids):
+    """
+    Get the viewer's relationships with a batch of users in one query.
+
+    Returns:
+        tuple: (following_ids, follower_ids) - ids the viewer follows, and ids
+        that follow the viewer
+    """
+    following_ids, follower_ids = set(), set()
+    if not user_ids:
+        return following_ids, follower_ids
+
+    rows = Follow.objects.filter(
+        Q(follower=viewer, following_id__in=user_ids) |
+        Q(follower_id__in=user_ids, following=viewer)
+    ).values_list('follower_id', 'following_id')
+    for follower_id, following_id in rows:
+        if follower_id == viewer.id:
+            following_ids.add(following_id)
+        else:
+            follower_ids.add(follower_id)
+    return following_ids, follower_ids
+
+
+class FollowView(APIView):
+    """Follow or unfollow a user"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_target(self, username):
+        return get_object_or_404(User, username=username, is_deleted=False)
+
+    def post(self, request, username):
+        target = self.get_target(username)
+
+        if target.id == request.user.id:
+            return Response(
+                {'error': 'You cannot follow yourself'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if Follow.objects.filter(follower=request.user, following=target).exists():
+            return Response(
+                {'error': 'You are already following this user'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            Follow(follower=request.user, following=target).save()
+        except IntegrityError:
+            # A concurrent request created the same follow
+            return Response(
+                {'error': 'You are already following this user'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        target.refresh_from_db(fields=['followers_count'])
+        return Response(
+            {'following': True, 'followers_count': target.followers_count},
+            status=status.HTTP_201_CREATED
+        )
+
+    def delete(self, request, username):
+        target = self.get_target(username)
+
+        follow = Follow.objects.filter(follower=request.user, following=target).first()
+        if follow is None:
+            return Response(
+                {'error': 'You are not following this user'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        follow.delete()
+        target.refresh_from_db(fields=['followers_count'])
+        return Response({'following': False, 'followers_count': target.followers_count})
+
+
+class BulkFollowView(APIView):
+    """
+    Follow many users at once.
+
+    Accepts ``user_ids`` and/or ``usernames`` (up to FOLLOW_BULK_MAX in total).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        user_ids = request.data.get('user_ids') or []
+        usernames = request.data.get('usernames') or []
+        if not isinstance(user_ids, list) or not isinstance(usernames, list):
+            return Response(
+                {'error': 'user_ids and usernames must be lists'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not user_ids and not usernames:
+            return Response(
+                {'error': 'Provide user_ids or usernames'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(user_ids) + len(usernames) > settings.FOLLOW_BULK_MAX:
+            return Response(
+                {'error': f'You can follow at most {settings.FOLLOW_BULK_MAX} users at once'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            user_ids = {int(user_id) for user_id in user_ids}
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'user_ids must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        usernames = {str(username) for username in usernames}
+
+        found = User.objects.filter(
+            Q(id__in=user_ids) | Q(username__in=usernames),
+            is_active=True,
+            is_deleted=False
+        ).values_list('id', 'username')
+        found_ids = {user_id for user_id, _ in found}
+        found_usernames = {username for _, username in found}
+
+        followed = Follow.bulk_follow(request.user, found_ids)
+        return Response({
+            'followed': len(followed),
+            'already_following': len(found_ids - set(followed) - {request.user.id}),
+            'not_found': sorted(map(str, user_ids - found_ids)) + sorted(usernames - found_usernames),
+        })
+
+
+class _Echo:
+    """File-like object whose write returns the value, for streaming csv rows"""
+
+    def write(self, value):
+        return value
+
+
+class FollowingExportView(APIView):
+    """Stream the accounts the current user follows as CSV"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        rows = Follow.objects.filter(follower=request.user).order_by('created_at', 'id').values_list(
+            'following_id', 'following__username', 'created_at'
+        )
+        writer = csv.writer(_Echo())
+
+        def stream():
+            yield writer.writerow(['user_id', 'username', 'followed_at'])
+            for user_id, username, created_at in rows.iterator(chunk_size=2000):
+                yield writer.writerow([user_id, username, created_at.isoformat()])
+
+        response = StreamingHttpResponse(stream(), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{request.user.username}-following.csv"'
+        return response
+
+
+class RelationshipView(APIView):
+    """
+    Relationship between the current user and another user.
+
+    Served from the follow graph, or from the database while the graph isn't
+    available in this process.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    followed_by_limit = 3
+
+    def get(self, request, username):
+        target = get_object_or_404(User, username=username, is_deleted=False)
+        graph = get_graph()
+        if graph is not None:
+            relationship = self.from_graph(graph, request.user, target)
+        else:
+            relationship = self.from_database(request.user, target)
+
+        hint_ids = relationship.pop('followed_by_hint')
+        usernames = dict(
+            User.objects.filter(id__in=hint_ids).values_list('id', 'username')
+        ) if hint_ids else {}
+        relationship['followed_by'] = [usernames[user_id] for user_id in hint_ids if user_id in usernames]
+        return Response(relationship)
+
+    def from_graph(self, graph, viewer, target):
+        followed_by = graph.followed_by(viewer.id, target.id)
+        return {
+            'is_following': graph.is_following(viewer.id, target.id),
+            'follows_you': graph.is_following(target.id, viewer.id),
+            'followers_count': graph.followers_count(target.id),
+            'following_count': graph.following_count(target.id),
+            'mutual_followers_count': len(graph.mutual_followers(viewer.id, target.id)),
+            'followed_by_count': len(followed_by),
+            'followed_by_hint': followed_by[:self.followed_by_limit].tolist(),
+        }
+
+    def from_database(self, viewer, target):
+        following_ids, follower_ids = get_relationship_ids(viewer, [target.id])
+        target_followers = Follow.objects.filter(following=target)
+        mutual = target_followers.filter(
+            follower_id__in=Follow.objects.filter(following=viewer).values('follower_id')
+        )
+        followed_by = target_followers.filter(
+            follower_id__in=Follow.objects.filter(follower=viewer).values('following_id')
+        ).order_by('follower_id').values_list('follower_id', flat=True)
+        return {
+            'is_following': target.id in following_ids,
+            'follows_you': target.id in follower_ids,
+            'followers_count': target.followers_count,
+            'following_count': target.following_count,
+            'mutual_followers_count': mutual.count(),
+            'followed_by_count': followed_by.count(),
+            'followed_by_hint': list(followed_by[:self.followed_by_limit]),
+        }
+
+
+class FollowListView(generics.ListAPIView):
+    """Base view for keyset-paginated followers/following lists"""
+    serializer_class = FollowUserSerializer
+    pagination_class = KeysetPagination
+    permission_classes = [permissions.IsAuthenticated]
+    # Side of the Follow row that holds the listed users
+    user_field = None
+    # Side of the Follow row that must match the profile being viewed
+    owner_field = None
+
+    def get_queryset(self):
+        owner = get_object_or_404(User, username=self.kwargs['username'], is_deleted=False)
+        return Follow.objects.filter(**{self.owner_field: owner}).select_related(self.user_field)
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
+
+        users = []
+        for follow in page:
+            user = getattr(follow, self.user_field)
+            user.followed_at = follow.created_at
+            users.append(user)
+
+        following_ids, follower_ids = get_relationship_ids(request.user, [user.id for user in users])
+        serializer = self.get_serializer(users, many=True, context={
+            **self.get_serializer_context(),
+            'following_ids': following_ids,
+            'follower_ids': follower_ids,
+        })
+        return self.get_paginated_response(serializer.data)
+
+
+class FollowersListView(FollowListView):
+    """Users following the given user, newest first"""
+    user_field = 'follower'
+    owner_field = 'following'
+
+
+class FollowingListView(FollowListView):
+    """Users the given user follows, newest first"""
+    user_field = 'following'
+    owner_field = 'follower'
+
+
+class FollowSuggestionsView(generics.ListAPIView):
+    """
+    "Who to follow" suggestions for the current user.
+
+    Suggestions are precomputed by compute_follow_suggestions, so this is a
+    single read of the user's top rows.
+    """
+    serializer_class = FollowSuggestionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    default_limit = 5
+
+    def get_queryset(self):
+        try:
+            limit = int(self.request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            limit = self.default_limit
+        limit = max(1, min(limit, settings.FOLLOW_SUGGESTIONS_LIMIT))
+
+        return FollowSuggestion.objects.filter(
+            user=self.request.user,
+            suggested_user__is_deleted=False,
+        ).select_related('suggested_user').order_by('-score')[:limit]
@@ -0,0 +1,247 @@
+"""
+Buffered notification pipeline.
+
+Write paths call ``emit()`` instead of creating ``Notification`` rows directly.
+Events are coalesced per (recipient, type, tweet) so a burst of likes on one
+tweet collapses into a single unread row ("alice and 41 others liked your
+tweet"), and new rows are written with ``bulk_create`` in batches. Each row
+keeps a small sample of its most recent actors, so someone who likes, unlikes
+and likes again is counted once, while the count itself is bumped with an
+``F()`` expression rather than recounted.
+
+Events emitted in one transaction share a buffer that is flushed on commit;
+bulk write paths can also wrap their work in ``buffered_notifications()`` so
+every event emitted inside the block is flushed in one go when the block exits.
+"""
+import logging
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.events import hub, user_topic
+from .models import RECENT_ACTORS, Notification, NotificationType
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+VERBS = {
+    NotificationType.FOLLOW: 'followed you',
+    NotificationType.LIKE: 'liked your tweet',
+    NotificationType.MENTION: 'mentioned you in a tweet',
+    NotificationType.RETWEET: 'retweeted your tweet',
+}
+
+_local = threading.local()
+
+
+def build_content(notification_type, sender_username, actor_count):
+    """Render the notification text for a (possibly grouped) row"""
+    verb = VERBS[notification_type]
+    others = actor_count - 1
+    if others == 1:
+        return f"{sender_username} and 1 other {verb}"
+    if others > 1:
+        return f"{sender_username} and {others} others {verb}"
+    return f"{sender_username} {verb}"
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class NotificationBuffer:
+    """Collects notification events in memory and writes them in batches"""
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        # (recipient_id, notification_type, tweet_id) -> [latest sender, sender ids oldest first]
+        self._groups = OrderedDict()
+
+    def __len__(self):
+        return len(self._groups)
+
+    def add(self, recipient_id, sender, notification_type, tweet_id=None):
+        """Queue one event; users are never notified about their own actions"""
+        if recipient_id is None or recipient_id == sender.pk:
+            return
+        key = (recipient_id, notification_type, tweet_id)
+        group = self._groups.get(key)
+        if group is None:
+            self._groups[key] = [sender, {sender.pk: None}]
+        else:
+            group[0] = sender
+            group[1].pop(sender.pk, None)
+            group[1][sender.pk] = None
+
+    def flush(self):
+        """
+        Write all queued events.
+
+        Events are merged into the recipient's existing unread row for the same
+        type and target when there is one; otherwise a new row is created.
+
+        Returns:
+            tuple: (created, updated) lists of Notification instances
+        """
+        if not self._groups:
+            return [], []
+
+        groups, self._groups = self._groups, OrderedDict()
+
+        # Look up existing unread rows with one query per (type, tweet) chunk
+        targets = OrderedDict()
+        for recipient_id, notification_type, tweet_id in groups:
+            targets.setdefault((notification_type, tweet_id), []).append(recipient_id)
+
+        now = timezone.now()
+        created, updated = [], []
+
+        with transaction.atomic():
+            existing = {}
+            for (notification_type, tweet_id), recipient_ids in targets.items():
+                for chunk in _chunks(recipient_ids, self.batch_size):
+                    rows = Notification.objects.select_for_update().filter(
+                        recipient_id__in=chunk,
+                        notification_type=notification_type,
+                        tweet_id=tweet_id,
+                        is_read=False
+                    ).order_by('created_at')
+                    for notification in rows:
+                        existing[(notification.recipient_id, notification_type, tweet_id)] = notification
+
+            actor_counts = {}
+            for key, (sender, actor_ids) in groups.items():
+                recipient_id, notification_type, tweet_id = key
+                recent = list(reversed(actor_ids))
+                notification = existing.get(key)
+                if notification is not None:
+                    # Actors that dropped out of the sample are counted again,
+                    # the price of not keeping every actor
+                    new = sum(1 for actor_id in recent if actor_id not in notification.recent_actor_ids)
+                    actor_counts[notification.id] = notification.actor_count + new
+                    notification.sender = sender
+                    notification.recent_actor_ids = (recent + [
+                        actor_id for actor_id in notification.recent_actor_ids if actor_id not in actor_ids
+                    ])[:RECENT_ACTORS]
+                    notification.content = build_content(notification_type, sender.username, actor_counts[notification.id])
+                    # Relative, so the count holds even where select_for_update() is a no-op (SQLite)
+                    notification.actor_count = F('actor_count') + new
+                    notification.created_at = now
+                    updated.append(notification)
+                else:
+                    created.append(Notification(
+                        recipient_id=recipient_id,
+                        sender=sender,
+                        notification_type=notification_type,
+                        tweet_id=tweet_id,
+                        actor_count=len(actor_ids),
+                        recent_actor_ids=recent[:RECENT_ACTORS],
+                        content=build_content(notification_type, sender.username, len(actor_ids)),
+                    ))
+
+            if created:
+                Notification.objects.bulk_create(created, batch_size=self.batch_size)
+            if updated:
+                Notification.objects.bulk_update(
+                    updated,
+                    ['sender', 'actor_count', 'recent_actor_ids', 'content', 'created_at'],
+                    batch_size=self.batch_size
+                )
+                for notification in updated:
+                    notification.actor_count = actor_counts[notification.id]
+
+        # Coalesced rows were already unread, only new rows move the badge
+        new_per_recipient = Counter(notification.recipient_id for notification in created)
+        for recipient_id, count in new_per_recipient.items():
+            Notification.adjust_unread_count(recipient_id, count)
+
+        for notification in created + updated:
+            hub.publish(user_topic(notification.recipient_id), 'notification', {
+                'id': notification.id,
+                'notification_type': notification.notification_type,
+                'tweet': notification.tweet_id,
+                'actor_count': notification.actor_count,
+                'content': notification.content,
+            })
+
+        logger.debug("Flushed notifications: %s created, %s coalesced", len(created), len(updated))
+        return created, updated
+
+
+def _buffer_stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _safe_flush(buffer):
+    """Notifications are best effort and must never fail the originating request"""
+    try:
+        buffer.flush()
+    except Exception:
+        logger.exception("Failed to flush notifications")
+
+
+def _transaction_buffer(connection):
+    """The buffer shared by events emitted in the current transaction, flushed when it commits"""
+    pending = getattr(_local, 'pending', None)
+    # A rollback discards the commit callback, and the buffer with it
+    if pending is not None and any(callback is pending[1] for _, callback, _ in connection.run_on_commit):
+        return pending[0]
+
+    buffer = NotificationBuffer()
+
+    def flush():
+        _local.pending = None
+        _safe_flush(buffer)
+
+    _local.pending = (buffer, flush)
+    transaction.on_commit(flush)
+    return buffer
+
+
+@contextmanager
+def buffered_notifications(batch_size=BATCH_SIZE):
+    """
+    Buffer every event emitted inside the block and flush them together.
+
+    Nothing is written if the block raises.
+    """
+    buffer = NotificationBuffer(batch_size=batch_size)
+    stack = _buffer_stack()
+    stack.append(buffer)
+    try:
+        yield buffer
+    finally:
+        stack.pop()
+    transaction.on_commit(lambda: _safe_flush(buffer))
+
+
+def emit(recipient_id, sender, notification_type, tweet_id=None):
+    """
+    Emit a notification event.
+
+    Joins the innermost ``buffered_notifications()`` block when there is one,
+    otherwise the events of the current transaction are coalesced and flushed
+    once it commits. Outside a transaction the event is written right away.
+    """
+    stack = _buffer_stack()
+    if stack:
+        stack[-1].add(recipient_id, sender, notification_type, tweet_id)
+        return
+
+    connection = transaction.get_connection()
+    if connection.in_atomic_block:
+        _transaction_buffer(connection).add(recipient_id, sender, notification_type, tweet_id)
+        return
+
+    buffer = NotificationBuffer()
+    buffer.add(recipient_id, sender, notification_type, tweet_id)
+    _safe_flush(buffer)
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notifications.models import Notification
+
+
+class Command(BaseCommand):
+    help = 'Delete read notifications older than the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.NOTIFICATION_RETENTION_DAYS,
+            help='Keep read notifications newer than this many days',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of rows deleted per statement',
+        )
+
+    def handle(self, *args, **options):
+        deleted = Notification.prune(days=options['days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} read notifications older than {options['days']} days"
+        ))
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.17 on 2026-10-18 22:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0002_notification_tweet_actor_count"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["recipient", "is_read", "-created_at"],
+                name="notif_recipient_unread_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.17 on 2026-10-18 23:51
+
+from django.db import migrations, models
+
+from core.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently on PostgreSQL, which can't run in a transaction
+    atomic = False
+
+    dependencies = [
+        ("notifications", "0003_notification_recipient_unread_idx"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="notification",
+            index=models.Index(
+                fields=["recipient", "-created_at", "-id"],
+                name="notif_recipient_page_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="notification",
+            index=models.Index(
+                condition=models.Q(("is_read", True)),
+                fields=["created_at"],
+                name="notif_read_created_idx",
+            ),
+        ),
+    ]
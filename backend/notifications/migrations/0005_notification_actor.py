@@ -0,0 +1,52 @@
+# Generated by Django 4.2.17 on 2026-10-19 00:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("notifications", "0004_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationActor",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "actor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "notification",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="actors",
+                        to="notifications.notification",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="notificationactor",
+            constraint=models.UniqueConstraint(
+                fields=("notification", "actor"), name="notif_actor_unique"
+            ),
+        ),
+    ]
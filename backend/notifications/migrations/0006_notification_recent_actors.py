@@ -0,0 +1,29 @@
+# Generated by Django 4.2.17 on 2026-10-19 01:20
+
+from django.db import migrations, models
+
+
+def seed_recent_actors(apps, schema_editor):
+    # Start unread rows off with their latest actor so it isn't counted twice
+    Notification = apps.get_model('notifications', 'Notification')
+    for notification in Notification.objects.filter(is_read=False).only('id', 'sender_id').iterator():
+        Notification.objects.filter(id=notification.id).update(recent_actor_ids=[notification.sender_id])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0005_notification_actor"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="recent_actor_ids",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(seed_recent_actors, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name="NotificationActor",
+        ),
+    ]
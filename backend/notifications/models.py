@@ -1,5 +1,14 @@
+from datetime import timedelta
+
 from django.db import models
+from django.db.models import Q
 from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.pagination import keyset_filter
+
+RECENT_ACTORS = 3
 
 class NotificationType(models.TextChoices):
     FOLLOW = 'follow', 'Follow'
@@ -22,16 +31,118 @@ class Notification(models.Model):
         max_length=10,
         choices=NotificationType.choices
     )
+    tweet = models.ForeignKey(
+        'tweets.Tweet',
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        null=True,
+        blank=True
+    )
+    # Number of distinct users coalesced into this row ("X and 41 others ...")
+    actor_count = models.PositiveIntegerField(default=1)
+    # The most recent of those users, newest first, capped at RECENT_ACTORS;
+    # a repeat actor still in the sample is not counted again
+    recent_actor_ids = models.JSONField(default=list, blank=True)
     content = models.TextField()
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Serves the unread badge count and the list/mark-read range scans
+            models.Index(fields=['recipient', 'is_read', '-created_at'], name='notif_recipient_unread_idx'),
+            # Keyset pages of all of a recipient's notifications
+            models.Index(fields=['recipient', '-created_at', '-id'], name='notif_recipient_page_idx'),
+            # Pruning only ever looks at read notifications
+            models.Index(fields=['created_at'], condition=Q(is_read=True), name='notif_read_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.notification_type} notification from {self.sender.username} to {self.recipient.username}"
     
     def mark_as_read(self):
+        if self.is_read:
+            return
+        updated = Notification.objects.filter(pk=self.pk, is_read=False).update(is_read=True)
         self.is_read = True
-        self.save(update_fields=['is_read'])
+        if updated:
+            Notification.adjust_unread_count(self.recipient_id, -updated)
+    
+    @staticmethod
+    def unread_cache_key(user_id):
+        return f'notifications:unread:{user_id}'
+    
+    @classmethod
+    def unread_count(cls, user_id):
+        """
+        Get the number of unread notifications for a user.
+        
+        Served from the cache; the COUNT only runs on a cache miss and is
+        bounded by the (recipient, is_read, created_at) index. Without a shared
+        cache every worker would keep its own counter, so it always counts.
+        """
+        if not settings.SHARED_CACHE:
+            return cls.objects.filter(recipient_id=user_id, is_read=False).count()
+        key = cls.unread_cache_key(user_id)
+        count = cache.get(key)
+        if count is None:
+            count = cls.objects.filter(recipient_id=user_id, is_read=False).count()
+            cache.set(key, count, settings.NOTIFICATION_UNREAD_CACHE_TIMEOUT)
+        return max(count, 0)
+    
+    @classmethod
+    def adjust_unread_count(cls, user_id, delta):
+        """Keep a cached unread counter in step with a write"""
+        if not delta or not settings.SHARED_CACHE:
+            return
+        try:
+            cache.incr(cls.unread_cache_key(user_id), delta)
+        except ValueError:
+            # Not cached, the next read recomputes it
+            pass
+    
+    @classmethod
+    def mark_all_as_read(cls, user_id, position=None):
+        """
+        Mark a user's notifications as read with a single UPDATE.
+        
+        Args:
+            user_id: The recipient
+            position: Optional (created_at, id) tuple; only notifications at or
+                before this position are marked
+        
+        Returns:
+            int: Number of notifications marked as read
+        """
+        queryset = cls.objects.filter(recipient_id=user_id, is_read=False)
+        if position is not None:
+            queryset = queryset.filter(keyset_filter(*position, inclusive=True))
+        updated = queryset.update(is_read=True)
+        
+        if position is not None:
+            cls.adjust_unread_count(user_id, -updated)
+        elif settings.SHARED_CACHE:
+            cache.set(cls.unread_cache_key(user_id), 0, settings.NOTIFICATION_UNREAD_CACHE_TIMEOUT)
+        return updated
+    
+    @classmethod
+    def prune(cls, days=None, batch_size=1000):
+        """
+        Delete read notifications older than the retention window in batches.
+        
+        Returns:
+            int: Number of notifications deleted
+        """
+        if days is None:
+            days = settings.NOTIFICATION_RETENTION_DAYS
+        cutoff = timezone.now() - timedelta(days=days)
+        queryset = cls.objects.filter(is_read=True, created_at__lt=cutoff).order_by()
+        
+        deleted = 0
+        while True:
+            ids = list(queryset.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += cls.objects.filter(id__in=ids).delete()[0]
+
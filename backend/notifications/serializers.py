@@ -0,0 +1,13 @@
+from rest_framework import serializers
+from .models import Notification
+from users.serializers import UserProfileSerializer
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    sender = UserProfileSerializer(read_only=True)
+
+    class Meta:
+        model = Notification
+        fields = ['id', 'notification_type', 'sender', 'tweet', 'actor_count',
+                  'content', 'is_read', 'created_at']
+        read_only_fields = fields
@@ -1,3 +1,213 @@
-from django.test import TestCase
+import pytest
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
 
-# Create your tests here.
+from tweets.models import Tweet
+from follows.models import Follow
+from .models import Notification, NotificationType
+from .dispatch import NotificationBuffer, buffered_notifications, emit
+
+User = get_user_model()
+
+
+def make_user(name):
+    return User.objects.create_user(
+        username=name,
+        email=f'{name}@example.com',
+        password='StrongPassword123!'
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def author():
+    return make_user('author')
+
+
+@pytest.fixture
+def tweet(author):
+    return Tweet.objects.create(content='Hello world', author=author)
+
+
+@pytest.mark.django_db
+class TestNotificationPipeline:
+    def test_likes_on_one_tweet_coalesce_into_one_row(self, author, tweet, django_capture_on_commit_callbacks):
+        likers = [make_user(f'liker{i}') for i in range(3)]
+        with django_capture_on_commit_callbacks(execute=True):
+            for liker in likers:
+                emit(author.id, liker, NotificationType.LIKE, tweet_id=tweet.id)
+
+        notification = Notification.objects.get(recipient=author)
+        assert notification.actor_count == 3
+        assert notification.sender == likers[-1]
+        assert notification.content == 'liker2 and 2 others liked your tweet'
+
+    def test_repeat_actors_are_counted_once(self, author, tweet, django_capture_on_commit_callbacks):
+        alice, bob = make_user('alice'), make_user('bob')
+        # Across flushes too: like, unlike and like again
+        for liker in (alice, bob, alice, alice):
+            with django_capture_on_commit_callbacks(execute=True):
+                emit(author.id, liker, NotificationType.LIKE, tweet_id=tweet.id)
+
+        notification = Notification.objects.get(recipient=author)
+        assert notification.actor_count == 2
+        assert notification.content == 'alice and 1 other liked your tweet'
+
+    def test_events_in_one_transaction_share_a_flush(self, author, tweet, django_capture_on_commit_callbacks):
+        likers = [make_user(f'liker{i}') for i in range(3)]
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            for liker in likers:
+                emit(author.id, liker, NotificationType.LIKE, tweet_id=tweet.id)
+
+        assert len(callbacks) == 1
+        notification = Notification.objects.get(recipient=author)
+        assert notification.recent_actor_ids == [likers[2].id, likers[1].id, likers[0].id]
+
+    def test_read_group_starts_a_new_row(self, author, tweet, django_capture_on_commit_callbacks):
+        first, second = make_user('first'), make_user('second')
+        with django_capture_on_commit_callbacks(execute=True):
+            emit(author.id, first, NotificationType.LIKE, tweet_id=tweet.id)
+        Notification.objects.filter(recipient=author).update(is_read=True)
+        with django_capture_on_commit_callbacks(execute=True):
+            emit(author.id, second, NotificationType.LIKE, tweet_id=tweet.id)
+
+        assert Notification.objects.filter(recipient=author).count() == 2
+        assert Notification.objects.get(recipient=author, is_read=False).actor_count == 1
+
+    def test_no_notification_for_own_actions(self, author, tweet, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            emit(author.id, author, NotificationType.LIKE, tweet_id=tweet.id)
+        assert not Notification.objects.exists()
+
+    def test_buffer_writes_in_batches(self, author, django_assert_max_num_queries):
+        followers = [make_user(f'follower{i}') for i in range(10)]
+        buffer = NotificationBuffer(batch_size=4)
+        for follower in followers:
+            buffer.add(follower.id, author, NotificationType.FOLLOW)
+
+        # savepoint + 3 lookups + 3 inserts + release
+        with django_assert_max_num_queries(8):
+            created, updated = buffer.flush()
+
+        assert len(created) == 10
+        assert updated == []
+        assert Notification.objects.filter(sender=author).count() == 10
+
+    def test_buffered_block_flushes_on_exit(self, author, django_capture_on_commit_callbacks):
+        followers = [make_user(f'fan{i}') for i in range(5)]
+        with django_capture_on_commit_callbacks(execute=True):
+            with buffered_notifications():
+                for follower in followers:
+                    Follow.objects.create(follower=follower, following=author)
+                assert not Notification.objects.exists()
+
+        notification = Notification.objects.get(recipient=author)
+        assert notification.notification_type == NotificationType.FOLLOW
+        assert notification.content == 'fan4 and 4 others followed you'
+
+    def test_like_endpoint_emits_notification(self, author, tweet, django_capture_on_commit_callbacks):
+        liker = make_user('liker')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(liker).access_token}')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = client.post(f'/api/v1/tweets/{tweet.id}/like/')
+
+        assert response.status_code == 200
+        notification = Notification.objects.get(recipient=author)
+        assert notification.tweet_id == tweet.id
+        assert notification.notification_type == NotificationType.LIKE
+
+
+@pytest.mark.django_db
+class TestNotificationAPI:
+    @pytest.fixture
+    def client(self, author):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(author).access_token}')
+        return client
+
+    @pytest.fixture
+    def notifications(self, author):
+        senders = [make_user(f'sender{i}') for i in range(5)]
+        buffer = NotificationBuffer()
+        for sender in senders:
+            buffer.add(author.id, sender, NotificationType.FOLLOW)
+            # Distinct tweets keep the events from coalescing
+            tweet = Tweet.objects.create(content='tweet', author=author)
+            buffer.add(author.id, sender, NotificationType.LIKE, tweet_id=tweet.id)
+        buffer.flush()
+        return Notification.objects.filter(recipient=author)
+
+    def test_list_is_keyset_paginated(self, client, notifications):
+        response = client.get('/api/v1/notifications/?page_size=4')
+        assert response.status_code == 200
+        assert len(response.data['results']) == 4
+        assert response.data['next_cursor']
+
+        seen = [item['id'] for item in response.data['results']]
+        while response.data['next_cursor']:
+            response = client.get(f"/api/v1/notifications/?page_size=4&cursor={response.data['next_cursor']}")
+            seen += [item['id'] for item in response.data['results']]
+
+        assert sorted(seen) == sorted(notifications.values_list('id', flat=True))
+
+    def test_unread_count_is_served_from_cache(self, author, client, notifications, django_assert_num_queries):
+        assert client.get('/api/v1/notifications/unread_count/').data['unread_count'] == 6
+
+        with django_assert_num_queries(0):
+            assert Notification.unread_count(author.id) == 6
+
+    def test_unread_count_is_counted_without_a_shared_cache(self, author, client, notifications, settings):
+        settings.SHARED_CACHE = False
+        Notification.unread_count(author.id)
+        client.post('/api/v1/notifications/mark_read/')
+
+        assert Notification.unread_count(author.id) == 0
+        assert cache.get(Notification.unread_cache_key(author.id)) is None
+
+    def test_unread_count_follows_new_notifications(self, author, client, notifications):
+        client.get('/api/v1/notifications/unread_count/')
+        buffer = NotificationBuffer()
+        buffer.add(author.id, make_user('latecomer'), NotificationType.MENTION)
+        buffer.flush()
+
+        assert client.get('/api/v1/notifications/unread_count/').data['unread_count'] == 7
+
+    def test_mark_read_up_to_cursor(self, client, notifications):
+        page = client.get('/api/v1/notifications/?page_size=2').data
+        second_page = client.get(f"/api/v1/notifications/?page_size=2&cursor={page['next_cursor']}").data
+
+        response = client.post('/api/v1/notifications/mark_read/', {'cursor': second_page['read_cursor']})
+
+        assert response.status_code == 200
+        # Everything from the first item of the second page downwards is read
+        assert response.data['marked_read'] == 4
+        assert response.data['unread_count'] == 2
+
+    def test_mark_all_read(self, client, notifications):
+        response = client.post('/api/v1/notifications/mark_read/')
+        assert response.data == {'marked_read': 6, 'unread_count': 0}
+        assert not notifications.filter(is_read=False).exists()
+
+    def test_prune_removes_old_read_notifications(self, notifications):
+        old = timezone.now() - timedelta(days=90)
+        first, second = notifications.order_by('id')[:2]
+        Notification.objects.filter(pk=first.pk).update(created_at=old, is_read=True)
+        Notification.objects.filter(pk=second.pk).update(created_at=old)
+
+        call_command('prune_notifications', days=30, stdout=open('/dev/null', 'w'))
+
+        assert not Notification.objects.filter(pk=first.pk).exists()
+        assert Notification.objects.filter(pk=second.pk).exists()
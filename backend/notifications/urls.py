@@ -1,15 +1,12 @@
-from django.urls import path
-from django.http import JsonResponse
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import NotificationViewSet
 
 app_name = 'notifications'
 
-def notification_api_root(request):
-    """Placeholder for notifications API root"""
-    return JsonResponse({
-        "status": "success",
-        "message": "Notifications API endpoints coming soon",
-    })
+router = DefaultRouter()
+router.register(r'', NotificationViewSet, basename='notification')
 
 urlpatterns = [
-    path('', notification_api_root, name='notification-api-root'),
-] 
\ No newline at end of file
+    path('', include(router.urls)),
+]
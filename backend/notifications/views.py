@@ -1,3 +1,72 @@
-from django.shortcuts import render
+from rest_framework import mixins, viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
-# Create your views here.
+from core.pagination import KeysetPagination, decode_cursor
+from .models import Notification
+from .serializers import NotificationSerializer
+
+
+class NotificationPagination(KeysetPagination):
+    """Keyset pagination that also hands out a cursor for marking the page as read"""
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = super().paginate_queryset(queryset, request, view)
+        self.read_cursor = self.cursor_for(page[0]) if page else None
+        return page
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['read_cursor'] = self.read_cursor
+        return response
+
+
+class NotificationViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    ViewSet for reading notifications of the current user
+    """
+    serializer_class = NotificationSerializer
+    pagination_class = NotificationPagination
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Notification.objects.filter(
+            recipient=self.request.user
+        ).select_related('sender')
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        """Get the unread badge count without touching the notification table"""
+        return Response({'unread_count': Notification.unread_count(request.user.id)})
+
+    @action(detail=False, methods=['post'])
+    def mark_read(self, request):
+        """
+        Mark notifications as read.
+
+        Marks everything when no cursor is given, otherwise only notifications
+        at or before the cursor (e.g. the ``read_cursor`` of a listed page).
+        """
+        cursor = request.data.get('cursor')
+        position = None
+        if cursor:
+            try:
+                position = decode_cursor(cursor)
+            except ValueError:
+                return Response(
+                    {'error': 'Invalid cursor'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        updated = Notification.mark_all_as_read(request.user.id, position)
+        return Response({
+            'marked_read': updated,
+            'unread_count': Notification.unread_count(request.user.id),
+        })
+
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        """Mark a single notification as read"""
+        notification = self.get_object()
+        notification.mark_as_read()
+        return Response(self.get_serializer(notification).data)
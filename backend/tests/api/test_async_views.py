@@ -0,0 +1,121 @@
+import importlib
+
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.cache import cache
+from django.test import AsyncClient, Client
+from django.urls import clear_url_caches, resolve
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from tweets.models import Comment, Tweet
+from users.models import User
+
+READ_PATHS = [
+    '/api/v1/tweets/feed/',
+    '/api/v1/tweets/search/?q=hello',
+    '/api/v1/tweets/search/?q=%23topic',
+    '/api/v1/tweets/user_tweets/?username=alice',
+    '/api/v1/tweets/{tweet}/',
+    '/api/v1/tweets/{tweet}/comments/',
+]
+
+
+def reload_urls():
+    import core.urls
+    import tweets.urls
+    importlib.reload(tweets.urls)
+    importlib.reload(core.urls)
+    clear_url_caches()
+
+
+@pytest.fixture
+def async_views(settings):
+    settings.ASYNC_READ_VIEWS = True
+    reload_urls()
+    yield
+    settings.ASYNC_READ_VIEWS = False
+    reload_urls()
+
+
+@pytest.fixture
+def user():
+    cache.clear()
+    return User.objects.create_user(username='alice', email='alice@example.com', password='StrongPassword123!')
+
+
+@pytest.fixture
+def tweet(user):
+    bob = User.objects.create_user(username='bob', email='bob@example.com', password='StrongPassword123!')
+    Tweet.objects.create(content='Older #topic', author=bob)
+    tweet = Tweet.objects.create(content='Hello #topic', author=user)
+    for content in ('First', 'Second'):
+        Comment.objects.create(tweet=tweet, author=bob, content=content)
+    return tweet
+
+
+def headers(user):
+    return {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+
+def async_request(method, path, headers=None):
+    async def send():
+        return await getattr(AsyncClient(), method)(path, headers=headers)
+    return async_to_sync(send)()
+
+
+def async_get(path, headers=None):
+    return async_request('get', path, headers)
+
+
+@pytest.mark.django_db
+class TestAsyncReadViews:
+    """Test case for the async variants of the tweet read endpoints"""
+
+    def test_routes_reads_to_async_views(self, async_views):
+        assert iscoroutinefunction(resolve('/api/v1/tweets/feed/').func)
+        assert iscoroutinefunction(resolve('/api/v1/tweets/1/').func)
+        # Writes and other actions stay on the viewset
+        assert not iscoroutinefunction(resolve('/api/v1/tweets/1/like/').func)
+
+    def test_same_responses_as_the_viewset(self, user, tweet, settings):
+        paths = [path.format(tweet=tweet.pk) for path in READ_PATHS]
+        sync = {path: Client().get(path, headers=headers(user)) for path in paths}
+
+        settings.ASYNC_READ_VIEWS = True
+        reload_urls()
+        try:
+            for path in paths:
+                response = async_get(path, headers(user))
+                assert response.status_code == sync[path].status_code == 200, path
+                assert response.json() == sync[path].json(), path
+        finally:
+            settings.ASYNC_READ_VIEWS = False
+            reload_urls()
+
+    @pytest.mark.parametrize('path, status', [
+        ('/api/v1/tweets/999/', 404),
+        ('/api/v1/tweets/abc/comments/', 404),
+        ('/api/v1/tweets/user_tweets/?username=nobody', 404),
+        ('/api/v1/tweets/user_tweets/', 400),
+        ('/api/v1/tweets/search/', 400),
+    ])
+    def test_errors(self, async_views, user, path, status):
+        assert async_get(path, headers(user)).status_code == status
+
+    def test_requires_authentication(self, async_views):
+        response = async_get('/api/v1/tweets/feed/')
+        assert response.status_code == 401
+        assert response.json() == {'detail': 'Authentication credentials were not provided.'}
+        assert response['WWW-Authenticate'].startswith('Bearer')
+
+    def test_other_methods_go_to_the_viewset(self, async_views, user, tweet):
+        response = async_request('delete', f'/api/v1/tweets/{tweet.pk}/', headers(user))
+        assert response.status_code == 204
+        tweet.refresh_from_db()
+        assert tweet.is_deleted
+
+    def test_queries_are_recorded(self, async_views, user, tweet, settings):
+        settings.SERVER_TIMING_TOKEN = 'secret'
+        response = async_get('/api/v1/tweets/feed/', {**headers(user), 'X-Server-Timing-Token': 'secret'})
+        assert response.status_code == 200
+        assert '"0 queries"' not in response['Server-Timing']
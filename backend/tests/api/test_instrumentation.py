@@ -0,0 +1,71 @@
+import json
+import logging
+
+import pytest
+from django.core.cache import cache
+from django.test import Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.instrumentation import RequestMetrics
+from tweets.models import Tweet
+from users.models import User
+
+
+@pytest.fixture
+def user():
+    cache.clear()
+    return User.objects.create_user(username='alice', email='alice@example.com', password='StrongPassword123!')
+
+
+def get_feed(user, **headers):
+    token = RefreshToken.for_user(user).access_token
+    return Client().get('/api/v1/tweets/', HTTP_AUTHORIZATION=f'Bearer {token}', **headers)
+
+
+@pytest.mark.django_db
+class TestPerformanceMiddleware:
+    """Test case for per-request performance metrics"""
+
+    def test_logs_one_json_line_per_request(self, user, caplog, monkeypatch):
+        Tweet.objects.create(content='Hello', author=user)
+        # The logger only writes to the console handler by default
+        monkeypatch.setattr(logging.getLogger('core.middleware'), 'propagate', True)
+
+        with caplog.at_level(logging.INFO, logger='core.middleware'):
+            response = get_feed(user)
+
+        record = json.loads(caplog.records[-1].getMessage())
+        assert record['endpoint'] == 'tweets:tweet-list'
+        assert record['status'] == response.status_code == 200
+        assert record['queries'] >= 1
+        assert record['serializer_ms'] > 0
+        assert 'Server-Timing' not in response
+
+    def test_server_timing_for_benchmark_clients(self, user, settings):
+        settings.SERVER_TIMING_TOKEN = 'secret'
+
+        response = get_feed(user, HTTP_X_SERVER_TIMING_TOKEN='secret')
+
+        assert response['Server-Timing'].startswith('db;dur=')
+        assert 'total;dur=' in response['Server-Timing']
+        assert 'Server-Timing' not in get_feed(user, HTTP_X_SERVER_TIMING_TOKEN='wrong')
+
+    def test_server_timing_for_staff(self, user):
+        User.objects.filter(pk=user.pk).update(is_staff=True)
+        user.refresh_from_db()
+
+        assert 'Server-Timing' in get_feed(user)
+
+
+def test_cache_hits_and_misses_are_counted():
+    cache.set('present', 1)
+    metrics = RequestMetrics()
+    token = metrics.activate()
+    try:
+        cache.get('present')
+        cache.get('absent')
+        cache.get_many(['present', 'absent'])
+    finally:
+        metrics.deactivate(token)
+
+    assert (metrics.cache_hits, metrics.cache_misses) == (2, 2)
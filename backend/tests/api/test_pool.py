@@ -0,0 +1,182 @@
+import gc
+import threading
+import time
+import weakref
+
+import pytest
+from django.core.cache import cache
+from django.db import OperationalError
+from django.db.backends.sqlite3 import base as sqlite3
+from django.test import Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core import pool as pooling
+from core.pool import ConnectionPool, PoolTimeout, PooledDatabaseWrapperMixin
+from users.models import User
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def check(connection):
+    if not connection.healthy:
+        raise OperationalError('gone away')
+
+
+def make_pool(clock=None, **kwargs):
+    options = {'min_size': 0, 'max_size': 2, 'timeout': 0.05, 'max_lifetime': 100, 'health_check_interval': 10}
+    return ConnectionPool(FakeConnection, check, clock=clock or Clock(), **{**options, **kwargs})
+
+
+class TestConnectionPool:
+    """Test case for the process-wide connection pool"""
+
+    def test_reuses_released_connections(self):
+        pool = make_pool()
+
+        first = pool.acquire()
+        pool.release(first)
+
+        assert pool.acquire() is first
+        assert pool.snapshot()['opened'] == 1
+
+    def test_waits_then_times_out_when_exhausted(self):
+        pool = make_pool(clock=time.monotonic)
+        held = [pool.acquire(), pool.acquire()]
+
+        with pytest.raises(PoolTimeout):
+            pool.acquire()
+
+        # A connection released while waiting is handed to the waiter
+        pool.timeout = 5
+        threading.Timer(0.01, pool.release, [held[0]]).start()
+        assert pool.acquire() is held[0]
+        stats = pool.snapshot()
+        assert (stats['timeouts'], stats['in_use'], stats['size']) == (1, 2, 2)
+
+    def test_checks_idle_connections_before_reuse(self):
+        clock = Clock()
+        pool = make_pool(clock)
+        connection = pool.acquire()
+        pool.release(connection)
+
+        connection.healthy = False
+        clock.now += 11
+        replacement = pool.acquire()
+
+        assert replacement is not connection and connection.closed
+        assert pool.snapshot()['failed_checks'] == 1
+
+    def test_retires_old_connections(self):
+        clock = Clock()
+        pool = make_pool(clock)
+        connection = pool.acquire()
+
+        clock.now += 100
+        pool.release(connection)
+
+        assert connection.closed
+        assert pool.snapshot()['size'] == 0
+
+    def test_unusable_connections_are_closed(self):
+        pool = make_pool()
+        connection = pool.acquire()
+
+        pool.release(connection, reusable=False)
+
+        assert connection.closed and pool.acquire() is not connection
+
+    def test_fills_to_the_minimum_in_the_background(self):
+        pool = make_pool(min_size=2)
+
+        pool.fill()
+        for thread in threading.enumerate():
+            if thread.name == 'db-pool-fill':
+                thread.join()
+
+        assert pool.snapshot()['idle'] == 2
+
+
+class PooledSQLiteWrapper(PooledDatabaseWrapperMixin, sqlite3.DatabaseWrapper):
+    @staticmethod
+    def open_connection(conn_params, options):
+        return sqlite3.Database.connect(**conn_params)
+
+    @staticmethod
+    def check_connection(connection):
+        connection.execute('SELECT 1')
+
+
+def pooled_settings(tmp_path):
+    return {
+        'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(tmp_path / 'pooled.sqlite3'),
+        'ATOMIC_REQUESTS': False, 'AUTOCOMMIT': True, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False,
+        'OPTIONS': {}, 'TIME_ZONE': None, 'USER': '', 'PASSWORD': '', 'HOST': '', 'PORT': '', 'TEST': {},
+        'POOL': {'MIN_SIZE': 0, 'MAX_SIZE': 1},
+    }
+
+
+def test_wrapper_hands_connections_back_on_close(tmp_path, monkeypatch, django_db_blocker):
+    monkeypatch.setattr(pooling, '_pools', {})
+    wrapper = PooledSQLiteWrapper(pooled_settings(tmp_path), alias='pooled')
+
+    with django_db_blocker.unblock():
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        raw = wrapper.connection
+        wrapper.close()
+        with wrapper.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+        assert wrapper.connection is raw
+        stats = pooling.pool_stats()['pooled']
+        assert (stats['opened'], stats['checkouts'], stats['in_use']) == (1, 2, 1)
+        wrapper.close()
+    assert pooling.pool_stats()['pooled']['idle'] == 1
+
+
+def test_pool_does_not_hold_the_wrapper_that_created_it(tmp_path, monkeypatch):
+    monkeypatch.setattr(pooling, '_pools', {})
+    wrapper = PooledSQLiteWrapper(pooled_settings(tmp_path), alias='pooled')
+    created_by = weakref.ref(wrapper)
+    pool = wrapper.pool
+
+    del wrapper
+    gc.collect()
+
+    assert created_by() is None
+    connection = pool.acquire()
+    pool.check(connection)
+    pool.release(connection)
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_is_staff_only():
+    cache.clear()
+    user = User.objects.create_user(username='alice', email='alice@example.com', password='StrongPassword123!')
+    staff = User.objects.create_user(
+        username='admin', email='admin@example.com', password='StrongPassword123!', is_staff=True
+    )
+
+    def get(user):
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return client.get('/api/v1/metrics/db-pools/')
+
+    assert get(user).status_code == 403
+    response = get(staff)
+    assert response.status_code == 200
+    assert 'pools' in response.json()
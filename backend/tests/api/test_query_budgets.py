@@ -0,0 +1,100 @@
+import pytest
+from rest_framework.test import APIClient
+
+from tweets.models import Comment, CommentMediaAttachment, Like, MediaAttachment, Tweet
+from users.models import User
+
+
+class Dataset:
+    """Tweets by several authors, each with media and commented comments"""
+
+    def __init__(self, viewer):
+        self.viewer = viewer
+        self.authors = [
+            User.objects.create_user(username=f'author{i}', email=f'author{i}@example.com', password='x')
+            for i in range(3)
+        ]
+        self.tweets = []
+
+    def grow(self, size):
+        for i in range(len(self.tweets), size):
+            author = self.authors[i % len(self.authors)]
+            tweet = Tweet.objects.create(content=f'Tweet {i} #budget mentioning @{self.viewer.username}', author=author)
+            MediaAttachment.objects.create(tweet=tweet, file=f'tweet_media/{i}.jpg')
+            for j, commenter in enumerate(self.authors[:2]):
+                comment = Comment.objects.create(tweet=tweet, author=commenter, content=f'Comment {j}')
+                CommentMediaAttachment.objects.create(comment=comment, file=f'comment_media/{i}-{j}.jpg')
+            Tweet.objects.filter(pk=tweet.pk).update(comments_count=2)
+            Like.objects.create(tweet=tweet, user=self.authors[-1])
+            self.tweets.append(tweet)
+
+
+@pytest.fixture
+def viewer():
+    return User.objects.create_user(username='viewer', email='viewer@example.com', password='StrongPassword123!')
+
+
+@pytest.fixture
+def client(viewer):
+    client = APIClient()
+    client.force_authenticate(viewer)
+    return client
+
+
+@pytest.fixture
+def dataset(viewer):
+    return Dataset(viewer)
+
+
+@pytest.mark.django_db
+class TestQueryBudgets:
+    """Query budgets of the tweet endpoints, checked at several dataset sizes"""
+
+    @pytest.mark.query_budget(4)
+    def test_feed(self, assert_query_budget, client, dataset):
+        response = assert_query_budget(dataset.grow, lambda: client.get('/api/v1/tweets/feed/'))
+        assert len(response.data) == 50
+
+    @pytest.mark.query_budget(4)
+    def test_list(self, assert_query_budget, client, dataset):
+        assert_query_budget(dataset.grow, lambda: client.get('/api/v1/tweets/'))
+
+    @pytest.mark.query_budget(4)
+    def test_search(self, assert_query_budget, client, dataset):
+        response = assert_query_budget(dataset.grow, lambda: client.get('/api/v1/tweets/search/?q=%23budget'))
+        assert len(response.data) == 50
+
+    @pytest.mark.query_budget(5)
+    def test_user_tweets(self, assert_query_budget, client, dataset):
+        assert_query_budget(dataset.grow, lambda: client.get('/api/v1/tweets/user_tweets/?username=author0'))
+
+    @pytest.mark.query_budget(4)
+    def test_retrieve(self, assert_query_budget, client, dataset):
+        assert_query_budget(dataset.grow, lambda: client.get(f'/api/v1/tweets/{dataset.tweets[-1].pk}/'))
+
+    @pytest.mark.query_budget(3)
+    def test_comments(self, assert_query_budget, client, dataset):
+        def grow(size):
+            # Pile the comments onto one tweet
+            dataset.grow(1)
+            tweet = dataset.tweets[0]
+            for i in range(tweet.comments.count(), size):
+                comment = Comment.objects.create(tweet=tweet, author=dataset.authors[i % 3], content=f'More {i}')
+                CommentMediaAttachment.objects.create(comment=comment, file=f'comment_media/more-{i}.jpg')
+
+        response = assert_query_budget(grow, lambda: client.get(f'/api/v1/tweets/{dataset.tweets[0].pk}/comments/'))
+        assert len(response.data) == 50
+
+    @pytest.mark.query_budget(9)
+    def test_like(self, assert_query_budget, client, dataset):
+        def like():
+            return client.post(f'/api/v1/tweets/{dataset.tweets[-1].pk}/like/')
+
+        assert_query_budget(dataset.grow, like)
+
+    @pytest.mark.query_budget(4)
+    def test_login(self, assert_query_budget, dataset, viewer):
+        client = APIClient()
+        assert_query_budget(dataset.grow, lambda: client.post('/api/v1/auth/login/', {
+            'email': viewer.email, 'password': 'StrongPassword123!'
+        }, format='json'))
@@ -0,0 +1,107 @@
+import pytest
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core import replicas
+from tweets.models import Tweet
+from users.models import User
+
+
+@pytest.fixture
+def replica(settings, monkeypatch):
+    """
+    Route replica reads to ``default`` under the name of a replica, recording
+    the replica each query was routed to.
+    """
+    settings.DATABASE_REPLICAS = ['default']
+    monkeypatch.setattr(replicas, '_down_until', {})
+    routed = []
+    monkeypatch.setattr(
+        replicas.PrimaryReplicaRouter, 'db_for_read',
+        lambda self, model, **hints: routed.append(replicas.current_replica()) or 'default'
+    )
+    cache.clear()
+    yield routed
+    cache.clear()
+
+
+@pytest.fixture
+def client():
+    user = User.objects.create_user(username='alice', email='alice@example.com', password='StrongPassword123!')
+    Tweet.objects.create(content='Hello', author=user)
+    client = Client()
+    client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(user).access_token}'
+    return client
+
+
+@pytest.mark.django_db
+class TestReplicaRouting:
+    """Test case for read replica routing and read-your-writes pinning"""
+
+    def test_safe_replica_actions_read_from_the_replica(self, replica, client):
+        assert client.get('/api/v1/tweets/feed/').status_code == 200
+        assert replica and set(replica) == {'default'}
+
+    def test_other_views_read_from_the_primary(self, replica, client):
+        assert client.get('/api/v1/notifications/').status_code == 200
+        assert set(replica) == {None}
+
+    def test_writes_pin_the_client_to_the_primary(self, replica, client):
+        response = client.post('/api/v1/tweets/', {'content': 'New'}, content_type='application/json')
+        assert response.status_code == 201
+        assert response.cookies['db_pin']['max-age'] == 5
+
+        replica.clear()
+        client.get('/api/v1/tweets/feed/')
+        assert set(replica) == {None}
+
+    def test_token_pins_clients_without_cookies(self, replica, client):
+        client.post('/api/v1/tweets/', {'content': 'New'}, content_type='application/json')
+        client.cookies.clear()
+
+        replica.clear()
+        client.get('/api/v1/tweets/feed/')
+        assert set(replica) == {None}
+
+    def test_replica_errors_fail_over_to_the_primary(self, replica, client):
+        def fail_on_replica(execute, sql, params, many, context):
+            if replicas.current_replica():
+                raise OperationalError('replica went away')
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(fail_on_replica):
+            response = client.get('/api/v1/tweets/feed/')
+
+        assert response.status_code == 200
+        assert 'default' in replicas._down_until
+        # Skipped until the retry interval has passed
+        replica.clear()
+        client.get('/api/v1/tweets/feed/')
+        assert set(replica) == {None}
+
+    def test_unreachable_replicas_are_skipped(self, replica, monkeypatch):
+        def refuse():
+            raise OperationalError('connection refused')
+        monkeypatch.setattr(connection, 'ensure_connection', refuse)
+
+        assert replicas.pick_replica() is None
+        assert 'default' in replicas._down_until
+
+
+def test_router_sends_writes_and_migrations_to_the_primary(settings):
+    settings.DATABASE_REPLICAS = ['replica_0']
+    router = replicas.PrimaryReplicaRouter()
+    reads = replicas.ReplicaReads()
+    token = reads.activate()
+    try:
+        reads.alias = 'replica_0'
+        assert router.db_for_read(Tweet) == 'replica_0'
+        assert router.db_for_write(Tweet) == 'default'
+        # Reads after a write see it
+        assert router.db_for_read(Tweet) == 'default'
+    finally:
+        replicas.ReplicaReads.deactivate(token)
+    assert not router.allow_migrate('replica_0', 'tweets')
+    assert router.allow_migrate('default', 'tweets')
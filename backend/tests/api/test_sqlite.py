@@ -0,0 +1,109 @@
+import threading
+
+import pytest
+from django.db import OperationalError, connection, transaction
+from django.test import Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core import writes
+from core.backends.sqlite3.base import DatabaseWrapper
+from tweets.models import Like, Tweet
+from users.models import User
+
+
+def sqlite_wrapper(path, **pragmas):
+    settings_dict = {
+        'ENGINE': 'core.backends.sqlite3', 'NAME': str(path),
+        'ATOMIC_REQUESTS': False, 'AUTOCOMMIT': True, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False,
+        'OPTIONS': {}, 'TIME_ZONE': None, 'USER': '', 'PASSWORD': '', 'HOST': '', 'PORT': '', 'TEST': {},
+        'PRAGMAS': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 0, **pragmas},
+    }
+    return DatabaseWrapper(settings_dict, alias='sqlite')
+
+
+def pragma(wrapper, name):
+    with wrapper.cursor() as cursor:
+        cursor.execute(f'PRAGMA {name}')
+        return cursor.fetchone()[0]
+
+
+class TestSQLiteBackend:
+    """Test case for the SQLite backend tuned for concurrent workers"""
+
+    def test_applies_pragmas_on_connect(self, tmp_path, django_db_blocker):
+        wrapper = sqlite_wrapper(tmp_path / 'db.sqlite3', cache_size=-2000)
+        with django_db_blocker.unblock():
+            assert pragma(wrapper, 'journal_mode') == 'wal'
+            assert pragma(wrapper, 'synchronous') == 1
+            assert pragma(wrapper, 'cache_size') == -2000
+            wrapper.close()
+
+    def test_transactions_take_the_write_lock_up_front(self, tmp_path, django_db_blocker):
+        first, second = sqlite_wrapper(tmp_path / 'db.sqlite3'), sqlite_wrapper(tmp_path / 'db.sqlite3')
+        with django_db_blocker.unblock():
+            first.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+            try:
+                # Before the first transaction wrote anything
+                with pytest.raises(OperationalError, match='locked'):
+                    second.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+            finally:
+                first.rollback()
+                first.close()
+                second.close()
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(username='alice', email='alice@example.com', password='StrongPassword123!')
+
+
+@pytest.mark.django_db(transaction=True)
+class TestWriteQueue:
+    """Test case for serialized SQLite writes"""
+
+    def test_concurrent_writes_are_batched(self, user):
+        queue = writes.WriteQueue(batch_wait=0.1)
+        results = {}
+
+        def create(content):
+            if content == 'bad':
+                raise ValueError(content)
+            # Queued writes run inside the batch's transaction
+            assert connection.in_atomic_block
+            return Tweet.objects.create(content=content, author=user).content
+
+        def submit(content):
+            try:
+                results[content] = queue.submit(create, content)
+            except ValueError as e:
+                results[content] = e
+
+        threads = [threading.Thread(target=submit, args=[content]) for content in ('one', 'bad', 'two')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results['one'] == 'one' and results['two'] == 'two'
+        assert isinstance(results['bad'], ValueError)
+        # A failing write doesn't roll back the rest of its batch
+        assert set(Tweet.objects.values_list('content', flat=True)) == {'one', 'two'}
+
+    def test_writes_run_inline_inside_transactions(self, user, settings):
+        settings.SQLITE_WRITE_QUEUE = True
+        assert writes.queued(connection)
+        with transaction.atomic():
+            assert not writes.queued(connection)
+
+    def test_likes_go_through_the_queue(self, user, settings):
+        settings.SQLITE_WRITE_QUEUE = True
+        tweet = Tweet.objects.create(content='Hello', author=user)
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+        assert client.post(f'/api/v1/tweets/{tweet.pk}/like/').status_code == 200
+        assert client.post(f'/api/v1/tweets/{tweet.pk}/like/').status_code == 400
+
+        assert writes.get_writer().thread.is_alive()
+        assert Like.objects.filter(tweet=tweet).count() == 1
+        tweet.refresh_from_db()
+        assert tweet.likes_count == 1
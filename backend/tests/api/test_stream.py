@@ -0,0 +1,125 @@
+import asyncio
+import threading
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.events import EventHub, FEED_TOPIC, hub, user_topic
+from users.models import User
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestEventHub:
+    """Test case for the in-process pub/sub hub"""
+
+    def test_publish_from_another_thread(self):
+        async def scenario():
+            events = EventHub()
+            subscription = events.subscribe([FEED_TOPIC])
+            worker = threading.Thread(target=events.publish, args=(FEED_TOPIC, 'tweet_created', {'id': 1}))
+            worker.start()
+            worker.join()
+            return await subscription.next_message(timeout=1)
+
+        assert run(scenario()) == {'event': 'tweet_created', 'data': {'id': 1}}
+
+    def test_slow_subscriber_drops_oldest_events(self):
+        async def scenario():
+            events = EventHub(queue_size=2)
+            subscription = events.subscribe([FEED_TOPIC])
+            for i in range(5):
+                events.publish(FEED_TOPIC, 'engagement', {'value': i})
+            await asyncio.sleep(0)
+            messages = [await subscription.next_message(timeout=1) for _ in range(2)]
+            return subscription.dropped, [message['data']['value'] for message in messages]
+
+        assert run(scenario()) == (3, [3, 4])
+
+    def test_unsubscribe_removes_topic(self):
+        async def scenario():
+            events = EventHub()
+            subscription = events.subscribe([FEED_TOPIC, user_topic(1)])
+            events.unsubscribe(subscription)
+            return events.publish(FEED_TOPIC, 'tweet_created', {})
+
+        assert run(scenario()) == 0
+
+
+@pytest.mark.django_db
+class TestEventStream:
+    """Test case for the server-sent events endpoint"""
+
+    @pytest.fixture
+    def user(self):
+        return User.objects.create_user(username='stream', email='stream@example.com', password='StrongPassword123!')
+
+    def open_stream(self, path, user_id=None, headers=None):
+        """Open a stream and read its first chunk, plus a notification published to ``user_id``"""
+        async def scenario():
+            response = await AsyncClient().get(path, headers=headers)
+            if response.status_code != 200:
+                return response, []
+            chunks = response.streaming_content.__aiter__()
+            first = await chunks.__anext__()
+            hub.publish(user_topic(user_id), 'notification', {'id': 7})
+            second = await chunks.__anext__()
+            await chunks.aclose()
+            return response, [first, second]
+
+        # On this thread, so the ORM sees the test transaction
+        return async_to_sync(scenario)()
+
+    def get_ticket(self, user):
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        response = client.post('/api/v1/stream/ticket/')
+        assert response.status_code == 200
+        return response.json()['ticket']
+
+    def test_not_served_under_wsgi(self, user):
+        # A sync worker would be held for the whole stream
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        response = client.get('/api/v1/stream/')
+
+        assert response.status_code == 501
+        assert hub.subscriber_count() == 0
+
+    def test_requires_credentials(self):
+        response, _ = self.open_stream('/api/v1/stream/')
+        assert response.status_code == 401
+
+    def test_streams_user_events_with_a_ticket(self, user):
+        response, (first, second) = self.open_stream(f'/api/v1/stream/?ticket={self.get_ticket(user)}', user.id)
+
+        assert response['Content-Type'] == 'text/event-stream'
+        assert first.startswith(b'retry:')
+        assert second == b'event: notification\ndata: {"id": 7}\n\n'
+        assert hub.subscriber_count() == 0
+
+    def test_tickets_are_single_use(self, user):
+        ticket = self.get_ticket(user)
+
+        assert self.open_stream(f'/api/v1/stream/?ticket={ticket}', user.id)[0].status_code == 200
+        assert self.open_stream(f'/api/v1/stream/?ticket={ticket}')[0].status_code == 401
+        assert self.open_stream('/api/v1/stream/?ticket=forged')[0].status_code == 401
+
+    def test_access_tokens_are_not_accepted_in_the_url(self, user):
+        token = RefreshToken.for_user(user).access_token
+
+        response, _ = self.open_stream(f'/api/v1/stream/?token={token}')
+
+        assert response.status_code == 401
+
+    def test_header_authentication_refuses_revoked_tokens(self, user, django_capture_on_commit_callbacks):
+        headers = {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'}
+        assert self.open_stream('/api/v1/stream/', user.id, headers)[0].status_code == 200
+
+        with django_capture_on_commit_callbacks(execute=True):
+            user.revoke_tokens()
+            user.save()
+
+        assert self.open_stream('/api/v1/stream/', user.id, headers)[0].status_code == 401
@@ -0,0 +1,69 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from core.middleware import RateLimitHeadersMiddleware
+from core.throttling import AnonGCRAThrottle
+
+
+class BurstThrottle(AnonGCRAThrottle):
+    rate = '3/min'
+    scope = 'burst'
+
+
+class ThrottledView(APIView):
+    authentication_classes = []
+    permission_classes = []
+    throttle_classes = [BurstThrottle]
+
+    def get(self, request):
+        return Response({})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(BurstThrottle, 'timer', staticmethod(lambda: now[0]))
+    cache.clear()
+    yield now
+    cache.clear()
+
+
+def call():
+    return RateLimitHeadersMiddleware(ThrottledView.as_view())(APIRequestFactory().get('/'))
+
+
+class TestGCRAThrottle:
+    """Test case for the constant-state rate throttles"""
+
+    def test_burst_then_refused_with_headers(self, clock):
+        responses = [call() for _ in range(4)]
+
+        assert [response.status_code for response in responses] == [200, 200, 200, 429]
+        assert [response['RateLimit-Remaining'] for response in responses[:3]] == ['2', '1', '0']
+        assert responses[0]['RateLimit-Limit'] == '3'
+        assert responses[2]['RateLimit-Reset'] == '60'
+        assert responses[3]['Retry-After'] == '20'
+
+    def test_capacity_returns_at_the_emission_interval(self, clock):
+        for _ in range(3):
+            call()
+
+        clock[0] += 20
+        assert call().status_code == 200
+        assert call().status_code == 429
+
+    def test_refused_requests_do_not_use_capacity(self, clock):
+        for _ in range(10):
+            call()
+
+        clock[0] += 20
+        assert call().status_code == 200
+
+    def test_state_is_a_single_number(self, clock):
+        for _ in range(3):
+            call()
+
+        assert cache.get('throttle_burst_127.0.0.1') == int(clock[0] * 1000) + 60_000
@@ -1,11 +1,59 @@
 import os
 import sys
 import django
+import pytest
 from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 # Add the project root directory to Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Setup Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
-django.setup() 
\ No newline at end of file
+django.setup() 
+
+# Dataset sizes every query budget is checked at
+DATASET_SIZES = (1, 50)
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers',
+        'query_budget(max_queries, sizes=DATASET_SIZES): database round trips allowed per request, '
+        'checked by the assert_query_budget fixture',
+    )
+
+
+@pytest.fixture
+def assert_query_budget(request):
+    """
+    Check that a request stays within its query budget at every dataset size.
+
+    Tests are marked with ``@pytest.mark.query_budget(n)`` and call the fixture
+    with a function that grows the dataset to a given size and a function that
+    makes the request. Every statement sent to the database counts, savepoints
+    included. The request must issue the same number of queries at each size,
+    so any per-row (N+1) query fails even while under budget.
+    """
+    marker = request.node.get_closest_marker('query_budget')
+    assert marker is not None, 'Mark the test with @pytest.mark.query_budget(max_queries)'
+    max_queries = marker.args[0]
+    sizes = marker.kwargs.get('sizes', DATASET_SIZES)
+
+    def check(grow, make_request):
+        counts = {}
+        for size in sizes:
+            grow(size)
+            with CaptureQueriesContext(connection) as queries:
+                response = make_request()
+            assert response.status_code < 400, response.content
+            counts[size] = len(queries)
+            assert counts[size] <= max_queries, (
+                f'{counts[size]} queries at {size} rows, budget is {max_queries}:\n'
+                + '\n'.join(query['sql'] for query in queries.captured_queries)
+            )
+        assert len(set(counts.values())) == 1, f'Query count grows with the dataset: {counts}'
+        return response
+
+    return check
@@ -0,0 +1,33 @@
+from benchmarks.runner import Sample, compare, parse_queries, percentile, summarize
+
+
+class TestBenchmarkReport:
+    """Test case for the benchmark statistics and baseline comparison"""
+
+    def test_summarize(self):
+        samples = [Sample(latency=i / 1000, status=200, queries=4) for i in range(1, 101)]
+        samples.append(Sample(latency=0.5, status=500, queries=9))
+
+        summary = summarize(samples, wall_time=2.0)
+
+        assert (summary['p50_ms'], summary['p95_ms'], summary['p99_ms']) == (51.0, 96.0, 100.0)
+        assert summary['errors'] == 1
+        assert summary['throughput_rps'] == 50.5
+        assert summary['queries_per_request'] == 4
+
+    def test_percentile_of_one_value(self):
+        assert percentile([7.0], 99) == 7.0
+
+    def test_parse_server_timing(self):
+        assert parse_queries('db;dur=1.2;desc="5 queries", total;dur=3') == 5
+        assert parse_queries('') is None
+
+    def test_compare_flags_regressions_beyond_tolerance(self):
+        baseline = {'scenarios': {'feed': {'p50_ms': 10.0, 'p95_ms': 20.0, 'throughput_rps': 100.0,
+                                           'queries_per_request': 4}}}
+        current = {'feed': {'p50_ms': 10.5, 'p95_ms': 30.0, 'throughput_rps': 95.0, 'queries_per_request': 5}}
+
+        comparison, regressions = compare(current, baseline, tolerance=0.1)
+
+        assert comparison['feed']['p95_ms']['change'] == 0.5
+        assert regressions == ['feed p95_ms 20.0 -> 30.0 (+50%)', 'feed queries_per_request 4 -> 5']
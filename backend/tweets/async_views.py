@@ -0,0 +1,173 @@
+"""
+Async variants of the read-heavy tweet endpoints, served instead of the
+``TweetViewSet`` actions when ``ASYNC_READ_VIEWS`` is on (under ASGI, e.g.
+``uvicorn core.asgi:application``).
+
+They return the same responses as the actions they stand in for, but wait on
+the cache and the database as coroutines, so a worker process spends a
+coroutine rather than a thread on each request in flight and slow clients
+don't hold up the others. Lookups that don't depend on each other are awaited
+together with ``asyncio.gather``. Django 4.2 still runs the queries of one
+request on that request's thread, one after another, so they overlap with
+each other once the ORM is natively async, not before.
+
+Other methods on the same paths (e.g. ``PUT /tweets/<pk>/``) are handed to the
+viewset.
+"""
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.urls import re_path
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated, NotFound, Throttled
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from authentication.jwt import CachedJWTAuthentication
+from users.models import User
+
+from .models import Comment, Tweet
+from .serializers import CommentSerializer, TweetSerializer
+from .views import TweetSearchRateThrottle, TweetViewSet
+
+renderer = JSONRenderer()
+authentication = CachedJWTAuthentication()
+
+
+def json_response(data, status=200):
+    # Rendered like DRF renders the viewset's responses
+    return HttpResponse(renderer.render(data), status=status, content_type=renderer.media_type)
+
+
+def error_response(request, exc):
+    """The response DRF's exception handling gives an API exception"""
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = json_response(data, exc.status_code)
+    if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+        response['WWW-Authenticate'] = authentication.authenticate_header(request)
+    if isinstance(exc, Throttled) and exc.wait is not None:
+        response['Retry-After'] = '%d' % exc.wait
+    return response
+
+
+async def authenticate(request):
+    """The user of an authenticated request; raises like ``IsAuthenticated`` otherwise"""
+    result = await authentication.aauthenticate(request)
+    if result is None:
+        raise NotAuthenticated()
+    return result[0]
+
+
+async def throttle(request, throttle):
+    drf_request = Request(request)
+    drf_request.user = request.user
+    if not await sync_to_async(throttle.allow_request)(drf_request, None):
+        raise Throttled(throttle.wait())
+
+
+async def evaluate(queryset):
+    """Run a queryset, prefetches included, in one trip to the request's thread"""
+    return [obj async for obj in queryset]
+
+
+def lookup_pk(pk):
+    # Unparseable ids are 404s, as in DRF's get_object()
+    try:
+        return int(pk)
+    except ValueError:
+        raise NotFound()
+
+
+def read_action(actions):
+    """
+    Serve ``TweetViewSet``'s GET action of ``actions`` with an async view,
+    authenticated like the viewset, and the other methods with the viewset.
+    """
+    viewset_view = TweetViewSet.as_view(actions)
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return await sync_to_async(viewset_view)(request, *args, **kwargs)
+            try:
+                request.user = await authenticate(request)
+                return await view(request, *args, **kwargs)
+            except APIException as exc:
+                return error_response(request, exc)
+
+        # Described like the viewset's view, for ReplicaMiddleware
+        wrapper.cls = TweetViewSet
+        wrapper.actions = actions
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+def tweets_response(request, tweets, many=True):
+    return json_response(TweetSerializer(tweets, many=many, context={'request': request}).data)
+
+
+@read_action({'get': 'feed'})
+async def feed(request):
+    return tweets_response(request, await evaluate(TweetViewSet.with_related(TweetViewSet.feed_tweets())))
+
+
+@read_action({'get': 'search'})
+async def search(request):
+    await throttle(request, TweetSearchRateThrottle())
+    query = request.GET.get('q', '')
+    if not query:
+        return json_response({'error': 'Search query parameter is required'}, status=400)
+    return tweets_response(request, await evaluate(TweetViewSet.with_related(TweetViewSet.search_tweets(query))))
+
+
+@read_action({'get': 'user_tweets'})
+async def user_tweets(request):
+    username = request.GET.get('username')
+    if not username:
+        return json_response({'error': 'Username parameter is required'}, status=400)
+
+    # The page doesn't need the user loaded first
+    exists, tweets = await asyncio.gather(
+        User.objects.filter(username=username, is_deleted=False).aexists(),
+        evaluate(TweetViewSet.with_related(Tweet.objects.filter(
+            author__username=username, author__is_deleted=False, is_deleted=False
+        ).order_by('-created_at'))),
+    )
+    if not exists:
+        raise NotFound()
+    return tweets_response(request, tweets)
+
+
+@read_action({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'})
+async def retrieve(request, pk):
+    tweets = await evaluate(TweetViewSet.with_related(Tweet.objects.filter(pk=lookup_pk(pk), is_deleted=False)))
+    if not tweets:
+        raise NotFound()
+    return tweets_response(request, tweets[0], many=False)
+
+
+@read_action({'get': 'comments'})
+async def comments(request, pk):
+    pk = lookup_pk(pk)
+    exists, comments = await asyncio.gather(
+        Tweet.objects.filter(pk=pk, is_deleted=False).aexists(),
+        evaluate(Comment.objects.filter(
+            tweet_id=pk, is_deleted=False
+        ).select_related('author').prefetch_related('media').order_by('-created_at')),
+    )
+    if not exists:
+        raise NotFound()
+    return json_response(CommentSerializer(comments, many=True).data)
+
+
+# Same paths and names as the router's routes, which they go in front of
+urlpatterns = [
+    re_path(r'^feed/$', feed, name='tweet-feed'),
+    re_path(r'^search/$', search, name='tweet-search'),
+    re_path(r'^user_tweets/$', user_tweets, name='tweet-user-tweets'),
+    re_path(r'^(?P<pk>[^/.]+)/$', retrieve, name='tweet-detail'),
+    re_path(r'^(?P<pk>[^/.]+)/comments/$', comments, name='tweet-comments'),
+]
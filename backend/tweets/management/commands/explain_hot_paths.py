@@ -0,0 +1,126 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router
+from django.utils import timezone
+
+from authentication.models import FailedLoginAttempt
+from follows.models import Follow
+from notifications.models import Notification
+from tweets.models import Comment, Tweet, TweetMention
+from users.models import User
+
+PAGE = 21
+
+# Plan lines reading a whole table, per database vendor
+SEQ_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)\b(?! USING)'),
+    'mysql': re.compile(r'^\d+ \w+ (\w+) \S+ ALL\b', re.MULTILINE),
+}
+
+
+def hot_paths(user, tweet):
+    """(name, queryset) of the queries behind the busiest endpoints, as the views build them"""
+    now = timezone.now()
+    return [
+        ('tweets.feed', Tweet.objects.filter(is_deleted=False).order_by('-created_at').select_related('author')),
+        ('tweets.user_tweets', Tweet.objects.filter(author=user, is_deleted=False).order_by('-created_at')),
+        ('tweets.search_hashtag', Tweet.objects.filter(
+            content__iregex=r'#\btopic1\b', is_deleted=False
+        ).order_by('-created_at')),
+        ('tweets.comments', Comment.objects.filter(tweet=tweet, is_deleted=False).order_by('-created_at')),
+        ('tweets.mentions', TweetMention.objects.filter(
+            user=user, tweet__is_deleted=False
+        ).order_by('-created_at', '-id')[:PAGE]),
+        ('follows.followers', Follow.objects.filter(following=user).order_by('-created_at', '-id')[:PAGE]),
+        ('follows.following', Follow.objects.filter(follower=user).order_by('-created_at', '-id')[:PAGE]),
+        ('notifications.list', Notification.objects.filter(recipient=user).order_by('-created_at', '-id')[:PAGE]),
+        ('notifications.unread', Notification.objects.filter(recipient=user, is_read=False).order_by(
+            '-created_at', '-id'
+        )[:PAGE]),
+        ('notifications.prune', Notification.objects.filter(
+            is_read=True, created_at__lt=now - timedelta(days=30)
+        ).order_by().values('id')[:1000]),
+        ('auth.login', User.objects.filter(email=user.email)),
+        ('auth.prune_attempts', FailedLoginAttempt.objects.filter(
+            timestamp__lt=now - timedelta(days=30)
+        ).order_by().values('id')[:1000]),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot path queries and flag the ones scanning whole tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            action='append',
+            help='Only explain this hot path (repeatable)',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Run the queries and report actual timings (PostgreSQL only)',
+        )
+        parser.add_argument(
+            '--update-statistics',
+            action='store_true',
+            help='ANALYZE the hot path tables first; freshly seeded tables have no planner statistics',
+        )
+        parser.add_argument(
+            '--fail-on-seq-scan',
+            action='store_true',
+            help='Exit with an error when any hot path scans a whole table',
+        )
+
+    def update_statistics(self, models):
+        for model in models:
+            connection = connections[router.db_for_write(model)]
+            table = connection.ops.quote_name(model._meta.db_table)
+            statement = 'ANALYZE TABLE' if connection.vendor == 'mysql' else 'ANALYZE'
+            with connection.cursor() as cursor:
+                cursor.execute(f'{statement} {table}')
+                if connection.vendor == 'mysql':
+                    cursor.fetchall()
+
+    def handle(self, *args, **options):
+        # The most followed user and most commented tweet have the largest result sets
+        user = User.objects.order_by('-followers_count', 'id').first()
+        tweet = Tweet.objects.filter(is_deleted=False).order_by('-comments_count', 'id').first()
+        if user is None or tweet is None:
+            raise CommandError('No data to explain against; seed some with seed_scale first')
+
+        paths = hot_paths(user, tweet)
+        selected = options['path']
+        if selected:
+            unknown = set(selected) - {name for name, _ in paths}
+            if unknown:
+                raise CommandError(f"Unknown hot paths: {', '.join(sorted(unknown))}")
+            paths = [(name, queryset) for name, queryset in paths if name in selected]
+
+        if options['update_statistics']:
+            self.update_statistics({queryset.model for _, queryset in paths})
+
+        flagged = []
+        for name, queryset in paths:
+            connection = connections[router.db_for_read(queryset.model)]
+            analyze = options['analyze'] and connection.vendor == 'postgresql'
+            plan = queryset.explain(analyze=True) if analyze else queryset.explain()
+            pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+            scans = sorted(set(pattern.findall(plan))) if pattern else []
+
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            if scans or options['verbosity'] > 1:
+                for line in plan.splitlines():
+                    self.stdout.write(f"  {line}")
+            if scans:
+                flagged.append(name)
+                self.stdout.write(self.style.WARNING(f"  Sequential scan on {', '.join(scans)}"))
+
+        if flagged and options['fail_on_seq_scan']:
+            raise CommandError(f"Sequential scans in: {', '.join(flagged)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Explained {len(paths)} hot paths, {len(flagged)} with sequential scans"
+        ))
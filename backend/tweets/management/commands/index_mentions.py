@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from tweets.models import Tweet, TweetMention
+
+
+class Command(BaseCommand):
+    help = 'Backfill the mention index for existing tweets'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of tweets indexed per query',
+        )
+
+    def handle(self, *args, **options):
+        # Only tweets that might contain a mention
+        tweets = Tweet.objects.filter(content__contains='@', is_deleted=False).order_by('pk').only(
+            'id', 'content', 'author_id', 'created_at'
+        )
+        last_pk = 0
+        indexed = 0
+        while True:
+            batch = list(tweets.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            # Old mentions are indexed silently instead of notifying everyone at once
+            indexed += TweetMention.index_tweets(batch, notify=False)
+            last_pk = batch[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} mentions"))
@@ -0,0 +1,108 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.counters import Counter
+from follows.models import Follow
+from tweets.models import Comment, CommentMediaAttachment, Like, Retweet, Tweet
+from users.models import User
+
+COUNTERS = [
+    Counter(Tweet, 'likes_count', Like, 'tweet'),
+    Counter(Tweet, 'retweet_count', Retweet, 'tweet'),
+    Counter(Tweet, 'comments_count', Comment, 'tweet', filters={'is_deleted': False}),
+    Counter(Comment, 'media_count', CommentMediaAttachment, 'comment'),
+    Counter(User, 'followers_count', Follow, 'following', touch='updated_at'),
+    Counter(User, 'following_count', Follow, 'follower', touch='updated_at'),
+    Counter(User, 'tweets_count', Tweet, 'author', filters={'is_deleted': False}, touch='updated_at'),
+    Counter(User, 'likes_received', Like, 'tweet__author', filters={'tweet__is_deleted': False}, touch='updated_at'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized counters and fix the rows that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--counter',
+            action='append',
+            choices=[counter.label for counter in COUNTERS],
+            help='Only reconcile this counter (repeatable)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=10000,
+            help='Number of ids compared per aggregate query',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report the differences without writing them',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording progress; an interrupted run resumes from it',
+        )
+
+    def load_checkpoint(self, path):
+        if not path or not os.path.exists(path):
+            return {}
+        with open(path) as checkpoint:
+            return json.load(checkpoint)
+
+    def save_checkpoint(self, path, progress):
+        if not path:
+            return
+        with open(f'{path}.tmp', 'w') as checkpoint:
+            json.dump(progress, checkpoint)
+        os.replace(f'{path}.tmp', path)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        selected = options['counter']
+        counters = [counter for counter in COUNTERS if not selected or counter.label in selected]
+        checkpoint = options['checkpoint']
+        # {counter label: first id not yet reconciled}
+        progress = self.load_checkpoint(checkpoint)
+        dry_run = options['dry_run']
+
+        total = 0
+        for counter in counters:
+            start = progress.get(counter.label, 1)
+            max_id = counter.max_id()
+            if start > 1:
+                self.stdout.write(f"{counter.label}: resuming at id {start}")
+
+            drifted = 0
+            while start <= max_id:
+                end = start + chunk_size
+                with transaction.atomic():
+                    drift = counter.drift(start, end)
+                    if drift and not dry_run:
+                        counter.fix(drift)
+
+                for pk, (stored, actual) in sorted(drift.items()):
+                    if dry_run or options['verbosity'] > 1:
+                        self.stdout.write(f"{counter.label} id={pk}: {stored} -> {actual}")
+                drifted += len(drift)
+
+                start = end
+                if not dry_run:
+                    progress[counter.label] = start
+                    self.save_checkpoint(checkpoint, progress)
+
+            total += drifted
+            self.stdout.write(f"{counter.label}: {drifted} rows {'differ' if dry_run else 'fixed'}")
+
+        if checkpoint and not dry_run and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} counters {'differ' if dry_run else 'reconciled'}"
+        ))
@@ -0,0 +1,81 @@
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tweets.seeding import Dataset, Seeder, default_end
+from users.models import User
+
+SUFFIXES = {'': 1, 'k': 1000, 'm': 1000 ** 2}
+
+
+def count(value):
+    """Row count with an optional k/M suffix, e.g. 100k or 5M"""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([kKmM]?)', value)
+    if not match:
+        raise ValueError(value)
+    return int(float(match.group(1)) * SUFFIXES[match.group(2).lower()])
+
+
+class Command(BaseCommand):
+    help = 'Generate a large synthetic dataset of users, follows, tweets and engagement'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=count, default=1000, help='Number of users, e.g. 100k')
+        parser.add_argument('--tweets', type=count, default=10000, help='Number of tweets, e.g. 5M')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--days', type=int, default=90, help='Days of history the tweets are spread over')
+        parser.add_argument(
+            '--end',
+            type=lambda value: datetime.fromisoformat(value).replace(tzinfo=dt_timezone.utc),
+            help='Date of the newest tweet (UTC, defaults to midnight today)',
+        )
+        parser.add_argument('--follows-per-user', type=float, default=20, help='Mean follows per user')
+        parser.add_argument('--likes-per-tweet', type=float, default=2.0, help='Mean likes per tweet')
+        parser.add_argument('--retweets-per-tweet', type=float, default=0.2, help='Mean retweets per tweet')
+        parser.add_argument('--comments-per-tweet', type=float, default=0.5, help='Mean comments per tweet')
+        parser.add_argument('--media-rate', type=float, default=0.05, help='Share of tweets with a media row')
+        parser.add_argument('--prefix', help='Username prefix of the seeded users (defaults to seed<seed>_)')
+        parser.add_argument('--password', default='SeedPassword123!', help='Password of every seeded user')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows per insert')
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['tweets'] < 1:
+            raise CommandError('Seed at least 2 users and 1 tweet')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        prefix = options['prefix'] or f"seed{options['seed']}_"
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(f'Users prefixed {prefix!r} already exist; pass another --prefix')
+
+        self.stdout.write(f"Sampling {options['users']} users and {options['tweets']} tweets")
+        dataset = Dataset(
+            users=options['users'],
+            tweets=options['tweets'],
+            seed=options['seed'],
+            days=options['days'],
+            follows_per_user=options['follows_per_user'],
+            likes_per_tweet=options['likes_per_tweet'],
+            retweets_per_tweet=options['retweets_per_tweet'],
+            comments_per_tweet=options['comments_per_tweet'],
+            media_rate=options['media_rate'],
+        )
+
+        def progress(label, written):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"{label}: {written}")
+
+        seeder = Seeder(
+            dataset,
+            prefix=prefix,
+            end=options['end'] or default_end(),
+            password=options['password'],
+            chunk_size=options['chunk_size'],
+            progress=progress,
+        )
+        written = seeder.seed()
+        for label, rows in written.items():
+            self.stdout.write(f"{label}: {rows}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {sum(written.values())} rows; rebuild the follow graph and suggestions before relying on them"
+        ))
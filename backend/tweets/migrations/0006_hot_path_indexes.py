@@ -0,0 +1,33 @@
+# Generated by Django 4.2.17 on 2026-10-18 23:52
+
+from django.db import migrations, models
+
+from core.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently on PostgreSQL, which can't run in a transaction
+    atomic = False
+
+    dependencies = [
+        ("tweets", "0005_tweetmention"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="comment",
+            index=models.Index(
+                fields=["tweet", "-created_at"], name="tweets_comment_thread_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="tweet",
+            index=models.Index(fields=["-created_at"], name="tweets_recent_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="tweet",
+            index=models.Index(
+                fields=["author", "-created_at"], name="tweets_author_recent_idx"
+            ),
+        ),
+    ]
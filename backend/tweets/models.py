@@ -1,5 +1,8 @@
 from django.db import models
 from django.conf import settings
+from notifications.dispatch import buffered_notifications, emit
+from notifications.models import NotificationType
+from users.models import User
 
 class Tweet(models.Model):
     content = models.TextField(max_length=280)
@@ -13,6 +16,14 @@ class Tweet(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Tweets newest first (feed, list, search) and per author. Deleted rows
+            # are rare and filtered during the walk: is_deleted=False compiles to
+            # NOT is_deleted, which only PostgreSQL matches to an index column, and
+            # MySQL doesn't support partial indexes
+            models.Index(fields=['-created_at'], name='tweets_recent_idx'),
+            models.Index(fields=['author', '-created_at'], name='tweets_author_recent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.author.username}: {self.content[:50]}"
@@ -45,6 +56,10 @@ class Comment(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A tweet's live comments, newest first
+            models.Index(fields=['tweet', '-created_at'], name='tweets_comment_thread_idx'),
+        ]
     
     def __str__(self):
         return f"Comment by {self.author.username} on tweet {self.tweet.id}"
@@ -90,3 +105,62 @@ class Retweet(models.Model):
 
     def __str__(self):
         return f"{self.user.username} retweeted {self.tweet.id}"
+
+class TweetMention(models.Model):
+    """Index of the users mentioned in a tweet, written when the tweet is created"""
+    tweet = models.ForeignKey(Tweet, on_delete=models.CASCADE, related_name='mentions')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='tweet_mentions')
+    # Copy of the tweet's created_at, so the timeline is ordered without a join
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('tweet', 'user')
+        indexes = [
+            # Each mentions timeline page is a single range scan
+            models.Index(fields=['user', '-created_at', '-id'], name='tweets_mention_timeline_idx'),
+        ]
+
+    def __str__(self):
+        return f"Tweet {self.tweet_id} mentions {self.user_id}"
+
+    @classmethod
+    def index_tweets(cls, tweets, notify=True):
+        """
+        Record and notify the users mentioned in tweets.
+
+        Mentions of the whole batch are resolved with a single query and
+        written in one insert.
+
+        Returns:
+            int: Number of mentions recorded
+        """
+        from .serializers import extract_mentions
+
+        mentioned = {tweet.id: extract_mentions(tweet.content) for tweet in tweets}
+        usernames = {username for names in mentioned.values() for username in names}
+        if not usernames:
+            return 0
+
+        user_ids = User.objects.ids_by_username(usernames, is_active=True, is_deleted=False)
+        mentions = []
+        for tweet in tweets:
+            # @Bob and @bob are the same user
+            mentioned_ids = dict.fromkeys(
+                user_ids[username] for username in mentioned[tweet.id] if username in user_ids
+            )
+            mentions += [
+                cls(tweet=tweet, user_id=user_id, created_at=tweet.created_at)
+                for user_id in mentioned_ids if user_id != tweet.author_id
+            ]
+        cls.objects.bulk_create(mentions, batch_size=1000, ignore_conflicts=True)
+
+        if notify:
+            with buffered_notifications():
+                for mention in mentions:
+                    emit(mention.user_id, mention.tweet.author, NotificationType.MENTION, tweet_id=mention.tweet_id)
+        return len(mentions)
+
+    @classmethod
+    def index_tweet(cls, tweet):
+        """Record and notify the users mentioned in a new tweet"""
+        return cls.index_tweets([tweet])
@@ -0,0 +1,377 @@
+"""
+Synthetic datasets at scale, for benchmarks and query plan work.
+
+Every row is sampled up front as NumPy index arrays (user i, tweet j), so the
+same seed and options always produce the same data, then written in chunks
+with ``bulk_create`` (``COPY`` on PostgreSQL). Model ``save()`` logic, signals,
+notifications and the follow graph change feed are bypassed; counters are
+computed from the sampled arrays and written with the rows, so they agree with
+``reconcile_counters``.
+
+New rows are matched back to their index by primary key order, so seed a
+database nobody else is writing to.
+"""
+import io
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.db import connections, router, transaction
+from django.db.models import Max
+
+from follows.models import Follow
+from users.models import User
+from .models import Comment, Like, MediaAttachment, Retweet, Tweet, TweetMention
+
+logger = logging.getLogger(__name__)
+
+WORDS = (
+    'just shipped new feature today coffee morning code review deploy friday weekend '
+    'python django react team launch bug fix design meeting music game travel photo '
+    'city news update thread thoughts lunch book reading learning open source'
+).split()
+WORDS_PER_TWEET = 6
+HASHTAGS = 2000
+# Share of tweets posted in bursts around a trending moment, and how long a burst lasts
+BURST_SHARE = 0.4
+BURST_SECONDS = 20 * 60
+
+
+def power_law_weights(rng, n, exponent):
+    """Zipf-like sampling weights, shuffled so popularity isn't tied to user order"""
+    weights = np.arange(1, n + 1, dtype=np.float64) ** -exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def unique_pairs(left, right, size_right):
+    """Drop repeated (left, right) pairs, keeping the sample order stable"""
+    keys = left.astype(np.int64) * size_right + right
+    _, first = np.unique(keys, return_index=True)
+    first.sort()
+    return left[first], right[first]
+
+
+class Dataset:
+    """
+    Index arrays of a synthetic social graph.
+
+    Users get power-law follower counts (targets are sampled by a Zipf
+    popularity weight) and lognormal following counts. Tweets are spread over
+    ``days`` with a share of them in short bursts, and draw likes, retweets and
+    comments in proportion to their author's popularity.
+    """
+
+    def __init__(self, users, tweets, seed=0, days=90, follows_per_user=20, likes_per_tweet=2.0,
+                 retweets_per_tweet=0.2, comments_per_tweet=0.5, hashtag_rate=0.3, mention_rate=0.15,
+                 media_rate=0.05):
+        rng = np.random.default_rng(seed)
+        self.users = users
+        self.tweets = tweets
+        self.days = days
+
+        span = days * 86400
+        popularity = power_law_weights(rng, users, 1.1)
+        activity = power_law_weights(rng, users, 0.8)
+
+        # Follows: lognormal out-degree, power-law in-degree
+        sigma = 1.0
+        mu = np.log(max(follows_per_user, 1e-9)) - sigma ** 2 / 2
+        out_degree = np.minimum(rng.lognormal(mu, sigma, users).astype(np.int64), users - 1)
+        followers = np.repeat(np.arange(users, dtype=np.int64), out_degree)
+        following = rng.choice(users, size=len(followers), p=popularity)
+        keep = followers != following
+        self.follows = unique_pairs(followers[keep], following[keep], users)
+        self.follow_offsets = rng.uniform(0, span, len(self.follows[0]))
+
+        # Tweets: background traffic plus bursts, in chronological (and so insert) order
+        bursty = int(tweets * BURST_SHARE)
+        bursts = rng.uniform(0, span, max(tweets // 1000, 1))
+        offsets = np.concatenate([
+            rng.uniform(0, span, tweets - bursty),
+            rng.choice(bursts, bursty) + rng.exponential(BURST_SECONDS, bursty),
+        ])
+        self.tweet_offsets = np.sort(np.minimum(offsets, span))
+        self.authors = rng.choice(users, size=tweets, p=activity)
+        self.words = rng.integers(0, len(WORDS), size=(tweets, WORDS_PER_TWEET), dtype=np.uint16)
+        self.hashtags = np.where(
+            rng.random(tweets) < hashtag_rate, rng.zipf(1.5, tweets) % HASHTAGS, -1
+        )
+        mentioned = np.where(rng.random(tweets) < mention_rate, rng.choice(users, size=tweets, p=popularity), -1)
+        self.mentions = np.where(mentioned == self.authors, -1, mentioned)
+        self.media = np.flatnonzero(rng.random(tweets) < media_rate)
+
+        # Engagement goes to the tweets of popular authors
+        reach = popularity[self.authors]
+        reach /= reach.sum()
+
+        def engagement(per_tweet, allow_self):
+            count = int(tweets * per_tweet)
+            tweet_idx = rng.choice(tweets, size=count, p=reach)
+            user_idx = rng.choice(users, size=count, p=activity)
+            if not allow_self:
+                keep = user_idx != self.authors[tweet_idx]
+                tweet_idx, user_idx = tweet_idx[keep], user_idx[keep]
+            return tweet_idx, user_idx
+
+        self.likes = unique_pairs(*engagement(likes_per_tweet, True), users)
+        self.retweets = unique_pairs(*engagement(retweets_per_tweet, False), users)
+        self.comments = engagement(comments_per_tweet, True)
+        # Replies and likes come after the tweet, mostly within a few hours
+        self.like_delays = rng.exponential(4 * 3600, len(self.likes[0]))
+        self.retweet_delays = rng.exponential(4 * 3600, len(self.retweets[0]))
+        self.comment_delays = rng.exponential(2 * 3600, len(self.comments[0]))
+        self.comment_words = rng.integers(0, len(WORDS), size=(len(self.comments[0]), 3), dtype=np.uint16)
+        self.user_offsets = rng.uniform(-365 * 86400, 0, users)
+
+    def counters(self):
+        """Denormalized counters implied by the sampled rows, as lists"""
+        users, tweets = self.users, self.tweets
+        counters = {
+            'followers_count': np.bincount(self.follows[1], minlength=users),
+            'following_count': np.bincount(self.follows[0], minlength=users),
+            'tweets_count': np.bincount(self.authors, minlength=users),
+            'likes_received': np.bincount(self.authors[self.likes[0]], minlength=users),
+            'likes_count': np.bincount(self.likes[0], minlength=tweets),
+            'retweet_count': np.bincount(self.retweets[0], minlength=tweets),
+            'comments_count': np.bincount(self.comments[0], minlength=tweets),
+        }
+        return {name: counts.tolist() for name, counts in counters.items()}
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Keep the timestamps set on new rows instead of stamping them with the current time"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return (
+        str(value).replace('\\', '\\\\').replace('\t', '\\t')
+        .replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+
+def copy_rows(model, objs):
+    """Write rows with a single ``COPY ... FROM STDIN`` (PostgreSQL)"""
+    connection = connections[router.db_for_write(model)]
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    buffer = io.StringIO()
+    for obj in objs:
+        buffer.write('\t'.join(
+            copy_value(field.get_db_prep_save(getattr(obj, field.attname), connection)) for field in fields
+        ))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN', buffer)
+
+
+class Seeder:
+    """
+    Writes a ``Dataset`` in chunks, one transaction per chunk.
+
+    Args:
+        dataset: Sampled data to write
+        prefix: Username prefix of the seeded users
+        end: Timestamp of the newest tweet
+        password: Password of every seeded user
+        chunk_size: Rows per insert
+        progress: Optional callback(model label, rows written so far)
+    """
+
+    def __init__(self, dataset, prefix, end, password, chunk_size=10000, progress=None):
+        self.data = dataset
+        self.prefix = prefix
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.end = end.timestamp()
+        self.start = self.end - dataset.days * 86400
+        # One hash for every user; hashing per user would dominate the run
+        self.password = make_password(password, salt=f'{prefix}salt')
+        self.counters = dataset.counters()
+        self.user_ids = None
+        self.tweet_ids = None
+
+    def at(self, offset):
+        return datetime.fromtimestamp(self.start + offset, tz=dt_timezone.utc)
+
+    def load(self, model, rows, total):
+        """
+        Insert the instances built by ``rows(start, stop)``, chunk by chunk.
+
+        Returns:
+            int: Number of rows written
+        """
+        postgres = connections[router.db_for_write(model)].vendor == 'postgresql'
+        for start in range(0, total, self.chunk_size):
+            objs = rows(start, min(start + self.chunk_size, total))
+            with transaction.atomic():
+                if postgres:
+                    copy_rows(model, objs)
+                else:
+                    model.objects.bulk_create(objs, batch_size=self.chunk_size)
+            if self.progress:
+                self.progress(model._meta.label, start + len(objs))
+        logger.info("Seeded %s %s rows", total, model._meta.label)
+        return total
+
+    def load_with_ids(self, model, rows, total):
+        """``load`` and return the new primary keys in insert order"""
+        last_id = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        self.load(model, rows, total)
+        return list(model.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True))
+
+    def seed(self):
+        """
+        Write the whole dataset.
+
+        Returns:
+            dict: Rows written per model label
+        """
+        data = self.data
+        written = {}
+        with explicit_timestamps(User, Tweet, Comment, Like, Retweet, Follow, MediaAttachment):
+            self.user_ids = self.load_with_ids(User, self.users, data.users)
+            written[User._meta.label] = data.users
+            written[Follow._meta.label] = self.load(Follow, self.follows, len(data.follows[0]))
+            self.tweet_ids = self.load_with_ids(Tweet, self.tweets, data.tweets)
+            written[Tweet._meta.label] = data.tweets
+
+            mentions = np.flatnonzero(data.mentions >= 0)
+            written[TweetMention._meta.label] = self.load(TweetMention, lambda a, b: [
+                TweetMention(
+                    tweet_id=self.tweet_ids[j],
+                    user_id=self.user_ids[data.mentions[j]],
+                    created_at=self.at(data.tweet_offsets[j]),
+                )
+                for j in mentions[a:b]
+            ], len(mentions))
+            written[MediaAttachment._meta.label] = self.load(MediaAttachment, lambda a, b: [
+                MediaAttachment(
+                    tweet_id=self.tweet_ids[j],
+                    file=f'tweet_media/{self.prefix}{j}.jpg',
+                    created_at=self.at(data.tweet_offsets[j]),
+                )
+                for j in data.media[a:b]
+            ], len(data.media))
+
+            written[Like._meta.label] = self.load(
+                Like, self.reactions(Like, data.likes, data.like_delays), len(data.likes[0])
+            )
+            written[Retweet._meta.label] = self.load(
+                Retweet, self.reactions(Retweet, data.retweets, data.retweet_delays), len(data.retweets[0])
+            )
+            written[Comment._meta.label] = self.load(Comment, self.comments, len(data.comments[0]))
+        return written
+
+    def after_tweet(self, tweet_idx, delays):
+        """Offsets ``delays`` after the tweets were posted, never after the newest one"""
+        return np.minimum(self.data.tweet_offsets[tweet_idx] + delays, self.end - self.start)
+
+    def users(self, start, stop):
+        counters = self.counters
+        rows = []
+        for i in range(start, stop):
+            joined = self.at(self.data.user_offsets[i])
+            rows.append(User(
+                username=f'{self.prefix}{i}',
+                email=f'{self.prefix}{i}@seed.invalid',
+                password=self.password,
+                followers_count=counters['followers_count'][i],
+                following_count=counters['following_count'][i],
+                tweets_count=counters['tweets_count'][i],
+                likes_received=counters['likes_received'][i],
+                date_joined=joined,
+                created_at=joined,
+                updated_at=joined,
+            ))
+        return rows
+
+    def follows(self, start, stop):
+        followers, following = self.data.follows
+        return [
+            Follow(
+                follower_id=self.user_ids[followers[i]],
+                following_id=self.user_ids[following[i]],
+                created_at=self.at(self.data.follow_offsets[i]),
+            )
+            for i in range(start, stop)
+        ]
+
+    def tweets(self, start, stop):
+        data, counters = self.data, self.counters
+        rows = []
+        for j in range(start, stop):
+            words = [WORDS[w] for w in data.words[j]]
+            if data.hashtags[j] >= 0:
+                words.append(f'#topic{data.hashtags[j]}')
+            if data.mentions[j] >= 0:
+                words.append(f'@{self.prefix}{data.mentions[j]}')
+            created = self.at(data.tweet_offsets[j])
+            rows.append(Tweet(
+                content=' '.join(words),
+                author_id=self.user_ids[data.authors[j]],
+                likes_count=counters['likes_count'][j],
+                retweet_count=counters['retweet_count'][j],
+                comments_count=counters['comments_count'][j],
+                created_at=created,
+                updated_at=created,
+            ))
+        return rows
+
+    def reactions(self, model, pairs, delays):
+        """Row builder for likes or retweets"""
+        tweet_idx, user_idx = pairs
+        created = self.after_tweet(tweet_idx, delays)
+
+        def rows(start, stop):
+            return [
+                model(
+                    tweet_id=self.tweet_ids[tweet_idx[i]],
+                    user_id=self.user_ids[user_idx[i]],
+                    created_at=self.at(created[i]),
+                )
+                for i in range(start, stop)
+            ]
+        return rows
+
+    def comments(self, start, stop):
+        data = self.data
+        tweet_idx, user_idx = data.comments
+        created = self.after_tweet(tweet_idx[start:stop], data.comment_delays[start:stop])
+        return [
+            Comment(
+                tweet_id=self.tweet_ids[tweet_idx[i]],
+                author_id=self.user_ids[user_idx[i]],
+                content=' '.join(WORDS[w] for w in data.comment_words[i]),
+                created_at=self.at(created[i - start]),
+                updated_at=self.at(created[i - start]),
+            )
+            for i in range(start, stop)
+        ]
+
+
+def default_end():
+    """Midnight UTC today, so a seed run on the same day is reproduced exactly"""
+    return datetime.now(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
@@ -1,14 +1,24 @@
 from rest_framework import serializers
 from .models import Tweet, MediaAttachment, Comment, CommentMediaAttachment
 from users.serializers import UserProfileSerializer
+from core.instrumentation import TimedSerializerMixin
 import re
 from django.utils.html import escape
 import bleach
 
+# Upper bound on the users one tweet can mention (and notify)
+MAX_MENTIONS = 10
+# Any username the model validator accepts ([\w.@+-]), minus trailing punctuation
+MENTION_RE = re.compile(r'(?<![\w.@+-])@([\w.@+-]{0,149}\w)')
+
 def extract_hashtags(content):
     """Extract hashtags from content"""
     return re.findall(r'#(\w+)', content)
 
+def extract_mentions(content):
+    """Extract the unique @usernames mentioned in content, in order"""
+    return list(dict.fromkeys(MENTION_RE.findall(content)))[:MAX_MENTIONS]
+
 class MediaAttachmentSerializer(serializers.ModelSerializer):
     file = serializers.SerializerMethodField()
 
@@ -39,7 +49,7 @@ class CommentMediaAttachmentSerializer(serializers.ModelSerializer):
         return None
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     author = UserProfileSerializer(read_only=True)
     media = CommentMediaAttachmentSerializer(many=True, read_only=True)
     hashtags = serializers.SerializerMethodField()
@@ -89,28 +99,37 @@ class CommentSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class TweetSerializer(serializers.ModelSerializer):
+class TweetSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     author = UserProfileSerializer(read_only=True)
     media = MediaAttachmentSerializer(many=True, read_only=True)
     comments = CommentSerializer(many=True, read_only=True, source='comments.all')
     comments_preview = serializers.SerializerMethodField()
     hashtags = serializers.SerializerMethodField()
+    mentions = serializers.SerializerMethodField()
     
     class Meta:
         model = Tweet
         fields = ['id', 'content', 'author', 'created_at', 'updated_at', 
                   'likes_count', 'retweet_count', 'comments_count', 
-                  'media', 'comments', 'comments_preview', 'hashtags']
+                  'media', 'comments', 'comments_preview', 'hashtags', 'mentions']
         read_only_fields = ['id', 'author', 'created_at', 'updated_at', 
-                           'likes_count', 'retweet_count', 'comments_count', 'hashtags']
+                           'likes_count', 'retweet_count', 'comments_count', 'hashtags', 'mentions']
     
     def get_hashtags(self, obj):
         """Get hashtags from tweet content"""
         return extract_hashtags(obj.content)
     
+    def get_mentions(self, obj):
+        """Get mentioned usernames from tweet content"""
+        return extract_mentions(obj.content)
+    
     def get_comments_preview(self, obj):
         """Get the latest 3 comments for preview"""
-        latest_comments = obj.comments.filter(is_deleted=False).order_by('-created_at')[:3]
+        if 'comments' in getattr(obj, '_prefetched_objects_cache', {}):
+            # Already loaded (newest first) for the comments field
+            latest_comments = [comment for comment in obj.comments.all() if not comment.is_deleted][:3]
+        else:
+            latest_comments = obj.comments.filter(is_deleted=False).order_by('-created_at')[:3]
         return CommentSerializer(latest_comments, many=True).data
     
     def validate_content(self, value):
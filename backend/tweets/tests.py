@@ -1,3 +1,209 @@
-from django.test import TestCase
+import json
+from io import StringIO
 
-# Create your tests here.
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import F
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from follows.models import Follow
+from notifications.models import Notification, NotificationType
+from .models import Comment, Like, Tweet, TweetMention
+from .serializers import extract_mentions
+
+User = get_user_model()
+
+
+def make_user(name):
+    return User.objects.create_user(
+        username=name,
+        email=f'{name}@example.com',
+        password='StrongPassword123!'
+    )
+
+
+def client_for(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+    return client
+
+
+@pytest.fixture
+def drifted():
+    """A tweet and users whose counters disagree with their rows"""
+    alice, bob = make_user('alice'), make_user('bob')
+    tweet = Tweet.objects.create(content='Hello', author=alice)
+    Like.objects.create(tweet=tweet, user=bob)
+    Comment.objects.create(tweet=tweet, author=bob, content='Hi')
+    Comment.objects.create(tweet=tweet, author=bob, content='Gone', is_deleted=True)
+    Follow.objects.create(follower=bob, following=alice)
+
+    Tweet.objects.filter(pk=tweet.pk).update(likes_count=5, comments_count=0, retweet_count=2)
+    User.objects.filter(pk=alice.pk).update(followers_count=0)
+    return alice, bob, tweet
+
+
+@pytest.mark.django_db
+class TestReconcileCounters:
+    def test_fixes_drifted_counters(self, drifted):
+        alice, bob, tweet = drifted
+
+        out = StringIO()
+        call_command('reconcile_counters', chunk_size=1, stdout=out)
+
+        tweet.refresh_from_db()
+        alice.refresh_from_db()
+        bob.refresh_from_db()
+        assert (tweet.likes_count, tweet.retweet_count, tweet.comments_count) == (1, 0, 1)
+        assert alice.followers_count == 1
+        assert bob.following_count == 1
+        assert (alice.tweets_count, alice.likes_received) == (1, 1)
+        assert '6 counters reconciled' in out.getvalue()
+
+    def test_dry_run_reports_without_writing(self, drifted):
+        _, _, tweet = drifted
+
+        out = StringIO()
+        call_command('reconcile_counters', dry_run=True, counter=['tweets.tweet.likes_count'], stdout=out)
+
+        assert f'tweets.tweet.likes_count id={tweet.pk}: 5 -> 1' in out.getvalue()
+        tweet.refresh_from_db()
+        assert tweet.likes_count == 5
+
+    def test_resumes_from_checkpoint(self, drifted, tmp_path):
+        _, _, tweet = drifted
+        checkpoint = tmp_path / 'progress.json'
+        checkpoint.write_text(json.dumps({'tweets.tweet.likes_count': tweet.pk + 1}))
+
+        call_command(
+            'reconcile_counters', counter=['tweets.tweet.likes_count'],
+            checkpoint=str(checkpoint), stdout=StringIO()
+        )
+
+        # Already past this tweet, so it is left alone and the finished checkpoint is removed
+        tweet.refresh_from_db()
+        assert tweet.likes_count == 5
+        assert not checkpoint.exists()
+
+
+def test_extract_mentions():
+    assert extract_mentions('@bob hi @carol and @bob again, mail me@example.com') == ['bob', 'carol']
+    # Every character usernames may contain, without the punctuation ending a sentence
+    assert extract_mentions('Thanks @jane.doe, @user-123 and @a+b@c. Also @dave...') == [
+        'jane.doe', 'user-123', 'a+b@c', 'dave'
+    ]
+
+
+@pytest.mark.django_db
+class TestMentions:
+    def test_creating_a_tweet_indexes_and_notifies_mentions(self, django_capture_on_commit_callbacks):
+        alice, bob = make_user('alice'), make_user('bob')
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = client_for(alice).post(
+                '/api/v1/tweets/', {'content': 'Hi @bob, @alice and @nobody'}, format='json'
+            )
+
+        assert response.data['mentions'] == ['bob', 'alice', 'nobody']
+        assert list(TweetMention.objects.values_list('user_id', flat=True)) == [bob.id]
+        notification = Notification.objects.get(recipient=bob)
+        assert notification.notification_type == NotificationType.MENTION
+        assert notification.tweet_id == response.data['id']
+
+    def test_mentions_ignore_case(self):
+        alice, bob = make_user('alice'), make_user('Bob')
+        tweet = Tweet.objects.create(content='Hi @bob and @BOB', author=alice)
+
+        assert TweetMention.index_tweets([tweet], notify=False) == 1
+        assert TweetMention.objects.get().user_id == bob.id
+
+    def test_exact_username_wins_over_case_insensitive_matches(self):
+        alice, upper, lower = make_user('alice'), make_user('Bob'), make_user('bob')
+        tweet = Tweet.objects.create(content='@bob @Bob', author=alice)
+
+        TweetMention.index_tweets([tweet], notify=False)
+
+        assert set(TweetMention.objects.values_list('user_id', flat=True)) == {upper.id, lower.id}
+
+    def test_mentions_timeline(self):
+        alice, bob = make_user('alice'), make_user('bob')
+        tweets = [Tweet.objects.create(content=f'@bob number {i}', author=alice) for i in range(3)]
+        Tweet.objects.create(content='No mention', author=alice)
+        TweetMention.index_tweets(tweets, notify=False)
+        tweets[0].soft_delete()
+        client = client_for(bob)
+
+        response = client.get('/api/v1/tweets/mentions/?page_size=1')
+        assert [tweet['content'] for tweet in response.data['results']] == ['@bob number 2']
+
+        response = client.get(f"/api/v1/tweets/mentions/?page_size=1&cursor={response.data['next_cursor']}")
+        assert [tweet['content'] for tweet in response.data['results']] == ['@bob number 1']
+        assert response.data['next_cursor'] is None
+
+    def test_backfill_command(self):
+        alice, bob = make_user('alice'), make_user('bob')
+        Tweet.objects.create(content='Hello @bob', author=alice)
+
+        call_command('index_mentions', stdout=StringIO())
+
+        assert TweetMention.objects.filter(user=bob).count() == 1
+        assert not Notification.objects.exists()
+
+
+@pytest.mark.django_db
+class TestSeedScale:
+    def test_seeds_consistent_counters(self):
+        call_command('seed_scale', users=40, tweets=300, chunk_size=64, stdout=StringIO())
+
+        assert User.objects.filter(username__startswith='seed0_').count() == 40
+        assert Tweet.objects.count() == 300
+        assert Like.objects.exists() and Follow.objects.exists() and Comment.objects.exists()
+        # Timestamps come from the sample, not from the insert
+        assert Tweet.objects.order_by('id').first().created_at <= Tweet.objects.order_by('id').last().created_at
+        assert not Follow.objects.filter(follower=F('following')).exists()
+
+        out = StringIO()
+        call_command('reconcile_counters', dry_run=True, stdout=out)
+        assert '0 counters differ' in out.getvalue()
+
+    def test_same_seed_gives_same_data(self):
+        call_command('seed_scale', users=20, tweets=50, seed=7, prefix='a_', stdout=StringIO())
+        call_command('seed_scale', users=20, tweets=50, seed=7, prefix='b_', stdout=StringIO())
+
+        def contents(prefix):
+            return list(
+                Tweet.objects.filter(author__username__startswith=prefix).order_by('id')
+                .values_list('content', 'likes_count', 'created_at')
+            )
+        assert [(c.replace('@b_', '@a_'), *rest) for c, *rest in contents('b_')] == contents('a_')
+
+    def test_refuses_existing_prefix(self):
+        make_user('seed0_1')
+
+        with pytest.raises(CommandError):
+            call_command('seed_scale', users=5, tweets=5, stdout=StringIO())
+
+
+@pytest.mark.django_db
+class TestExplainHotPaths:
+    def test_hot_paths_use_indexes(self):
+        call_command('seed_scale', users=50, tweets=500, stdout=StringIO())
+
+        out = StringIO()
+        call_command('explain_hot_paths', update_statistics=True, fail_on_seq_scan=True, stdout=out)
+
+        assert 'Explained 12 hot paths, 0 with sequential scans' in out.getvalue()
+
+    def test_flags_sequential_scans(self):
+        from .management.commands.explain_hot_paths import SEQ_SCAN_PATTERNS
+
+        plan = '3 0 0 SCAN tweets_tweet\n5 0 0 SCAN tweets_comment USING INDEX tweets_comment_thread_idx'
+        assert SEQ_SCAN_PATTERNS['sqlite'].findall(plan) == ['tweets_tweet']
+        assert SEQ_SCAN_PATTERNS['postgresql'].findall('Seq Scan on tweets_tweet  (cost=0.00..1.01)') == ['tweets_tweet']
+
+    def test_requires_data(self):
+        with pytest.raises(CommandError):
+            call_command('explain_hot_paths', stdout=StringIO())
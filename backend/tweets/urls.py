@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import TweetViewSet, CommentViewSet
 
 app_name = 'tweets'
@@ -24,4 +26,7 @@ urlpatterns = [
         'delete': 'destroy'
     }), name='tweet-comment-detail'),
     path('<int:pk>/add_comment/', TweetViewSet.as_view({'post': 'add_comment'}), name='tweet-add-comment'),
-] 
\ No newline at end of file
+]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = async_views.urlpatterns + urlpatterns
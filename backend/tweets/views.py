@@ -3,12 +3,11 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from rest_framework.throttling import UserRateThrottle
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, F
+from django.db.models import Q, F, Prefetch, prefetch_related_objects
 from django.core.files.uploadedfile import UploadedFile
 import os
-from .models import Tweet, MediaAttachment, Comment, CommentMediaAttachment, Like, Retweet
+from .models import Tweet, MediaAttachment, Comment, CommentMediaAttachment, Like, Retweet, TweetMention
 from .serializers import (
     TweetSerializer, 
     MediaAttachmentSerializer, 
@@ -16,7 +15,14 @@ from .serializers import (
     CommentMediaAttachmentSerializer
 )
 from users.models import User
+from notifications.dispatch import emit
+from core.events import FEED_TOPIC, publish_on_commit
+from core.pagination import KeysetPagination
+from core.writes import write
+from core.throttling import UserGCRAThrottle
+from notifications.models import NotificationType
 from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 import logging
@@ -24,23 +30,72 @@ import logging
 logger = logging.getLogger(__name__)
 
 # Custom throttle classes
-class TweetCreateThrottle(UserRateThrottle):
+class TweetCreateThrottle(UserGCRAThrottle):
     rate = '100/day'
     scope = 'tweet_create'
 
-class TweetLikeRateThrottle(UserRateThrottle):
+class TweetLikeRateThrottle(UserGCRAThrottle):
     rate = '200/hour'
     scope = 'tweet_like'
 
-class TweetRetweetRateThrottle(UserRateThrottle):
+class TweetRetweetRateThrottle(UserGCRAThrottle):
     rate = '100/hour'
     scope = 'tweet_retweet'
 
-class TweetSearchRateThrottle(UserRateThrottle):
+class TweetSearchRateThrottle(UserGCRAThrottle):
     rate = '300/hour'
     scope = 'tweet_search'
 
 
+def tweet_prefetches():
+    """Related objects TweetSerializer renders, comments (and their previews) included"""
+    return [
+        'media',
+        Prefetch('comments', queryset=Comment.objects.select_related('author').prefetch_related('media')),
+    ]
+
+
+def publish_engagement(tweet, field, delta):
+    """Tell live clients that a tweet counter changed; carries the new value so dropped deltas self-heal"""
+    publish_on_commit(FEED_TOPIC, 'engagement', {
+        'tweet_id': tweet.id,
+        'field': field,
+        'delta': delta,
+        'value': getattr(tweet, field),
+    })
+
+
+# Writes of the busiest endpoints, run through the write queue (see core.writes)
+
+def record_like(tweet, user):
+    """Store a like and count it; False if the user already liked the tweet"""
+    if Like.objects.filter(tweet=tweet, user=user).exists():
+        return False
+    Like.objects.create(tweet=tweet, user=user)
+    tweet.likes_count = F('likes_count') + 1
+    tweet.save()
+    User.adjust_counts({'likes_received': {tweet.author_id: 1}})
+    return True
+
+
+def record_retweet(tweet, user):
+    """Store a retweet and count it; False if the user already retweeted the tweet"""
+    if Retweet.objects.filter(tweet=tweet, user=user).exists():
+        return False
+    Retweet.objects.create(tweet=tweet, user=user)
+    tweet.retweet_count = F('retweet_count') + 1
+    tweet.save()
+    return True
+
+
+def record_comment(serializer, tweet, author):
+    """Save a validated comment and count it"""
+    comment = serializer.save(tweet=tweet, author=author)
+    tweet.comments_count = F('comments_count') + 1
+    tweet.save()
+    return comment
+
+
 class TweetViewSet(viewsets.ModelViewSet):
     """
     ViewSet for handling tweet operations
@@ -49,6 +104,8 @@ class TweetViewSet(viewsets.ModelViewSet):
     serializer_class = TweetSerializer
     parser_classes = [MultiPartParser, FormParser, JSONParser]
     permission_classes = [permissions.IsAuthenticated]
+    # Read-only actions that tolerate replica lag (see core.replicas)
+    replica_actions = {'list', 'retrieve', 'feed', 'search', 'user_tweets'}
     
     # Maximum file size: 5MB
     MAX_FILE_SIZE = 5 * 1024 * 1024
@@ -79,6 +136,39 @@ class TweetViewSet(viewsets.ModelViewSet):
             throttle_classes = []
         return [throttle() for throttle in throttle_classes]
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = self.with_related(queryset)
+        return queryset
+
+    @staticmethod
+    def with_related(tweets):
+        """Load what the serializer renders in a fixed number of queries"""
+        return tweets.select_related('author').prefetch_related(*tweet_prefetches())
+
+    @staticmethod
+    def feed_tweets():
+        """Tweets of the home feed; for now all of them, newest first"""
+        return Tweet.objects.filter(is_deleted=False).order_by('-created_at')
+
+    @staticmethod
+    def search_tweets(query):
+        """Tweets matching a hashtag (``#tag``), or containing the query or by a matching username"""
+        # Check if searching for hashtag
+        if query.startswith('#'):
+            hashtag = query[1:]  # Remove the # symbol
+            return Tweet.objects.filter(
+                content__iregex=rf'#\b{hashtag}\b',  # Match exact hashtag
+                is_deleted=False
+            ).order_by('-created_at')
+        # Search tweets by content or author username
+        return Tweet.objects.filter(
+            Q(content__icontains=query) |
+            Q(author__username__icontains=query),
+            is_deleted=False
+        ).order_by('-created_at')
+
     def get_serializer_context(self):
         """
         Extra context provided to the serializer class.
@@ -130,12 +220,28 @@ class TweetViewSet(viewsets.ModelViewSet):
             if tweet.id:
                 tweet.delete()
             raise
-            
+        
+        User.adjust_counts({'tweets_count': {tweet.author_id: 1}})
+        TweetMention.index_tweet(tweet)
+        publish_on_commit(FEED_TOPIC, 'tweet_created', {
+            'id': tweet.id,
+            'author': self.request.user.username,
+            'created_at': tweet.created_at.isoformat(),
+        })
         return tweet
     
     def perform_destroy(self, instance):
         """Soft delete a tweet instead of actually deleting it"""
-        instance.soft_delete()
+        # Conditional update so concurrent deletes only adjust the author's counts once
+        deleted = Tweet.objects.filter(pk=instance.pk, is_deleted=False).update(
+            is_deleted=True, updated_at=timezone.now()
+        )
+        if deleted:
+            instance.is_deleted = True
+            User.adjust_counts({
+                'tweets_count': {instance.author_id: -1},
+                'likes_received': {instance.author_id: -instance.likes_count},
+            })
     
     @action(detail=False, methods=['get'])
     def feed(self, request):
@@ -147,8 +253,7 @@ class TweetViewSet(viewsets.ModelViewSet):
         - Popular tweets
         - Recent tweets
         """
-        # For now, just get all tweets ordered by creation date
-        tweets = Tweet.objects.filter(is_deleted=False).order_by('-created_at')
+        tweets = self.with_related(self.feed_tweets())
         
         # Apply pagination
         page = self.paginate_queryset(tweets)
@@ -174,10 +279,10 @@ class TweetViewSet(viewsets.ModelViewSet):
         user = get_object_or_404(User, username=username, is_deleted=False)
         
         # Get their tweets
-        tweets = Tweet.objects.filter(
+        tweets = self.with_related(Tweet.objects.filter(
             author=user,
             is_deleted=False
-        ).order_by('-created_at')
+        ).order_by('-created_at'))
         
         # Apply pagination
         page = self.paginate_queryset(tweets)
@@ -188,6 +293,21 @@ class TweetViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(tweets, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'])
+    def mentions(self, request):
+        """Get tweets mentioning the current user, newest first (keyset paginated)"""
+        paginator = KeysetPagination()
+        mentions = TweetMention.objects.filter(
+            user=request.user,
+            tweet__is_deleted=False
+        ).select_related('tweet__author')
+
+        page = paginator.paginate_queryset(mentions, request, view=self)
+        tweets = [mention.tweet for mention in page]
+        prefetch_related_objects(tweets, *tweet_prefetches())
+        serializer = self.get_serializer(tweets, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    
     @action(detail=False, methods=['get'])
     def search(self, request):
         """Search tweets by content, username, or hashtag"""
@@ -199,20 +319,7 @@ class TweetViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check if searching for hashtag
-        if query.startswith('#'):
-            hashtag = query[1:]  # Remove the # symbol
-            tweets = Tweet.objects.filter(
-                content__iregex=rf'#\b{hashtag}\b',  # Match exact hashtag
-                is_deleted=False
-            ).order_by('-created_at')
-        else:
-            # Search tweets by content or author username
-            tweets = Tweet.objects.filter(
-                Q(content__icontains=query) | 
-                Q(author__username__icontains=query),
-                is_deleted=False
-            ).order_by('-created_at')
+        tweets = self.with_related(self.search_tweets(query))
         
         # Apply pagination
         page = self.paginate_queryset(tweets)
@@ -228,18 +335,16 @@ class TweetViewSet(viewsets.ModelViewSet):
         tweet = self.get_object()
         user = request.user
 
-        # Check if user has already liked the tweet
-        if Like.objects.filter(tweet=tweet, user=user).exists():
+        # Create like and increment counter, unless the user already liked the tweet
+        if not write(record_like, tweet, user):
             return Response(
                 {'error': 'You have already liked this tweet'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-
-        # Create like and increment counter
-        Like.objects.create(tweet=tweet, user=user)
-        tweet.likes_count = F('likes_count') + 1
-        tweet.save()
-        tweet.refresh_from_db()
+        # Reload with the related objects the serializer renders
+        tweet = self.with_related(self.get_queryset()).get(pk=tweet.pk)
+        emit(tweet.author_id, user, NotificationType.LIKE, tweet_id=tweet.id)
+        publish_engagement(tweet, 'likes_count', 1)
         
         serializer = self.get_serializer(tweet)
         return Response(serializer.data)
@@ -249,18 +354,16 @@ class TweetViewSet(viewsets.ModelViewSet):
         tweet = self.get_object()
         user = request.user
 
-        # Check if user has already retweeted the tweet
-        if Retweet.objects.filter(tweet=tweet, user=user).exists():
+        # Create retweet and increment counter, unless the user already retweeted the tweet
+        if not write(record_retweet, tweet, user):
             return Response(
                 {'error': 'You have already retweeted this tweet'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-
-        # Create retweet and increment counter
-        Retweet.objects.create(tweet=tweet, user=user)
-        tweet.retweet_count = F('retweet_count') + 1
-        tweet.save()
-        tweet.refresh_from_db()
+        # Reload with the related objects the serializer renders
+        tweet = self.with_related(self.get_queryset()).get(pk=tweet.pk)
+        emit(tweet.author_id, user, NotificationType.RETWEET, tweet_id=tweet.id)
+        publish_engagement(tweet, 'retweet_count', 1)
         
         serializer = self.get_serializer(tweet)
         return Response(serializer.data)
@@ -269,7 +372,9 @@ class TweetViewSet(viewsets.ModelViewSet):
     def comments(self, request, pk=None):
         """Get all comments for a specific tweet"""
         tweet = self.get_object()
-        comments = Comment.objects.filter(tweet=tweet, is_deleted=False).order_by('-created_at')
+        comments = Comment.objects.filter(
+            tweet=tweet, is_deleted=False
+        ).select_related('author').prefetch_related('media').order_by('-created_at')
         serializer = CommentSerializer(comments, many=True)
         return Response(serializer.data)
     
@@ -280,12 +385,10 @@ class TweetViewSet(viewsets.ModelViewSet):
         serializer = CommentSerializer(data=request.data, context={'request': request})
         
         if serializer.is_valid():
-            serializer.save(tweet=tweet, author=request.user)
-            
-            # Update comment count
-            tweet.comments_count = F('comments_count') + 1
-            tweet.save()
-            tweet.refresh_from_db()
+            # Save the comment and update comment count
+            write(record_comment, serializer, tweet, request.user)
+            tweet = self.with_related(self.get_queryset()).get(pk=tweet.pk)
+            publish_engagement(tweet, 'comments_count', 1)
             
             # Return updated tweet with new comment
             tweet_serializer = self.get_serializer(tweet)
@@ -358,6 +461,7 @@ class CommentViewSet(viewsets.ModelViewSet):
         tweet.comments_count = F('comments_count') + 1
         tweet.save()
         tweet.refresh_from_db()
+        publish_engagement(tweet, 'comments_count', 1)
     
     def destroy(self, request, *args, **kwargs):
         comment = self.get_object()
@@ -366,10 +470,12 @@ class CommentViewSet(viewsets.ModelViewSet):
         # Soft delete the comment
         comment.soft_delete()
         
-        # Update comment count
-        tweet.comments_count = F('comments_count') - 1
-        tweet.save()
-        tweet.refresh_from_db()
+        # Update comment count, never below zero
+        Tweet.objects.filter(pk=tweet.pk, comments_count__gt=0).update(
+            comments_count=F('comments_count') - 1
+        )
+        tweet.refresh_from_db(fields=['comments_count'])
+        publish_engagement(tweet, 'comments_count', -1)
         
         return Response(status=status.HTTP_204_NO_CONTENT)
     
@@ -0,0 +1,54 @@
+"""
+Cached profile cards.
+
+Cards are cached under ``(user_id, updated_at)``. Profile edits go through
+``save()`` and counter changes through ``User.adjust_counts``, both of which
+bump ``updated_at``, so a changed user is looked up under a new key and stale
+cards simply expire.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import User
+from .serializers import ProfileCardSerializer
+
+CARD_FIELDS = ['id', 'username', 'bio', 'location', 'profile_picture', 'followers_count',
+               'following_count', 'tweets_count', 'likes_received', 'created_at']
+
+
+def card_cache_key(user_id, updated_at):
+    return f'users:card:{user_id}:{updated_at.timestamp()}'
+
+
+def get_profile_cards(usernames):
+    """
+    Get the profile cards of active users by username.
+
+    One narrow query finds the cache keys; only cards missing from the cache
+    are loaded and serialized.
+
+    Returns:
+        dict: {username: card}
+    """
+    rows = User.objects.filter(
+        username__in=usernames, is_active=True, is_deleted=False
+    ).values_list('username', 'id', 'updated_at')
+    keys = {username: card_cache_key(user_id, updated_at) for username, user_id, updated_at in rows}
+    if not keys:
+        return {}
+
+    cached = cache.get_many(list(keys.values()))
+    cards = {username: cached[key] for username, key in keys.items() if key in cached}
+
+    missing = [username for username in keys if username not in cards]
+    if missing:
+        users = User.objects.filter(username__in=missing).only(*CARD_FIELDS, 'updated_at')
+        fresh = {}
+        for user in users:
+            card = dict(ProfileCardSerializer(user).data)
+            cards[user.username] = card
+            # Keyed by the freshly read timestamp in case the user changed in between
+            fresh[card_cache_key(user.id, user.updated_at)] = card
+        cache.set_many(fresh, timeout=settings.PROFILE_CARD_CACHE_TIMEOUT)
+
+    return cards
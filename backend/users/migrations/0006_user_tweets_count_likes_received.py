@@ -0,0 +1,23 @@
+# Generated by Django 4.2.17 on 2026-10-18 23:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0005_auto_20250406_1431"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="likes_received",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="tweets_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.17 on 2026-10-18 23:11
+
+import os
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_existing_demo_users_claimed(apps, schema_editor):
+    """Demo accounts created before the pool were all handed out already"""
+    User = apps.get_model("users", "User")
+    User.objects.filter(is_demo_user=True, demo_claimed_at__isnull=True).exclude(
+        email=os.environ.get("DEMO_USER_EMAIL", "demo@twitterclone.com")
+    ).update(demo_claimed_at=F("date_joined"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0006_user_tweets_count_likes_received"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="demo_claimed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                fields=["is_demo_user", "demo_claimed_at"], name="users_demo_pool_idx"
+            ),
+        ),
+        migrations.RunPython(
+            mark_existing_demo_users_claimed, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.17 on 2026-10-19 00:46
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0008_token_version"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                django.db.models.functions.text.Lower("username"),
+                name="users_username_lower_idx",
+            ),
+        ),
+    ]
@@ -1,5 +1,15 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser, BaseUserManager
+from django.core.cache import cache
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from core.counters import apply_count_deltas
+
+def auth_cache_key(user_id, token_version):
+    """Cache key of the user record used to authenticate requests"""
+    return f'users:auth:{user_id}:{token_version}'
+
 
 # Custom User Manager
 class CustomUserManager(BaseUserManager):
@@ -24,6 +34,41 @@ class CustomUserManager(BaseUserManager):
         
         return self.create_user(email, password, **extra_fields)
 
+    def get_by_username(self, username):
+        """Get a user by username, falling back to a match that ignores case"""
+        try:
+            return self.get(username=username)
+        except self.model.DoesNotExist:
+            user = self.filter(username__iexact=username).order_by('id').first()
+            if user is None:
+                raise
+            return user
+
+    def ids_by_username(self, usernames, **filters):
+        """
+        Resolve usernames to user ids in one query, the way ``get_by_username`` does.
+
+        Returns:
+            dict: {username as given: user id} for the usernames that matched
+        """
+        lowered = {username.lower() for username in usernames}
+        if not lowered:
+            return {}
+        rows = self.annotate(username_lower=Lower('username')).filter(
+            username_lower__in=lowered, **filters
+        ).order_by('-id').values_list('username', 'id')
+
+        exact, by_lower = {}, {}
+        for username, user_id in rows:
+            exact[username] = user_id
+            # Descending ids, so the oldest account wins
+            by_lower[username.lower()] = user_id
+        return {
+            username: exact.get(username, by_lower.get(username.lower()))
+            for username in usernames
+            if username in exact or username.lower() in by_lower
+        }
+
 # User Model
 class User(AbstractUser):
     email = models.EmailField(unique=True)
@@ -32,20 +77,62 @@ class User(AbstractUser):
     profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
     followers_count = models.PositiveIntegerField(default=0)
     following_count = models.PositiveIntegerField(default=0)
+    tweets_count = models.PositiveIntegerField(default=0)
+    # Likes on the user's (not deleted) tweets
+    likes_received = models.PositiveIntegerField(default=0)
     is_deleted = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     last_activation = models.DateTimeField(null=True, blank=True)
     is_demo_user = models.BooleanField(default=False)
+    # When a pooled demo account was handed out; unclaimed pool accounts have None
+    demo_claimed_at = models.DateTimeField(null=True, blank=True)
+    # Carried in issued tokens; bumping it revokes every token issued before
+    token_version = models.PositiveIntegerField(default=0)
     
     objects = CustomUserManager()
     
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []  # Email is already required by USERNAME_FIELD
     
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Finding an unclaimed (or expired) demo account is a single index seek
+            models.Index(fields=['is_demo_user', 'demo_claimed_at'], name='users_demo_pool_idx'),
+            # Username lookups that ignore case (mentions, login by username)
+            models.Index(Lower('username'), name='users_username_lower_idx'),
+        ]
+    
     def __str__(self):
         return self.email
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Drop the cached auth record, including the one of revoked tokens
+        versions = range(getattr(self, '_revoked_from', self.token_version), self.token_version + 1)
+        keys = [auth_cache_key(self.pk, version) for version in versions]
+        self._revoked_from = self.token_version
+        # Now, and again once committed in case a request cached the old row meanwhile
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+    def revoke_tokens(self):
+        """Invalidate every token issued so far, once saved"""
+        if not hasattr(self, '_revoked_from'):
+            self._revoked_from = self.token_version
+        self.token_version += 1
+
     def soft_delete(self):
         self.is_deleted = True
+        self.revoke_tokens()
         self.save()
+
+    @classmethod
+    def adjust_counts(cls, deltas):
+        """
+        Apply counter deltas ({field: {user_id: delta}}) in one UPDATE.
+
+        Bumps ``updated_at`` like a save would, which invalidates the cached
+        profile cards of the changed users.
+        """
+        return apply_count_deltas(cls, deltas, updated_at=timezone.now())
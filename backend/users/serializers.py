@@ -6,4 +6,15 @@ class UserProfileSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'email', 'bio', 'location', 
                   'profile_picture', 'followers_count', 'following_count']
-        read_only_fields = ['id', 'email', 'followers_count', 'following_count'] 
\ No newline at end of file
+        read_only_fields = ['id', 'email', 'followers_count', 'following_count'] 
+
+class ProfileCardSerializer(serializers.ModelSerializer):
+    """Public profile card; cached, so it must not depend on the viewer"""
+    joined_at = serializers.DateTimeField(source='created_at', read_only=True)
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'bio', 'location', 'profile_picture',
+                  'followers_count', 'following_count', 'tweets_count',
+                  'likes_received', 'joined_at']
+        read_only_fields = fields
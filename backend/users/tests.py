@@ -1,3 +1,126 @@
-from django.test import TestCase
+import pytest
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
 
-# Create your tests here.
+from follows.graph import rebuild_graph, reset_graph
+from follows.models import Follow
+from tweets.models import Like, Tweet
+from .models import User
+
+
+def make_user(name):
+    return User.objects.create_user(
+        username=name,
+        email=f'{name}@example.com',
+        password='StrongPassword123!'
+    )
+
+
+def client_for(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+    return client
+
+
+@pytest.fixture(autouse=True)
+def fresh_graph():
+    reset_graph()
+    yield
+    reset_graph()
+
+
+@pytest.fixture
+def alice():
+    return make_user('alice')
+
+
+@pytest.fixture
+def bob():
+    return make_user('bob')
+
+
+@pytest.mark.django_db
+def test_usernames_are_matched_ignoring_case(alice):
+    bob, upper_bob = make_user('bob'), make_user('Bob')
+
+    assert User.objects.get_by_username('ALICE') == alice
+    assert User.objects.get_by_username('Bob') == upper_bob
+    assert User.objects.ids_by_username(['Alice', 'bob', 'BOB', 'nobody']) == {
+        'Alice': alice.id, 'bob': bob.id, 'BOB': bob.id
+    }
+    with pytest.raises(User.DoesNotExist):
+        User.objects.get_by_username('nobody')
+
+
+@pytest.mark.django_db
+class TestUserCounts:
+    def test_adjust_counts_bumps_updated_at(self, alice):
+        before = alice.updated_at
+
+        User.adjust_counts({'tweets_count': {alice.id: 2}})
+
+        alice.refresh_from_db()
+        assert alice.tweets_count == 2
+        assert alice.updated_at > before
+
+    def test_tweet_and_like_counters(self, alice, bob):
+        client = client_for(alice)
+        tweet_id = client.post('/api/v1/tweets/', {'content': 'Hello world'}, format='json').data['id']
+        client_for(bob).post(f'/api/v1/tweets/{tweet_id}/like/')
+
+        alice.refresh_from_db()
+        assert (alice.tweets_count, alice.likes_received) == (1, 1)
+
+        client.delete(f'/api/v1/tweets/{tweet_id}/')
+
+        alice.refresh_from_db()
+        assert (alice.tweets_count, alice.likes_received) == (0, 0)
+
+
+@pytest.mark.django_db
+class TestProfileAPI:
+    def test_profile_card(self, alice, bob):
+        tweet = Tweet.objects.create(content='Hi', author=alice)
+        Like.objects.create(tweet=tweet, user=bob)
+        User.adjust_counts({'tweets_count': {alice.id: 1}, 'likes_received': {alice.id: 1}})
+        Follow.objects.create(follower=bob, following=alice)
+
+        response = client_for(bob).get('/api/v1/users/alice/')
+
+        assert response.status_code == 200
+        assert response.data['tweets_count'] == 1
+        assert response.data['likes_received'] == 1
+        assert response.data['followers_count'] == 1
+        assert response.data['is_following'] is True
+        assert response.data['follows_you'] is False
+        assert 'email' not in response.data
+
+    def test_card_is_cached_until_the_user_changes(self, alice, bob, django_assert_num_queries):
+        client = client_for(bob)
+        rebuild_graph()
+        client.get('/api/v1/users/alice/')
+
+        # Only the cache key lookup; the request user comes from the cache too
+        with django_assert_num_queries(1):
+            client.get('/api/v1/users/alice/')
+
+        alice.bio = 'Updated bio'
+        alice.save()
+        assert client.get('/api/v1/users/alice/').data['bio'] == 'Updated bio'
+
+    def test_username_that_looks_like_an_action(self, alice):
+        make_user('batch')
+        response = client_for(alice).get('/api/v1/users/batch/')
+        assert response.data['username'] == 'batch'
+
+    def test_unknown_user(self, bob):
+        response = client_for(bob).get('/api/v1/users/nobody/')
+        assert response.status_code == 404
+
+    def test_batch(self, alice, bob):
+        response = client_for(alice).get('/api/v1/users/-/batch/?usernames=bob,nobody,alice')
+
+        assert response.status_code == 200
+        assert [card['username'] for card in response.data['results']] == ['bob', 'alice']
+        assert response.data['not_found'] == ['nobody']
+        assert response.data['results'][1]['is_following'] is None
@@ -1,15 +1,23 @@
 from django.urls import path
 from django.http import JsonResponse
+from .views import ProfileBatchView, ProfileView
 
 app_name = 'users'
 
 def user_api_root(request):
-    """Placeholder for users API root"""
+    """Root endpoint for users API"""
     return JsonResponse({
         "status": "success",
-        "message": "Users API endpoints coming soon",
+        "message": "Users API is running",
+        "endpoints": {
+            "profile": "<username>/",
+            "profiles": "-/batch/?usernames=<username>,<username>",
+        }
     })
 
+# Actions live under "-/", which the username route can't match
 urlpatterns = [
     path('', user_api_root, name='user-api-root'),
-] 
\ No newline at end of file
+    path('-/batch/', ProfileBatchView.as_view(), name='profile-batch'),
+    path('<str:username>/', ProfileView.as_view(), name='profile'),
+]
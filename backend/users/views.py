@@ -1,3 +1,67 @@
-from django.shortcuts import render
+from django.conf import settings
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from follows.graph import get_graph
+from follows.views import get_relationship_ids
+from .cards import get_profile_cards
+
+
+def with_relationships(cards, viewer):
+    """Add the viewer's relationship flags, which can't be part of the cached cards"""
+    user_ids = [card['id'] for card in cards if card['id'] != viewer.id]
+    graph = get_graph()
+    if graph is not None:
+        following_ids = {user_id for user_id in user_ids if graph.is_following(viewer.id, user_id)}
+        follower_ids = {user_id for user_id in user_ids if graph.is_following(user_id, viewer.id)}
+    else:
+        following_ids, follower_ids = get_relationship_ids(viewer, user_ids)
+
+    return [
+        {**card, 'is_following': None, 'follows_you': None} if card['id'] == viewer.id else {
+            **card,
+            'is_following': card['id'] in following_ids,
+            'follows_you': card['id'] in follower_ids,
+        }
+        for card in cards
+    ]
+
+
+class ProfileView(APIView):
+    """Profile card of a user"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, username):
+        card = get_profile_cards([username]).get(username)
+        if card is None:
+            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(with_relationships([card], request.user)[0])
+
+
+class ProfileBatchView(APIView):
+    """
+    Profile cards of many users.
+
+    Takes a comma separated ``usernames`` query parameter (up to
+    PROFILE_CARD_BATCH_MAX names) and returns the cards in the same order.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        usernames = list(dict.fromkeys(
+            name.strip() for name in request.query_params.get('usernames', '').split(',') if name.strip()
+        ))
+        if not usernames:
+            return Response({'error': 'Provide usernames'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(usernames) > settings.PROFILE_CARD_BATCH_MAX:
+            return Response(
+                {'error': f'You can request at most {settings.PROFILE_CARD_BATCH_MAX} profiles at once'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        cards = get_profile_cards(usernames)
+        return Response({
+            'results': with_relationships([cards[name] for name in usernames if name in cards], request.user),
+            'not_found': [name for name in usernames if name not in cards],
+        })